@@ -162,6 +162,6 @@ def node_align_process(state: AgentState):
         "memory": memory, # 保持记忆
         "default_thresholds_vector": default_thresholds,
         "expert_thresholds_vector": expert_thresholds,
-        "context_data": data,
+        "context_handle": data['context_handle'], # 只保存句柄，检查点中不再写入缺陷数据
         "record_min_confidence": calculated_min_confidence
     }
\ No newline at end of file
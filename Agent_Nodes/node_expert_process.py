@@ -4,6 +4,7 @@ from Tools.align_tools.alignment_memory import AlignmentMemory
 import json
 from agent_state import AgentState
 from Tools.align_tools.align_defection import step1_analyze_pipeline_data, step2_generate_alignment_report
+from Tools.align_tools.alignment_artifacts import resolve_context
 
 def node_expert_process(state: AgentState):
     print("=== 更新专家反馈到数据库 ===")
@@ -44,9 +45,13 @@ def node_expert_process(state: AgentState):
         calculated_min_confidence = state["record_min_confidence"]
         file1 = memory.get("align_file1")
         file2 = memory.get("align_file2")
-        res_data, error = step1_analyze_pipeline_data.invoke({"filename1": file1, "filename2": file2})
-        if error:
-            print(error)
+        # 按句柄取回第一阶段的对齐产物，只重新运行第二阶段；
+        # 产物不存在时（如缓存被清理）再运行第一阶段，其结果同样按文件内容缓存
+        res_data = resolve_context(state.get("context_handle"))
+        if res_data is None:
+            res_data, error = step1_analyze_pipeline_data.invoke({"filename1": file1, "filename2": file2})
+            if error:
+                print(error)
         expert_thresholds = {
             'distance':       new_expert_thresholds[0],  # 第1个值
             'clock_position': new_expert_thresholds[1],  # 第2个值
@@ -5,6 +5,8 @@ import numpy as np
 from typing import Tuple, List, Dict, Optional, Any
 import re
 from langchain.tools import tool
+from Tools.align_tools.column_utils import locate_upstream_welds
+from Tools.align_tools.listing_reader import read_listing
 
 
 import math
@@ -288,7 +290,13 @@ def read_defect_data(df, file_type=1):
 
     defects = []
 
-    for idx, row in df.iterrows():
+    # 预先为每一行查找最近的上游环焊缝（向量化查找，替代逐行回溯）
+    # 环焊缝的特征：上游环焊缝编号不为空，且深度、长度、宽度都为空
+    upstream_welds, upstream_distances, upstream_found = locate_upstream_welds(
+        df, weld_number_col, abs_distance_col, [depth_col, length_col, width_col], np.arange(len(df))
+    )
+
+    for pos, (idx, row) in enumerate(df.iterrows()):
         # 检查是否有缺陷数据（深度、长度、宽度至少有一个不为空）
         has_defect_data = False
         # for col in [depth_col, length_col, width_col]:
@@ -301,62 +309,10 @@ def read_defect_data(df, file_type=1):
             continue
 
         # 获取最近的环焊缝编号和绝对距离
-        current_weld = None
-        current_abs_distance = None
-
-        # 向上查找最近的环焊缝 - 修正逻辑
-        # 环焊缝的特征：上游环焊缝编号不为空，且深度、长度、宽度都为空
-        for i in range(idx, -1, -1):
-            search_row = df.iloc[i]
-            weld_num = search_row.get(weld_number_col)
-            abs_dist = search_row.get(abs_distance_col)
-
-            # 检查深度、长度、宽度是否都为空
-            depth_empty = depth_col is None or pd.isna(search_row.get(depth_col)) or str(
-                search_row.get(depth_col)).strip() == ''
-            length_empty = length_col is None or pd.isna(search_row.get(length_col)) or str(
-                search_row.get(length_col)).strip() == ''
-            width_empty = width_col is None or pd.isna(search_row.get(width_col)) or str(
-                search_row.get(width_col)).strip() == ''
-
-            # 环焊缝条件：上游环焊缝编号不为空，绝对距离不为空，且深度、长度、宽度都为空
-            if (pd.notna(weld_num) and pd.notna(abs_dist) and
-                    str(weld_num).strip() != '' and str(abs_dist).strip() != '' and
-                    depth_empty and length_empty and width_empty):
-                try:
-                    current_weld = int(float(str(weld_num).strip()))
-                    current_abs_distance = float(str(abs_dist).strip())
-                    break
-                except (ValueError, TypeError):
-                    continue
-
-        if current_weld is None:
-            # 如果向上找不到环焊缝，尝试向下查找
-            for i in range(idx, min(idx + 10, len(df))):
-                search_row = df.iloc[i]
-                weld_num = search_row.get(weld_number_col)
-                abs_dist = search_row.get(abs_distance_col)
-
-                # 检查深度、长度、宽度是否都为空
-                depth_empty = depth_col is None or pd.isna(search_row.get(depth_col)) or str(
-                    search_row.get(depth_col)).strip() == ''
-                length_empty = length_col is None or pd.isna(search_row.get(length_col)) or str(
-                    search_row.get(length_col)).strip() == ''
-                width_empty = width_col is None or pd.isna(search_row.get(width_col)) or str(
-                    search_row.get(width_col)).strip() == ''
-
-                if (pd.notna(weld_num) and pd.notna(abs_dist) and
-                        str(weld_num).strip() != '' and str(abs_dist).strip() != '' and
-                        depth_empty and length_empty and width_empty):
-                    try:
-                        current_weld = int(float(str(weld_num).strip()))
-                        current_abs_distance = float(str(abs_dist).strip())
-                        break
-                    except (ValueError, TypeError):
-                        continue
-
-        if current_weld is None:
+        if not upstream_found[pos]:
             continue
+        current_weld = int(upstream_welds[pos])
+        current_abs_distance = float(upstream_distances[pos])
 
         # 计算到上游环焊缝的距离
         defect_abs_distance = row.get(abs_distance_col)
@@ -1564,18 +1520,14 @@ def pipeline_alignment_tool(filename1: str, filename2: str, threshold: float = 0
 
     try:
         print("正在读取文件1...")
-        # 获取文件1的工作表名称
-        sheet_names1 = get_sheet_names(file1_path)
+        # 自动识别管道列表所在的工作表（同一次打开工作簿内完成）
+        df1, sheet_names1 = read_listing(file1_path)
         print(f"文件1的工作表: {sheet_names1}")
-        # 使用第一个工作表
-        df1 = pd.read_excel(file1_path, sheet_name=sheet_names1[0])
 
         print("正在读取文件2...")
-        # 获取文件2的工作表名称
-        sheet_names2 = get_sheet_names(file2_path)
+        # 自动识别管道列表所在的工作表（同一次打开工作簿内完成）
+        df2, sheet_names2 = read_listing(file2_path)
         print(f"文件2的工作表: {sheet_names2}")
-        # 使用第一个工作表
-        df2 = pd.read_excel(file2_path, sheet_name=sheet_names2[0])
 
         # 读取环焊缝数据
         print("正在提取环焊缝数据...")
@@ -9,33 +9,55 @@ import pandas as pd
 import numpy as np
 from typing import Tuple, List, Dict, Optional, Any
 import re
+import datetime
+import pickle
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from langchain.tools import tool
+from Tools.align_tools.column_utils import (get_column, strip_text, nonblank_mask, to_float_array, to_int_array,
+                                           locate_upstream_welds)
+from Tools.align_tools.defect_table import DefectTable, as_defect_table
+from Tools.align_tools.defect_alignment_store import DefectAlignmentRows, round_for_report
+from Tools.align_tools.weld_alignment_store import (AlignmentColumns, AlignmentRecord, AlignmentView,
+                                                    ALIGNMENT_FIELDS, REPORT_COLUMNS)
+from Tools.align_tools.column_schema import resolve_schema
+from Tools.align_tools.listing_reader import select_excel_engine
+from Tools.align_tools.ingest_cache import ingest_listings
+from Tools.align_tools.alignment_artifacts import alignment_artifact_key, get_cached_artifact, put_cached_artifact
 
 # 统计了缺陷统计信息，会根据缺陷统计信息进行分类确定置信度阈值
 class WeldAlignment:
-    """环焊缝对齐结果的数据结构"""
+    """环焊缝对齐结果的数据结构（对齐对以列式数组存储，alignments 为兼容原 list-of-dict 的只读视图）"""
 
     def __init__(self):
-        self.alignments = []  # 存储对齐对
+        self._columns = AlignmentColumns()  # 存储对齐对
         self.first_aligned_weld1 = None  # 第一个对齐的文件1环焊缝
         self.first_aligned_weld2 = None  # 第一个对齐的文件2环焊缝
         self.base_distance = 0  # 使用的基础距离
         self.aligned_count = 0  # 对齐的环焊缝对数
+        self._index = None  # 查询索引，首次查询时建立，添加对齐对后失效
+
+    @property
+    def alignments(self) -> AlignmentView:
+        """所有对齐对（按添加顺序），元素支持 alignment['file1_weld'] 形式访问"""
+        return AlignmentView(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __getstate__(self):
+        # 索引可以重建，不随对象序列化（进程池返回结果时）
+        state = self.__dict__.copy()
+        state['_index'] = None
+        return state
 
     def add_alignment(self, weld1: str = ' ', dist1: float = 0, redis1: float = 0,
                       weld2: str = ' ', dist2: float = 0, redis2: float = 0,
                       confidence: float = 0.0):
         """添加一个对齐对，包含相对距离信息"""
-        self.alignments.append({
-            'file1_weld': weld1,
-            'file1_distance': dist1,
-            'file1_redis': redis1,  # 新增相对距离
-            'file2_weld': weld2,
-            'file2_distance': dist2,
-            'file2_redis': redis2,  # 新增相对距离
-            'confidence': confidence
-        })
+        self._columns.append(weld1, dist1, redis1, weld2, dist2, redis2, confidence)
+        self._index = None
 
         # 记录第一个对齐的环焊缝
         if self.first_aligned_weld1 is None:
@@ -49,362 +71,389 @@ class WeldAlignment:
                 'distance': dist2
             }
 
+    def add_alignments(self, welds1=None, dists1=None, redis1=None,
+                       welds2=None, dists2=None, redis2=None, confidence=None):
+        """
+        批量添加对齐对（各参数为等长序列，未给出的一侧视为未对齐）
+
+        Args:
+            welds1: 文件1环焊缝编号序列
+            dists1: 文件1绝对距离序列
+            redis1: 文件1相对距离序列
+            welds2: 文件2环焊缝编号序列
+            dists2: 文件2绝对距离序列
+            redis2: 文件2相对距离序列
+            confidence: 置信度序列
+        """
+        columns = {field: values for field, values in zip(
+            ALIGNMENT_FIELDS, (welds1, dists1, redis1, welds2, dists2, redis2, confidence)) if values is not None}
+        if not columns:
+            return
+        count = len(next(iter(columns.values())))
+        if count == 0:
+            return
+        first = len(self._columns)
+        self._columns.extend(count, **columns)
+        self._index = None
+
+        if self.first_aligned_weld1 is None:
+            record = self._columns.record(first)
+            self.first_aligned_weld1 = {'weld': record.file1_weld, 'distance': record.file1_distance}
+            self.first_aligned_weld2 = {'weld': record.file2_weld, 'distance': record.file2_distance}
+
+    def to_frame(self) -> pd.DataFrame:
+        """全部对齐对（字段名为 ALIGNMENT_FIELDS，数值列保持数值类型），可用 from_frame 还原"""
+        return self._columns.to_frame()
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, base_distance: float = 0) -> 'WeldAlignment':
+        """
+        从 to_frame() 的结果还原对齐结果
+
+        Args:
+            frame: to_frame() 生成的 DataFrame
+            base_distance: 使用的基础距离
+
+        Returns:
+            WeldAlignment: 环焊缝对齐结果
+        """
+        alignment = cls()
+        alignment.add_alignments(*(frame[field].to_numpy() for field in ALIGNMENT_FIELDS))
+        alignment.base_distance = base_distance
+        alignment.count_aligned_welds()
+        return alignment
+
+    def extend_alignment(self, other: 'WeldAlignment'):
+        """按顺序追加另一个对齐结果中的全部对齐对"""
+        self.add_alignments(*(other._columns.column(field) for field in ALIGNMENT_FIELDS))
+
+    def _get_index(self) -> Dict:
+        """
+        建立（或复用）查询索引
+
+        - file1_map / file2_map：环焊缝编号 -> 另一文件中的对应编号（取第一次出现的对齐对，与逐条扫描一致）
+        - paired：两侧都有环焊缝的对齐对的行号
+        - sorted1 / order1、sorted2 / order2：已配对环焊缝的绝对距离（升序）及其在 paired 中的下标
+        """
+        if self._index is None:
+            columns = self._columns
+            welds1 = columns.column('file1_weld')
+            welds2 = columns.column('file2_weld')
+            first1 = ~pd.Index(welds1).duplicated(keep='first')
+            first2 = ~pd.Index(welds2).duplicated(keep='first')
+            paired = np.flatnonzero(columns.paired_mask())
+
+            index = {
+                'file1_map': dict(zip(welds1[first1].tolist(), welds2[first1].tolist())),
+                'file2_map': dict(zip(welds2[first2].tolist(), welds1[first2].tolist())),
+                'paired': paired
+            }
+            for side in ('1', '2'):
+                distances = columns.column(f'file{side}_distance')[paired]
+                order = np.argsort(distances, kind='stable')
+                index[f'sorted{side}'] = distances[order]
+                index[f'order{side}'] = order
+            self._index = index
+        return self._index
+
+    def _nearest_paired(self, side: str, target_distance: float) -> Optional[AlignmentRecord]:
+        """二分查找距离目标位置最近的已配对对齐对（距离相同时取靠前的）"""
+        index = self._get_index()
+        sorted_distances = index[f'sorted{side}']
+        if len(sorted_distances) == 0:
+            return None
+
+        pos = int(np.searchsorted(sorted_distances, target_distance, side='left'))
+        if pos == len(sorted_distances) or (
+                pos > 0 and target_distance - sorted_distances[pos - 1] <= sorted_distances[pos] - target_distance):
+            pos -= 1
+        # 距离相同的多个环焊缝取 alignments 中靠前的一个
+        pos = int(np.searchsorted(sorted_distances, sorted_distances[pos], side='left'))
+        return self._columns.record(int(index['paired'][index[f'order{side}'][pos]]))
+
+    def chainage_table(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        文件1 -> 文件2 里程换算表（已配对环焊缝的绝对距离，单调递增）
+
+        按文件1距离排序后，文件2距离取累计最大值保证单调；文件1距离重复时只保留第一个。
+
+        Returns:
+            tuple: (文件1距离数组, 文件2距离数组)
+        """
+        index = self._get_index()
+        if 'chainage' not in index:
+            dist1 = index['sorted1']
+            dist2 = self._columns.column('file2_distance')[index['paired'][index['order1']]]
+            dist2 = np.maximum.accumulate(dist2) if len(dist2) else dist2
+            keep = np.ones(len(dist1), dtype=bool)
+            keep[1:] = dist1[1:] > dist1[:-1]
+            index['chainage'] = (dist1[keep], dist2[keep])
+        return index['chainage']
+
+    def project_to_file2(self, distances) -> Optional[np.ndarray]:
+        """
+        把文件1的绝对距离换算为文件2的绝对距离（在相邻已配对环焊缝之间分段线性插值，
+        可以修正两次检测里程计在锚点之间的伸缩；两端之外按最外侧环焊缝的里程差平移）
+
+        Args:
+            distances: 文件1绝对距离（标量或数组）
+
+        Returns:
+            np.ndarray: 文件2绝对距离；没有已配对环焊缝时返回 None
+        """
+        table1, table2 = self.chainage_table()
+        if len(table1) == 0:
+            return None
+        distances = np.asarray(distances, dtype=float)
+        projected = np.interp(distances, table1, table2)
+        projected = np.where(distances < table1[0], distances - table1[0] + table2[0], projected)
+        projected = np.where(distances > table1[-1], distances - table1[-1] + table2[-1], projected)
+        return projected
+
     def get_file2_weld(self, file1_weld: str) -> Optional[str]:
         """根据文件1的环焊缝编号获取对应的文件2环焊缝编号"""
-        for alignment in self.alignments:
-            if alignment['file1_weld'] == file1_weld:
-                return alignment['file2_weld']
-        return None
+        return self._get_index()['file1_map'].get(file1_weld)
 
     def get_file1_weld(self, file2_weld: str) -> Optional[str]:
         """根据文件2的环焊缝编号获取对应的文件1环焊缝编号"""
-        for alignment in self.alignments:
-            if alignment['file2_weld'] == file2_weld:
-                return alignment['file1_weld']
-        return None
+        return self._get_index()['file2_map'].get(file2_weld)
 
     def get_all_file1_welds(self) -> List[str]:
         """获取所有文件1的环焊缝编号（包括已对齐和未对齐的）"""
-        file1_welds = [a['file1_weld'] for a in self.alignments if a['file1_weld'] != ' ']
-        return file1_welds
+        welds = self._columns.column('file1_weld')
+        return welds[welds != ' '].tolist()
 
     def get_all_file2_welds(self) -> List[str]:
         """获取所有文件2的环焊缝编号（包括已对齐和未对齐的）"""
-        file2_welds = [a['file2_weld'] for a in self.alignments if a['file2_weld'] != ' ']
-        return file2_welds
+        welds = self._columns.column('file2_weld')
+        return welds[welds != ' '].tolist()
 
     def get_nearest_aligned_weld1(self, target_distance: float) -> Optional[Dict]:
-        """在文件1中查找距离目标位置最近的已对齐环焊缝"""
-        if not self.alignments:
+        """在文件1中查找距离目标位置最近的已对齐环焊缝（只考虑两侧都有环焊缝的对齐对）"""
+        alignment = self._nearest_paired('1', target_distance)
+        if alignment is None:
             return None
-
-        nearest = None
-        min_distance = float('inf')
-
-        for alignment in self.alignments:
-            distance_diff = abs(alignment['file1_distance'] - target_distance)
-            if distance_diff < min_distance:
-                min_distance = distance_diff
-                nearest = {
-                    'weld': alignment['file1_weld'],
-                    'distance': alignment['file1_distance'],
-                    'redis': alignment['file1_redis'],  # 新增相对距离
-                    'aligned_weld2': alignment['file2_weld'],
-                    'aligned_distance2': alignment['file2_distance'],
-                    'aligned_redis2': alignment['file2_redis']  # 新增相对距离
-                }
-
-        return nearest
+        return {
+            'weld': alignment['file1_weld'],
+            'distance': alignment['file1_distance'],
+            'redis': alignment['file1_redis'],  # 新增相对距离
+            'aligned_weld2': alignment['file2_weld'],
+            'aligned_distance2': alignment['file2_distance'],
+            'aligned_redis2': alignment['file2_redis']  # 新增相对距离
+        }
 
     def get_nearest_aligned_weld2(self, target_distance: float) -> Optional[Dict]:
-        """在文件2中查找距离目标位置最近的已对齐环焊缝"""
-        if not self.alignments:
+        """在文件2中查找距离目标位置最近的已对齐环焊缝（只考虑两侧都有环焊缝的对齐对）"""
+        alignment = self._nearest_paired('2', target_distance)
+        if alignment is None:
             return None
-
-        nearest = None
-        min_distance = float('inf')
-
-        for alignment in self.alignments:
-            # print(alignment['file2_distance'])
-            distance_diff = abs(alignment['file2_distance'] - target_distance)
-            if distance_diff < min_distance:
-                min_distance = distance_diff
-                nearest = {
-                    'weld': alignment['file2_weld'],
-                    'distance': alignment['file2_distance'],
-                    'redis': alignment['file2_redis'],  # 新增相对距离
-                    'aligned_weld1': alignment['file1_weld'],
-                    'aligned_distance1': alignment['file1_distance'],
-                    'aligned_redis1': alignment['file1_redis']  # 新增相对距离
-                }
-
-        return nearest
+        return {
+            'weld': alignment['file2_weld'],
+            'distance': alignment['file2_distance'],
+            'redis': alignment['file2_redis'],  # 新增相对距离
+            'aligned_weld1': alignment['file1_weld'],
+            'aligned_distance1': alignment['file1_distance'],
+            'aligned_redis1': alignment['file1_redis']  # 新增相对距离
+        }
 
     def count_aligned_welds(self) -> int:
         """计算对齐的环焊缝对数"""
-        count = 0
-        for alignment in self.alignments:
-            if alignment['file1_weld'] != ' ' and alignment['file2_weld'] != ' ':
-                count += 1
-        self.aligned_count = count
-        return count
-
-
-def read_weld_data(df):
+        self.aligned_count = int(np.count_nonzero(self._columns.paired_mask()))
+        return self.aligned_count
+
+    def count_unpaired_welds(self) -> Tuple[int, int]:
+        """
+        统计只在一侧出现的环焊缝数
+
+        Returns:
+            tuple: (文件1未匹配环焊缝数, 文件2未匹配环焊缝数)
+        """
+        has1 = self._columns.column('file1_weld') != ' '
+        has2 = self._columns.column('file2_weld') != ' '
+        return int(np.count_nonzero(has1 & ~has2)), int(np.count_nonzero(~has1 & has2))
+
+    def to_report_frame(self) -> pd.DataFrame:
+        """
+        转换为环焊缝对齐报告（列与 sort_weld_alignment_results 的结果一致，数值列保持数值类型）
+
+        Returns:
+            pd.DataFrame: 环焊缝对齐报告
+        """
+        frame = self._columns.to_frame(rename=REPORT_COLUMNS)
+        dist1 = self._columns.column('file1_distance')
+        dist2 = self._columns.column('file2_distance')
+        # 两侧距离都非 0 为对齐；文件1距离为 0 表示只有文件2环焊缝，否则只有文件1环焊缝
+        kind = np.where((dist1 != 0) & (dist2 != 0), '对齐', np.where(dist1 == 0, '文件2未对齐', '文件1未对齐'))
+        frame.insert(0, '类型', kind.astype(object))
+        return frame
+
+
+def read_weld_data(df, schema=None):
     """
     从数据框中读取环焊缝数据
 
     Args:
         df: 包含管线数据的DataFrame
+        schema: 列角色解析结果（ColumnSchema），为 None 时自动解析
 
     Returns:
         tuple: (绝对距离列表, 相对距离列表, 焊缝编号列表)
     """
     # 查找必要的列
-    abs_distance_col = None
-    weld_number_col = None
-    weld_type_col = None
-    depth_col = None
-
-    for col in df.columns:
-        col_str = str(col).lower()
-        if 'log distance' in col_str:
-            abs_distance_col = col
-        elif 'upstream girth weld' in col_str:
-            weld_number_col = col
-        elif 'feature type' in col_str:
-            weld_type_col = col
-        elif 'peak depth' in col_str:
-            depth_col = col
+    if schema is None:
+        schema = resolve_schema(df)
+    abs_distance_col = schema.get('abs_distance')
+    weld_number_col = schema.get('weld_number')
+    weld_type_col = schema.get('feature_type')
+    depth_col = schema.get('depth')
 
     if abs_distance_col is None:
         raise ValueError("未找到绝对距离列")
 
-    # 检查数据框中是否已有"环焊缝"类型
-    has_weld_type = False
-    if weld_type_col is not None:
-        for idx, row in df.iterrows():
-            weld_type = row.get(weld_type_col)
-            if pd.notna(weld_type) and str(weld_type).strip() == '环焊缝':
-                has_weld_type = True
-                break
+    # 检查数据框中是否已有"环焊缝"类型（整列一次性判断，不再逐行遍历）
+    weld_type_text = strip_text(df[weld_type_col]) if weld_type_col is not None else None
+    has_weld_type = weld_type_text is not None and bool((weld_type_text == '环焊缝').any())
 
     # 如果没有找到环焊缝类型，则进行自动标记
     if not has_weld_type and weld_type_col is not None:
         print("未找到环焊缝类型，正在自动标记...")
-        for idx, row in df.iterrows():
-            weld_number = row.get(weld_number_col)
-            depth = row.get(depth_col) if depth_col else None
-
-            # 判断条件：上游环焊缝编号不为空且深度为空
-            if (pd.notna(weld_number) and
-                    str(weld_number).strip() != '' and
-                    (depth is None or pd.isna(depth) or str(depth).strip() == '')):
-                # 标记为环焊缝
-                df.at[idx, weld_type_col] = '环焊缝'
-
-    # 提取环焊缝数据
-    weld_data = []
-    now_pipe_num = 10
-
-    for idx, row in df.iterrows():
-        abs_distance = row.get(abs_distance_col)
+        # 判断条件：上游环焊缝编号不为空且深度为空
+        auto_weld = nonblank_mask(get_column(df, weld_number_col)) & ~nonblank_mask(get_column(df, depth_col))
+        if auto_weld.any():
+            df[weld_type_col] = df[weld_type_col].astype(object)
+            df.loc[auto_weld, weld_type_col] = '环焊缝'
+            weld_type_text = weld_type_text.mask(auto_weld, '环焊缝')
+
+    # 提取环焊缝数据（列式掩码）
+    abs_values = to_float_array(df[abs_distance_col])
+    abs_valid = ~np.isnan(abs_values)
+    weld_column = get_column(df, weld_number_col)
+    weld_values, weld_valid = to_int_array(weld_column)
 
+    if weld_type_col is not None:
         # 如果有部件/缺陷类型列，优先使用它来判断
-        if weld_type_col is not None:
-            weld_type = row.get(weld_type_col)
-            if (pd.notna(weld_type) and str(weld_type).strip() == '环焊缝' and
-                    pd.notna(abs_distance) and str(abs_distance).strip() != ''):
-                try:
-                    weld_number = row.get(weld_number_col)
-                    pipe_num = int(float(str(weld_number).strip())) if pd.notna(weld_number) else None
-                    abs_dist = float(str(abs_distance).strip())
-                    if pipe_num is None:
-                        pipe_num = now_pipe_num
-                        now_pipe_num = now_pipe_num + 10
-                    weld_data.append((pipe_num, abs_dist))
-                except (ValueError, TypeError):
-                    continue
+        is_weld = (weld_type_text == '环焊缝').to_numpy() & abs_valid
+        weld_missing = weld_column.isna().to_numpy()
+        # 编号为空的环焊缝按出现顺序自动编号：10, 20, 30...
+        auto_numbered = is_weld & weld_missing
+        weld_values = weld_values.copy()
+        weld_values[auto_numbered] = np.arange(1, int(auto_numbered.sum()) + 1) * 10
+        # 编号存在但无法解析的行跳过
+        keep = is_weld & (weld_valid | weld_missing)
+    elif weld_number_col is not None:
         # 如果没有部件/缺陷类型列，使用上游环焊缝编号判断
-        elif weld_number_col is not None:
-            weld_number = row.get(weld_number_col)
-            if (pd.notna(weld_number) and pd.notna(abs_distance) and
-                    str(weld_number).strip() != '' and str(abs_distance).strip() != ''):
-                try:
-                    weld_num = int(float(str(weld_number).strip()))
-                    abs_dist = float(str(abs_distance).strip())
-                    weld_data.append((weld_num, abs_dist))
-                except (ValueError, TypeError):
-                    continue
-
-    # 按绝对距离排序
-    weld_data.sort(key=lambda x: x[1])
+        keep = weld_valid & abs_valid
+    else:
+        keep = np.zeros(len(df), dtype=bool)
+
+    # 按绝对距离排序（稳定排序，与原先的 list.sort 一致）
+    kept_distances = abs_values[keep]
+    order = np.argsort(kept_distances, kind='stable')
 
     # 提取绝对距离和焊缝编号
-    absolute_distances = [item[1] for item in weld_data]
-    weld_numbers = [item[0] for item in weld_data]
+    sorted_distances = kept_distances[order]
+    absolute_distances = sorted_distances.tolist()
+    weld_numbers = weld_values[keep][order].tolist()
 
     # 计算相对距离
-    relative_distances = [0]
-    for i in range(len(absolute_distances) - 1):
-        relative_distances.append(round(absolute_distances[i + 1] - absolute_distances[i], 4))
+    relative_distances = [0] + np.round(np.diff(sorted_distances), 4).tolist()
 
     return absolute_distances, relative_distances, weld_numbers
 
 
-def read_defect_data(df, file_type=1):
+def read_defect_data(df, file_type=1, schema=None):
     """
     统一的缺陷数据读取函数
 
     Args:
         df: 数据框
         file_type: 文件类型，1或2，用于区分不同的文件格式
+        schema: 列角色解析结果（ColumnSchema），为 None 时自动解析
 
     Returns:
-        list: 缺陷数据列表
+        DefectTable: 列式缺陷表
     """
-    # 查找相关列
-    weld_number_col = None
-    abs_distance_col = None
-    orientation_col = None
-    depth_col = None
-    length_col = None
-    width_col = None
-    comment_col = None
-    defect_type_col = None
-
-    for col in df.columns:
-        col_str = str(col).lower()
-        if 'upstream girth weld' in col_str:
-            weld_number_col = col
-        elif 'log distance' in col_str:
-            abs_distance_col = col
-        elif 'clock position' in col_str:
-            orientation_col = col
-        elif 'peak depth' in col_str:
-            depth_col = col
-        elif 'length' in col_str and 'mm' in col_str:
-            length_col = col
-        elif 'width' in col_str and 'mm' in col_str:
-            width_col = col
-        elif 'feature type' in col_str:
-            comment_col = col
-        elif 'feature identification' in col_str:
-            defect_type_col = col
-
-    # 如果没有找到特定的长度/宽度列，尝试查找通用的
-    if length_col is None:
-        for col in df.columns:
-            if 'length' in str(col).lower():
-                length_col = col
-                break
-
-    if width_col is None:
-        for col in df.columns:
-            if 'width' in str(col).lower():
-                width_col = col
-                break
-
-    defects = []
-    num = 0
-    for idx, row in df.iterrows():
-        # 检查是否有缺陷数据（深度、长度、宽度至少有一个不为空）
-        has_defect_data = False
-        # for col in [depth_col]:
-        for col in [depth_col, length_col, width_col]:
-            if col and pd.notna(row.get(col)) and str(row.get(col)).strip() != '':
-                has_defect_data = True
-                break
-
-        if not has_defect_data:
-            continue
-        num += 1
-        # 获取最近的环焊缝编号和绝对距离
-        current_weld = None
-        current_abs_distance = None
-
-        # 向上查找最近的环焊缝 - 修正逻辑
-        # 环焊缝的特征：上游环焊缝编号不为空，且深度、长度、宽度都为空
-        for i in range(idx, -1, -1):
-            search_row = df.iloc[i]
-            weld_num = search_row.get(weld_number_col)
-            abs_dist = search_row.get(abs_distance_col)
-
-            # 检查深度、长度、宽度是否都为空
-            depth_empty = depth_col is None or pd.isna(search_row.get(depth_col)) or str(
-                search_row.get(depth_col)).strip() == ''
-            length_empty = length_col is None or pd.isna(search_row.get(length_col)) or str(
-                search_row.get(length_col)).strip() == ''
-            width_empty = width_col is None or pd.isna(search_row.get(width_col)) or str(
-                search_row.get(width_col)).strip() == ''
-
-            # 环焊缝条件：上游环焊缝编号不为空，绝对距离不为空，且深度、长度、宽度都为空
-            if (pd.notna(weld_num) and pd.notna(abs_dist) and
-                    str(weld_num).strip() != '' and str(abs_dist).strip() != '' and
-                    depth_empty and length_empty and width_empty):
-                try:
-                    current_weld = int(float(str(weld_num).strip()))
-                    current_abs_distance = float(str(abs_dist).strip())
-                    break
-                except (ValueError, TypeError):
-                    continue
-
-        if current_weld is None:
-            # 如果向上找不到环焊缝，尝试向下查找
-            for i in range(idx, min(idx + 10, len(df))):
-                search_row = df.iloc[i]
-                weld_num = search_row.get(weld_number_col)
-                abs_dist = search_row.get(abs_distance_col)
-
-                # 检查深度、长度、宽度是否都为空
-                depth_empty = depth_col is None or pd.isna(search_row.get(depth_col)) or str(
-                    search_row.get(depth_col)).strip() == ''
-                length_empty = length_col is None or pd.isna(search_row.get(length_col)) or str(
-                    search_row.get(length_col)).strip() == ''
-                width_empty = width_col is None or pd.isna(search_row.get(width_col)) or str(
-                    search_row.get(width_col)).strip() == ''
-
-                if (pd.notna(weld_num) and pd.notna(abs_dist) and
-                        str(weld_num).strip() != '' and str(abs_dist).strip() != '' and
-                        depth_empty and length_empty and width_empty):
-                    try:
-                        current_weld = int(float(str(weld_num).strip()))
-                        current_abs_distance = float(str(abs_dist).strip())
-                        break
-                    except (ValueError, TypeError):
-                        continue
-
-        if current_weld is None:
-            continue
+    # 查找相关列（与环焊缝读取共用同一份解析结果）
+    if schema is None:
+        schema = resolve_schema(df)
+    weld_number_col = schema.get('weld_number')
+    abs_distance_col = schema.get('abs_distance')
+    orientation_col = schema.get('orientation')
+    depth_col = schema.get('depth')
+    length_col = schema.get('length')
+    width_col = schema.get('width')
+    comment_col = schema.get('feature_type')
+    defect_type_col = schema.get('defect_type')
+
+    # 检查是否有缺陷数据（深度、长度、宽度至少有一个不为空）
+    data_cols = [depth_col, length_col, width_col]
+    has_defect_data = np.zeros(len(df), dtype=bool)
+    for col in data_cols:
+        if col:
+            has_defect_data |= nonblank_mask(df[col])
+
+    defect_rows = np.flatnonzero(has_defect_data)
+    # 缺陷序号按所有含缺陷数据的行计数（从1开始）
+    defect_numbers = np.arange(1, len(defect_rows) + 1)
+
+    # 获取最近的环焊缝编号和绝对距离（一次性向量化查找）
+    # 环焊缝的特征：上游环焊缝编号不为空，且深度、长度、宽度都为空
+    weld_found_numbers, weld_found_distances, found = locate_upstream_welds(
+        df, weld_number_col, abs_distance_col, data_cols, defect_rows
+    )
 
-        # 计算到上游环焊缝的距离
-        defect_abs_distance = row.get(abs_distance_col)
-        if pd.notna(defect_abs_distance) and str(defect_abs_distance).strip() != '':
-            try:
-                defect_abs_dist = float(str(defect_abs_distance).strip())
-                distance_to_weld = defect_abs_dist - current_abs_distance
-            except (ValueError, TypeError):
-                distance_to_weld = 0
-        else:
-            distance_to_weld = 0
-
-        # 处理时钟方位（转换为度数）
-        clock_position = 0
-        orientation = row.get(orientation_col)
-        if pd.notna(orientation) and str(orientation).strip() != '':
-            clock_position = convert_clock_to_degrees(str(orientation).strip())
-
-        # 获取缺陷参数
-        depth = get_float_value(row.get(depth_col))
-        length = get_float_value(row.get(length_col))
-        width = get_float_value(row.get(width_col))
-
-        # 获取注释和缺陷类型
-        comment = ""
-        defect_type = ""
-
-        if comment_col and pd.notna(row.get(comment_col)):
-            comment = str(row.get(comment_col))
-            # defect_type = classify_defect_type(comment)
-
-        if defect_type_col and pd.notna(row.get(defect_type_col)):
-            defect_type = str(row.get(defect_type_col))
-        elif not defect_type and comment:
-            defect_type = classify_defect_type(comment)
-
-        defect = {
-            'weld_number': str(current_weld),
-            'distance_to_weld': round(distance_to_weld, 3),
-            'clock_position': clock_position,
-            'depth': depth,
-            'length': length,
-            'width': width,
-            'defect_type': defect_type,
-            'comment': comment,
-            'original_index': num,
-            'absolute_distance': defect_abs_dist if 'defect_abs_dist' in locals() else current_abs_distance
-        }
-        defects.append(defect)
+    # 找不到环焊缝的缺陷直接跳过
+    rows = defect_rows[found]
+    defect_numbers = defect_numbers[found]
+    current_welds = weld_found_numbers[found]
+    current_abs_distances = weld_found_distances[found]
+
+    # 计算到上游环焊缝的距离
+    defect_abs_dists = to_float_array(get_column(df, abs_distance_col))[rows]
+    has_abs_dist = ~np.isnan(defect_abs_dists)
+    distances_to_weld = np.where(has_abs_dist, defect_abs_dists - current_abs_distances, 0)
+    # 缺陷绝对距离为空时沿用上一个有效的缺陷绝对距离，若之前都没有则使用环焊缝的绝对距离
+    absolute_distances = pd.Series(defect_abs_dists).ffill().to_numpy()
+    absolute_distances = np.where(np.isnan(absolute_distances), current_abs_distances, absolute_distances)
+
+    # 获取缺陷参数
+    depths = np.nan_to_num(to_float_array(get_column(df, depth_col))[rows], nan=0)
+    lengths = np.nan_to_num(to_float_array(get_column(df, length_col))[rows], nan=0)
+    widths = np.nan_to_num(to_float_array(get_column(df, width_col))[rows], nan=0)
+
+    # 处理时钟方位（转换为度数）
+    clock_positions = convert_clock_column(get_column(df, orientation_col).iloc[rows])
+
+    # 获取注释和缺陷类型
+    comments = np.full(len(rows), "", dtype=object)
+    if comment_col:
+        comment_values = df[comment_col].iloc[rows]
+        comments = np.where(comment_values.notna(), comment_values.astype(str), "").astype(object)
+
+    defect_types = np.full(len(rows), "", dtype=object)
+    if defect_type_col:
+        type_values = df[defect_type_col].iloc[rows]
+        defect_types = np.where(type_values.notna(), type_values.astype(str), "").astype(object)
+    else:
+        type_values = pd.Series(np.nan, index=range(len(rows)))
+    # 没有缺陷识别列（或为空）时根据注释分类，每种注释只分类一次
+    classify_rows = type_values.isna().to_numpy() & (comments != "")
+    if classify_rows.any():
+        classified = {c: classify_defect_type(c) for c in set(comments[classify_rows])}
+        defect_types[classify_rows] = [classified[c] for c in comments[classify_rows]]
+
+    defects = DefectTable(
+        weld_number=current_welds.astype(str),
+        distance_to_weld=[round(d, 3) for d in distances_to_weld.tolist()],
+        clock_position=clock_positions,
+        depth=depths,
+        length=lengths,
+        width=widths,
+        defect_type=defect_types,
+        comment=comments,
+        original_index=defect_numbers,
+        absolute_distance=absolute_distances
+    )
 
     return defects
 
@@ -442,6 +491,78 @@ def convert_clock_to_degrees(clock_time):
         return 0
 
 
+# 时钟方位文本：取前两到三组数字作为 时、分、秒（与 convert_clock_to_degrees 的 re.findall 规则一致）
+CLOCK_PATTERN = r'^\D*(\d+)\D+(\d+)(?:\D+(\d+))?'
+
+
+def convert_clock_column(values) -> np.ndarray:
+    """
+    批量将时钟方位列转换为度数（convert_clock_to_degrees 的向量化版本）
+
+    文本按 "HH:MM[:SS]" 一次性解析；Excel 读出的 datetime.time / datetime 直接取时分秒，
+    0~1 之间的数值按 Excel 的"一天的小数"解释。无法解析或为空时记为 0。
+
+    Args:
+        values: 时钟方位列（Series 或数组）
+
+    Returns:
+        np.ndarray: 度数数组 (0-360)
+    """
+    series = values.reset_index(drop=True) if isinstance(values, pd.Series) else pd.Series(values)
+    degrees = np.zeros(len(series))
+    if len(series) == 0:
+        return degrees
+
+    # 整列都是日期时间 / 时间间隔
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        valid = series.notna().to_numpy()
+        dt = series.dt
+        degrees[valid] = _clock_to_degrees(dt.hour.to_numpy()[valid], dt.minute.to_numpy()[valid],
+                                           dt.second.to_numpy()[valid])
+        return degrees
+    if pd.api.types.is_timedelta64_dtype(series.dtype):
+        valid = series.notna().to_numpy()
+        seconds = series.dt.total_seconds().to_numpy()[valid]
+        degrees[valid] = _clock_to_degrees(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+        return degrees
+
+    objects = series.astype(object)
+    is_time = objects.map(lambda v: isinstance(v, (datetime.time, datetime.datetime))).to_numpy(dtype=bool)
+    is_fraction = objects.map(
+        lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool) and 0 <= v < 1
+    ).to_numpy(dtype=bool)
+
+    if is_time.any():
+        times = objects[is_time]
+        degrees[is_time] = _clock_to_degrees(
+            np.array([t.hour for t in times], dtype=float),
+            np.array([t.minute for t in times], dtype=float),
+            np.array([t.second for t in times], dtype=float)
+        )
+
+    if is_fraction.any():
+        # Excel 时间以一天的小数存储，四舍五入到秒
+        seconds = np.round(objects[is_fraction].to_numpy(dtype=float) * 86400)
+        degrees[is_fraction] = _clock_to_degrees(seconds // 3600, seconds % 3600 // 60, seconds % 60)
+
+    is_text = ~(is_time | is_fraction)
+    if is_text.any():
+        parts = strip_text(objects[is_text]).str.extract(CLOCK_PATTERN)
+        hours = pd.to_numeric(parts[0], errors='coerce').to_numpy(dtype=float)
+        minutes = pd.to_numeric(parts[1], errors='coerce').to_numpy(dtype=float)
+        seconds = np.nan_to_num(pd.to_numeric(parts[2], errors='coerce').to_numpy(dtype=float), nan=0)
+        text_degrees = np.nan_to_num(_clock_to_degrees(hours, minutes, seconds), nan=0)
+        degrees[is_text] = text_degrees
+
+    return degrees
+
+
+def _clock_to_degrees(hours, minutes, seconds):
+    """12小时制，12点对应0度，顺时针增加"""
+    total_minutes = minutes + seconds / 60
+    return ((hours % 12) * 30 + total_minutes * 0.5) % 360
+
+
 def get_float_value(value):
     """
     安全地获取浮点数值
@@ -485,39 +606,33 @@ def classify_defect_type(comment):
         return str(comment_lower)
 
 
-def analyze_defect_distribution(defects1: List[Dict], defects2: List[Dict]) -> float:
+def analyze_defect_distribution(defects1: DefectTable, defects2: DefectTable) -> float:
     """
     分析缺陷分布
     """
     print("正在分析缺陷分布模式...")
 
     # 合并两个文件的缺陷数据
-    all_defects = defects1 + defects2
+    defects1 = as_defect_table(defects1)
+    defects2 = as_defect_table(defects2)
 
-    if not all_defects:
+    if len(defects1) + len(defects2) == 0:
         print("未找到缺陷数据，使用默认置信度阈值: 0.6")
         return 0.6
 
     # 提取距离和方位数据
-    distances = []
-    orientations = []
-
-    for defect in all_defects:
-        distance = defect['distance_to_weld']
-        orientation = defect['clock_position']
+    distances = np.concatenate([defects1.distance_to_weld, defects2.distance_to_weld])
+    orientations = np.concatenate([defects1.clock_position, defects2.clock_position])
 
-        # 过滤无效数据
-        if distance >= 0 and 0 <= orientation <= 360:
-            distances.append(distance)
-            orientations.append(orientation)
+    # 过滤无效数据
+    valid = (distances >= 0) & (orientations >= 0) & (orientations <= 360)
 
-    if len(distances) < 10:
-        print(f"缺陷数据过少 ({len(distances)}个)，使用默认置信度阈值: 0.6")
+    if np.count_nonzero(valid) < 10:
+        print(f"缺陷数据过少 ({np.count_nonzero(valid)}个)，使用默认置信度阈值: 0.6")
         return 0.6
 
-    # 转换为numpy数组
-    distances_array = np.array(distances)
-    orientations_array = np.array(orientations)
+    distances_array = distances[valid]
+    orientations_array = orientations[valid]
 
     # 计算分布密度统计量
     density_metrics = calculate_distribution_density(distances_array, orientations_array)
@@ -686,6 +801,16 @@ def set_confidence_by_density(density_metrics: Dict[str, float]) -> float:
     return confidence
 
 
+# 综合置信度中各项得分的权重
+SIMILARITY_WEIGHTS = {
+    'distance': 0.75,
+    'clock': 0.25,
+    'length': 0,
+    'depth': 0,
+    'type': 0
+}
+
+
 def calculate_defect_similarity(defect1, defect2, thresholds):
     """
     计算两个缺陷的相似度
@@ -719,9 +844,93 @@ def calculate_defect_similarity(defect1, defect2, thresholds):
     depth_score = max(0, 1 - depth_diff / thresholds['depth']) if defect1['depth'] > 0 and defect2['depth'] > 0 else 0.5
 
     # 计算缺陷类型相似度
+    type_score = _defect_type_score(defect1.get('defect_type', ''), defect2.get('defect_type', ''))
+
+    # 计算综合置信度（加权平均）
+    weights = SIMILARITY_WEIGHTS
+
+    total_confidence = (
+            distance_score * weights['distance'] +
+            clock_score * weights['clock'] +
+            length_score * weights['length'] +
+            depth_score * weights['depth'] +
+            type_score * weights['type']
+    )
+
+    explanation = _similarity_explanation(distance_score, clock_score, type_score)
+
+    return total_confidence, explanation
+
+
+def calculate_defect_similarity_block(defects1: DefectTable, defect1_id: int, defects2: DefectTable,
+                                      rows2: np.ndarray, thresholds) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    计算一个文件1缺陷与一批文件2缺陷的相似度（按列向量化，结果与 calculate_defect_similarity 逐对计算完全一致）
+
+    不生成匹配说明，选出最佳候选后再用 _similarity_explanation 为它生成。
+
+    Args:
+        defects1: 文件1缺陷表
+        defect1_id: 文件1缺陷行号
+        defects2: 文件2缺陷表
+        rows2: 文件2候选缺陷行号数组
+        thresholds: 阈值配置
+
+    Returns:
+        tuple: (置信度数组, 各项得分数组字典 {'distance', 'clock', 'type'})
+    """
+    rows2 = np.asarray(rows2, dtype=np.int64)
+
+    # 计算距离差异
+    distance_diff = np.abs(defects1.distance_to_weld[defect1_id] - defects2.distance_to_weld[rows2])
+    distance_score = _clamp_score(1 - distance_diff / thresholds['distance'])
+
+    # 计算时钟方位差异（环绕 360 度取较小的一侧）
+    clock_abs = np.abs(defects1.clock_position[defect1_id] - defects2.clock_position[rows2])
+    clock_wrap = 360 - clock_abs
+    clock_diff = np.where(clock_wrap < clock_abs, clock_wrap, clock_abs)
+    clock_score = _clamp_score(1 - clock_diff / thresholds['clock_position'])
+
+    # 计算长度差异
+    length1, length2 = defects1.length[defect1_id], defects2.length[rows2]
+    length_score = np.where((length1 > 0) & (length2 > 0),
+                            _clamp_score(1 - np.abs(length1 - length2) / thresholds['length']), 0.5)
+
+    # 计算深度差异
+    depth1, depth2 = defects1.depth[defect1_id], defects2.depth[rows2]
+    depth_score = np.where((depth1 > 0) & (depth2 > 0),
+                           _clamp_score(1 - np.abs(depth1 - depth2) / thresholds['depth']), 0.5)
+
+    # 计算缺陷类型相似度：只对文件2的每种缺陷类型计算一次，再按类型编码取值
+    type1 = defects1.record(defect1_id)['defect_type']
+    categories = defects2.defect_type.categories
+    type_by_code = np.array([_defect_type_score(type1, category) for category in categories] +
+                            [_defect_type_score(type1, '')], dtype=np.float64)  # 末尾一项对应缺失值（编码 -1）
+    type_score = type_by_code[defects2.defect_type.codes[rows2]]
+
+    # 计算综合置信度（加权平均），与逐对计算保持相同的运算顺序
+    weights = SIMILARITY_WEIGHTS
+    total_confidence = (
+            distance_score * weights['distance'] +
+            clock_score * weights['clock'] +
+            length_score * weights['length'] +
+            depth_score * weights['depth'] +
+            type_score * weights['type']
+    )
+
+    return total_confidence, {'distance': distance_score, 'clock': clock_score, 'type': type_score}
+
+
+def _clamp_score(raw: np.ndarray) -> np.ndarray:
+    """与 max(0, x) 一致：x 不大于 0（含 NaN）时取 0"""
+    return np.where(raw > 0, raw, 0.0)
+
+
+def _defect_type_score(type1, type2) -> float:
+    """缺陷类型相似度"""
     type_score = 0.5
-    type1 = defect1.get('defect_type', '').lower()
-    type2 = defect2.get('defect_type', '').lower()
+    type1 = type1.lower()
+    type2 = type2.lower()
 
     if type1 and type2:
         if '腐蚀' in type1 and '腐蚀' in type2:
@@ -732,25 +941,27 @@ def calculate_defect_similarity(defect1, defect2, thresholds):
             type_score = 1.0
         elif any(word in type1 for word in ['mfg', 'manufacture']) and any(word in type2 for word in ['制造']):
             type_score = 0.8
+    return type_score
 
-    # 计算综合置信度（加权平均）
-    weights = {
-        'distance': 0.75,
-        'clock': 0.25,
-        'length': 0,
-        'depth': 0,
-        'type': 0
-    }
 
-    total_confidence = (
-            distance_score * weights['distance'] +
-            clock_score * weights['clock'] +
-            length_score * weights['length'] +
-            depth_score * weights['depth'] +
-            type_score * weights['type']
-    )
+def _best_candidate(confidences: np.ndarray) -> Optional[int]:
+    """
+    与逐个比较 confidence > best_confidence（初始为 0）一致：取第一个最大值，置信度不大于 0 时返回 None
+
+    Args:
+        confidences: 候选置信度数组
 
-    # 生成匹配说明
+    Returns:
+        int: 最佳候选在数组中的位置
+    """
+    valid = confidences > 0
+    if not valid.any():
+        return None
+    return int(np.argmax(np.where(valid, confidences, -np.inf)))
+
+
+def _similarity_explanation(distance_score, clock_score, type_score) -> str:
+    """生成匹配说明"""
     explanation_parts = []
     if distance_score > 0.8:
         explanation_parts.append("距离匹配良好")
@@ -769,9 +980,7 @@ def calculate_defect_similarity(defect1, defect2, thresholds):
     if type_score > 0.7:
         explanation_parts.append("类型匹配")
 
-    explanation = "; ".join(explanation_parts)
-
-    return total_confidence, explanation
+    return "; ".join(explanation_parts)
 
 
 def calculate_weld_statistics(rel_dist1: List[float], rel_dist2: List[float]) -> Dict[str, float]:
@@ -841,9 +1050,171 @@ def calculate_weld_statistics(rel_dist1: List[float], rel_dist2: List[float]) ->
     }
 
 
+def find_alignment_start(redis1: List[float], redis2: List[float], abs_threshold: float, min_match_count: int,
+                         support_window: int = 20, offset_tolerance: int = 2,
+                         block_size: int = 64) -> Optional[Tuple[int, int]]:
+    """
+    在两个文件的全部环焊缝中查找对齐起始点（索引化匹配，不再限制搜索范围）
+
+    起始点定义与原逐对比较一致：从 (start1, start2) 开始连续 min_match_count 个相对距离之差
+    都小于 abs_threshold。做法是把相对距离按 abs_threshold 量化，对文件2的量化 k-mer 建立有序索引，
+    文件1的每个 k-mer 只需查找各位置量化值相差不超过 1 的 3^k 种组合，候选再用原判据逐一验证。
+
+    长管线上偶然满足条件的假起始点很多，因此优先选择"有旁证"的起始点：
+    其后 support_window 个环焊缝内还存在同一偏移（允许 offset_tolerance 个环焊缝的增减）的匹配段。
+    没有任何起始点有旁证时，退回最靠前的匹配点（即原算法的选择）。
+
+    Args:
+        redis1: 文件1相对距离列表
+        redis2: 文件2相对距离列表
+        abs_threshold: 相对距离绝对误差阈值
+        min_match_count: 连续匹配数量
+        support_window: 旁证查找范围（环焊缝数）
+        offset_tolerance: 旁证允许的偏移变化（环焊缝数）
+        block_size: 每批处理的文件1起始位置数
+
+    Returns:
+        tuple: (文件1起始位置, 文件2起始位置)，找不到时返回 None
+    """
+    if min_match_count <= 0:
+        return 0, 0
+
+    r1 = np.asarray(redis1, dtype=float)
+    r2 = np.asarray(redis2, dtype=float)
+    k = min_match_count
+    n1, n2 = len(r1) - k + 1, len(r2) - k + 1
+    if n1 <= 0 or n2 <= 0:
+        return None
+
+    index = _StartPointIndex(r1, r2, abs_threshold, k)
+    first_match = None
+    for block_start in range(0, n1, block_size):
+        block_end = min(block_start + block_size, n1)
+        starts1, starts2 = index.matches(block_start, block_end)
+        if len(starts1) == 0:
+            continue
+        if first_match is None:
+            first_match = (int(starts1[0]), int(starts2[0]))
+
+        # 旁证：其后不重叠的 support_window 个起始位置内、偏移相近的匹配
+        ahead1, ahead2 = index.matches(block_start + k, min(block_end + k + support_window, n1))
+        if len(ahead1) == 0:
+            continue
+        ahead_offsets = ahead2 - ahead1
+        span = n1 + k + support_window + 1
+        ahead_keys = np.sort((ahead_offsets + n1) * span + ahead1)
+        offsets = starts2 - starts1
+        supported = np.zeros(len(starts1), dtype=bool)
+        for delta in range(-offset_tolerance, offset_tolerance + 1):
+            low = (offsets + delta + n1) * span + starts1 + k
+            pos = np.searchsorted(ahead_keys, low, side='left')
+            hit = pos < len(ahead_keys)
+            hit[hit] = ahead_keys[pos[hit]] <= low[hit] + support_window
+            supported |= hit
+        if supported.any():
+            first = np.flatnonzero(supported)[0]
+            return int(starts1[first]), int(starts2[first])
+
+    return first_match
+
+
+class _StartPointIndex:
+    """量化相对距离 k-mer 的有序索引，用于批量查找满足起始点判据的 (start1, start2)"""
+
+    def __init__(self, r1: np.ndarray, r2: np.ndarray, abs_threshold: float, k: int):
+        self.r1, self.r2 = r1, r2
+        self.abs_threshold = abs_threshold
+        self.k = k
+        self.n1, self.n2 = len(r1) - k + 1, len(r2) - k + 1
+
+        # |x - y| < a 时 floor(x/a) 与 floor(y/a) 最多相差 1
+        q1 = np.floor(r1 / abs_threshold).astype(np.int64)
+        q2 = np.floor(r2 / abs_threshold).astype(np.int64)
+        self.vocab = np.unique(q2)
+        self.base = len(self.vocab) + 1
+        # 编码不能溢出 int64：量化值种类过多时只对前若干位建索引，其余位靠验证
+        self.hashed = 1
+        while self.hashed < k and self.base ** (self.hashed + 1) < 2 ** 62:
+            self.hashed += 1
+
+        ranks2 = np.searchsorted(self.vocab, q2) + 1
+        codes2 = np.zeros(self.n2, dtype=np.int64)
+        for t in range(self.hashed):
+            codes2 += ranks2[t:t + self.n2] * self.base ** t
+        self.order2 = np.argsort(codes2, kind='stable')
+        self.sorted_codes2 = codes2[self.order2]
+        self.q1 = q1
+
+    def _rank1(self, values: np.ndarray) -> np.ndarray:
+        """文件1量化值在文件2取值表中的编号，不存在时为 0"""
+        pos = np.searchsorted(self.vocab, values)
+        pos_clipped = np.minimum(pos, len(self.vocab) - 1)
+        return np.where(self.vocab[pos_clipped] == values, pos_clipped + 1, 0)
+
+    def matches(self, lo: int, hi: int):
+        """
+        文件1起始位置在 [lo, hi) 内的全部匹配，按 (start1, start2) 升序
+
+        Returns:
+            tuple: (文件1起始位置数组, 文件2起始位置数组)
+        """
+        if hi <= lo:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        rows = np.arange(lo, hi)
+        codes = np.zeros((len(rows), 1), dtype=np.int64)
+        valid = np.ones((len(rows), 1), dtype=bool)
+        for t in range(self.hashed):
+            q = self.q1[rows + t]
+            neighbor_ranks = np.stack([self._rank1(q + d) for d in (-1, 0, 1)], axis=1)
+            codes = (codes[:, :, None] + neighbor_ranks[:, None, :] * self.base ** t).reshape(len(rows), -1)
+            valid = (valid[:, :, None] & (neighbor_ranks[:, None, :] > 0)).reshape(len(rows), -1)
+
+        left = np.searchsorted(self.sorted_codes2, codes, side='left')
+        right = np.searchsorted(self.sorted_codes2, codes, side='right')
+        counts = np.where(valid, right - left, 0).ravel()
+        total = int(counts.sum())
+        if total == 0:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        # 展开每个组合命中的区间
+        starts1 = np.repeat(np.repeat(rows, codes.shape[1]), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        starts2 = self.order2[np.repeat(left.ravel(), counts) + offsets]
+
+        # 用原判据逐位验证
+        keep = np.ones(total, dtype=bool)
+        for t in range(self.k):
+            keep &= np.abs(self.r1[starts1 + t] - self.r2[starts2 + t]) < self.abs_threshold
+        starts1, starts2 = starts1[keep], starts2[keep]
+        order = np.lexsort((starts2, starts1))
+        return starts1[order], starts2[order]
+
+
+def select_weld_thresholds(statistics: Dict[str, float]) -> Tuple[float, float]:
+    """
+    根据相对距离统计特征确定环焊缝匹配的绝对/相对误差阈值
+
+    Args:
+        statistics: calculate_weld_statistics 的结果
+
+    Returns:
+        tuple: (绝对距离阈值, 相对距离阈值)
+    """
+    mean_redis = statistics['filtered_mean']
+    if mean_redis < 5.0:  # 小距离
+        return 0.2, 0.07
+    elif mean_redis < 15.0:  # 中等距离
+        return 0.3, 0.06
+    else:  # 大距离
+        return 0.5, 0.05
+
+
 def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1: List[float], redis1: List[float],
                                  weld_numbers2: List[str], absolute_distances2: List[float], redis2: List[float],
-                                 base_distance: float = 50.0, similarity_threshold: float = 0.1) -> WeldAlignment:
+                                 base_distance: float = 50.0, similarity_threshold: float = 0.1,
+                                 statistics: Optional[Dict[str, float]] = None) -> WeldAlignment:
     """
     改进的环焊缝对齐算法 - 保留初始匹配，后续使用基于固定距离的累加匹配方法
 
@@ -856,6 +1227,7 @@ def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1:
         redis2: 文件2相对距离列表
         base_distance: 基础距离阈值（米），默认为50米
         similarity_threshold: 相似度阈值，默认为0.1（10%）
+        statistics: calculate_weld_statistics 的结果，为 None 时重新计算（多个基础距离共用同一份）
 
     Returns:
         WeldAlignment: 环焊缝对齐结果
@@ -863,7 +1235,8 @@ def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1:
     result = WeldAlignment()
     result.base_distance = base_distance  # 记录使用的基础距离
 
-    statistics = calculate_weld_statistics(redis1, redis2)
+    if statistics is None:
+        statistics = calculate_weld_statistics(redis1, redis2)
     cv = statistics['filtered_cv']
     mean_redis = statistics['filtered_mean']
     std_redis = statistics['filtered_std']
@@ -880,15 +1253,7 @@ def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1:
         similarity_threshold = 0.25
 
     # 环焊缝相似度
-    if mean_redis < 5.0:  # 小距离
-        abs_threshold = 0.2
-        rel_threshold = 0.07
-    elif mean_redis < 15.0:  # 中等距离
-        abs_threshold = 0.3
-        rel_threshold = 0.06
-    else:  # 大距离
-        abs_threshold = 0.5
-        rel_threshold = 0.05
+    abs_threshold, rel_threshold = select_weld_thresholds(statistics)
 
     len1, len2 = len(redis1), len(redis2)
     if len1 < 5 or len2 < 5:
@@ -898,37 +1263,18 @@ def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1:
         min_match_count = 4
         # threshold = 0.2
 
-    # 保留原有的起始点匹配逻辑
-    found_start = False
-    max_search_distance = min(len(redis1), len(redis2)) // 2  # 最大搜索距离
+    # 起始点匹配：在全部环焊缝范围内索引化查找（不再限制为前 50 个）
     begin1, begin2, num1, num2 = 0, 0, 0, 0
     weld1_idx, weld2_idx = 0, 0
     match_count = 0
 
-    # 搜索匹配的起始点
-    for start1 in range(min(50, len(redis1))):  # 限制搜索范围，避免性能问题
-        for start2 in range(min(50, len(redis2))):
-            count = 0
-            i, j = start1, start2
-            # 检查从当前起始点开始的连续匹配
-            while i < len(redis1) and j < len(redis2) and count < min_match_count:
-                if abs(redis1[i] - redis2[j]) < abs_threshold:
-                    count += 1
-                    i += 1
-                    j += 1
-                else:
-                    break
-
-            if count >= min_match_count:  # 找到匹配的起始点
-                begin1 = start1
-                begin2 = start2
-                num1 = start1 + count
-                num2 = start2 + count
-                match_count = count
-                found_start = True
-                break
-        if found_start:
-            break
+    start = find_alignment_start(redis1, redis2, abs_threshold, min_match_count)
+    found_start = start is not None
+    if found_start:
+        begin1, begin2 = start
+        match_count = min_match_count
+        num1 = begin1 + match_count
+        num2 = begin2 + match_count
 
     if not found_start:
         # 如果没有找到匹配的起始点，使用默认的起始点
@@ -961,15 +1307,29 @@ def comprehensive_weld_alignment(weld_numbers1: List[str], absolute_distances1:
                     redis2=redis2[i] if i > 0 else 0
                 )
                 weld2_idx += 1
-        result.add_alignment(weld1=weld_numbers1[begin1 - 1],
-                             dist1=absolute_distances1[begin1 - 1],
-                             redis1=redis1[begin1 - 1],
-                             weld2=weld_numbers2[begin2 - 1],
-                             dist2=absolute_distances2[begin2 - 1],
-                             redis2=redis2[begin2 - 1]
-                             )
-        weld1_idx += 1
-        weld2_idx += 1
+        # 起始段前一个环焊缝配对；起始点位于文件开头时前面没有环焊缝
+        # （不能用 begin - 1 = -1 取到最后一个环焊缝，否则会重复写入末尾环焊缝并跳过起始段之后的一个）
+        if begin1 > 0 and begin2 > 0:
+            result.add_alignment(weld1=weld_numbers1[begin1 - 1],
+                                 dist1=absolute_distances1[begin1 - 1],
+                                 redis1=redis1[begin1 - 1],
+                                 weld2=weld_numbers2[begin2 - 1],
+                                 dist2=absolute_distances2[begin2 - 1],
+                                 redis2=redis2[begin2 - 1]
+                                 )
+            weld1_idx += 1
+            weld2_idx += 1
+        elif begin1 > 0:
+            result.add_alignment(weld1=weld_numbers1[begin1 - 1],
+                                 dist1=absolute_distances1[begin1 - 1],
+                                 redis1=redis1[begin1 - 1])
+            weld1_idx += 1
+        elif begin2 > 0:
+            result.add_alignment(weld2=weld_numbers2[begin2 - 1],
+                                 dist2=absolute_distances2[begin2 - 1],
+                                 redis2=redis2[begin2 - 1])
+            weld2_idx += 1
+
 
         # 写入匹配的起始段
         for i in range(match_count):
@@ -1312,12 +1672,23 @@ def align_single_weld(result, weld_numbers1, absolute_distances1, redis1,
     return False
 
 
-def align_defects_with_comprehensive_mapping(defects1: List[Dict], defects2: List[Dict],
-                                             weld_alignment: WeldAlignment, thresholds: Dict = None, min_confidence = 0.6) -> pd.DataFrame:
+def align_defects_with_comprehensive_mapping(defects1: DefectTable, defects2: DefectTable,
+                                             weld_alignment: WeldAlignment, thresholds: Dict = None, min_confidence = 0.6,
+                                             assignment: str = 'greedy') -> pd.DataFrame:
     """
     使用全面的环焊缝对齐结果进行缺陷对齐，包括未对齐环焊缝的缺陷
     确保每个未匹配缺陷仅出现一次
+
+    defects1/defects2 为 DefectTable（也兼容旧的缺陷字典列表），缺陷以整数行号标识。
+    assignment 为已对齐环焊缝内的缺陷匹配方式：'greedy' 按文件1顺序逐个取最佳候选，
+    'optimal' 在每个环焊缝内求一对一最优分配（见 defect_assignment，需要 scipy，缺失时回退到 'greedy'）
     """
+    if assignment not in ('greedy', 'optimal'):
+        raise ValueError(f"未知的缺陷匹配方式: {assignment}")
+
+    defects1 = as_defect_table(defects1)
+    defects2 = as_defect_table(defects2)
+
     if thresholds is None:
         thresholds = {
             'distance': 1.0,  # 距离阈值（米）
@@ -1327,26 +1698,34 @@ def align_defects_with_comprehensive_mapping(defects1: List[Dict], defects2: Lis
             'depth': 2,  # 深度阈值（%或mm）
         }
 
-    # 初始化结果DataFrame
-    result_columns = [
-        '文件1缺陷ID', '文件1环焊缝', '文件1到焊缝距离', '文件1时钟方位',
-        '文件1缺陷类型', '文件1深度', '文件1长度', '文件1宽度', '文件1注释', '文件1绝对距离',
-        '文件2缺陷ID', '文件2环焊缝', '文件2到焊缝距离', '文件2时钟方位',
-        '文件2缺陷类型', '文件2深度', '文件2长度', '文件2宽度', '文件2注释', '文件2绝对距离',
-        '匹配置信度', '匹配说明', '匹配类型'
-    ]
-    result_df = pd.DataFrame(columns=result_columns)
+    # 结果只记录缺陷行号和匹配信息，最后一次性生成 DataFrame
+    results = DefectAlignmentRows()
 
-    matched_defects2 = set()
-    processed_defects1 = set()  # 跟踪已处理的文件1缺陷
+    matched_defects2 = np.zeros(len(defects2), dtype=bool)  # 已匹配的文件2缺陷
+    processed_defects1 = np.zeros(len(defects1), dtype=bool)  # 已处理的文件1缺陷
+
+    # 文件2缺陷按环焊缝分组（只建一次），每个文件1缺陷只查看其对应环焊缝下的缺陷
+    defects2_by_weld = defects2.weld_buckets()
+
+    # 最优分配：预先求出所有已对齐环焊缝内的一对一匹配，第一阶段直接取用
+    assigned = None
+    if assignment == 'optimal':
+        # 避免循环导入：最优分配依赖本模块的相似度计算
+        from Tools.align_tools.defect_assignment import assign_defects_by_weld, optimal_assignment_available
+
+        if optimal_assignment_available():
+            print("按环焊缝求缺陷最优分配...")
+            assigned = assign_defects_by_weld(defects1, defects2, weld_alignment, thresholds, min_confidence)
+        else:
+            print("未安装 scipy，缺陷匹配改为贪心方式")
 
     # 第一阶段：处理已对齐环焊缝的缺陷
     print("第一阶段：处理已对齐环焊缝的缺陷...")
-    for defect1 in defects1:
-        defect1_id = id(defect1)
-        if defect1_id in processed_defects1:
+    for defect1_id in range(len(defects1)):
+        if processed_defects1[defect1_id]:
             continue  # 跳过已处理的缺陷
 
+        defect1 = defects1.record(defect1_id)
         best_match = None
         best_confidence = 0
         best_explanation = ""
@@ -1356,162 +1735,125 @@ def align_defects_with_comprehensive_mapping(defects1: List[Dict], defects2: Lis
         mapped_weld2 = weld_alignment.get_file2_weld(weld1)
 
         if mapped_weld2:
-            # 在文件2中查找相同焊缝的缺陷
-            candidate_defects = []
-            for defect2 in defects2:
-                if (defect2['weld_number'] == mapped_weld2 and
-                        id(defect2) not in matched_defects2):
-                    candidate_defects.append(defect2)
-
-            for defect2 in candidate_defects:
-                confidence, explanation = calculate_defect_similarity(defect1, defect2, thresholds)
-
-                if confidence > best_confidence:
-                    best_match = defect2
-                    best_confidence = confidence
-                    best_explanation = explanation
-
-            if best_match and best_confidence >= min_confidence:
-                matched_defects2.add(id(best_match))
+            if assigned is not None:
+                # 取预先求出的最优分配结果
+                best_match, best_confidence, best_explanation = assigned[defect1_id]
+            else:
+                # 在文件2中查找相同焊缝的缺陷
+                bucket = defects2_by_weld.get(mapped_weld2)
+                candidate_defects = bucket[~matched_defects2[bucket]] if bucket is not None else bucket
+
+                if candidate_defects is not None and len(candidate_defects):
+                    # 整批计算相似度，只为最佳候选生成说明
+                    confidences, scores = calculate_defect_similarity_block(
+                        defects1, defect1_id, defects2, candidate_defects, thresholds
+                    )
+                    best = _best_candidate(confidences)
+                    if best is not None:
+                        best_match = int(candidate_defects[best])
+                        best_confidence = float(confidences[best])
+                        best_explanation = _similarity_explanation(
+                            scores['distance'][best], scores['clock'][best], scores['type'][best]
+                        )
+
+            if best_match is not None and best_confidence >= min_confidence:
+                matched_defects2[best_match] = True
                 match_type = "环焊缝对齐匹配"
-                result_df = _append_defect_alignment_result(
-                    result_df, defect1, best_match, best_confidence, best_explanation, match_type
-                )
-                processed_defects1.add(defect1_id)  # 标记为已处理
+                results.add(defect1_id, best_match, best_confidence, best_explanation, match_type)
+                processed_defects1[defect1_id] = True  # 标记为已处理
             else:
                 match_type = "环焊缝对齐但缺陷未匹配"
-                result_df = _append_defect_alignment_result(
-                    result_df, defect1, None, best_confidence,
-                    f"未找到匹配缺陷" if not best_match else f"置信度过低: {best_confidence:.2f}",
+                results.add(
+                    defect1_id, None, best_confidence,
+                    f"未找到匹配缺陷" if best_match is None else f"置信度过低: {best_confidence:.2f}",
                     match_type
                 )
-                processed_defects1.add(defect1_id)  # 标记为已处理
+                processed_defects1[defect1_id] = True  # 标记为已处理
 
     # 第二阶段：处理未对齐环焊缝的缺陷（仅处理第一阶段未处理的）
     print("第二阶段：处理未对齐环焊缝的缺陷...")
-    for defect1 in defects1:
-        defect1_id = id(defect1)
-        if defect1_id in processed_defects1:
-            continue  # 跳过已处理的缺陷
-
+    # 用全部已配对环焊缝拟合文件1 -> 文件2 的分段线性里程换算，一次算出所有待处理缺陷在文件2中的预期位置
+    unanchored_defects1 = np.flatnonzero(~processed_defects1).tolist()
+    expected_distances2 = weld_alignment.project_to_file2(defects1.absolute_distance[unanchored_defects1])
+    # 候选范围：预期位置 ± 2 倍距离阈值（放宽距离阈值）；对文件2缺陷的绝对距离排序后一次性批量二分查找所有窗口
+    search_radius = thresholds['distance'] * 2
+    if expected_distances2 is not None:
+        distance_order2, window_lo, window_hi = defects2.distance_windows(expected_distances2, search_radius)
+
+    for position, defect1_id in enumerate(unanchored_defects1):
         best_match = None
         best_confidence = 0
         best_explanation = ""
         match_type = "未匹配"
 
-        defect1_abs_distance = defect1.get('absolute_distance', 0)
+        if expected_distances2 is not None:
+            expected_distance2 = expected_distances2[position]
 
-        # 查找最近的已对齐环焊缝
-        nearest_aligned = weld_alignment.get_nearest_aligned_weld1(defect1_abs_distance)
+            # 在文件2中查找距离最近的未匹配缺陷
+            window = distance_order2[window_lo[position]:window_hi[position]]
+            window = window[~matched_defects2[window]]
+            distance_diffs = np.abs(defects2.absolute_distance[window] - expected_distance2)
+            in_range = distance_diffs < search_radius
+            window, distance_diffs = window[in_range], distance_diffs[in_range]
 
-        if nearest_aligned:
-            # 计算相对于最近对齐环焊缝的相对距离
-            relative_distance = defect1_abs_distance - nearest_aligned['distance']
-            expected_distance2 = nearest_aligned['aligned_distance2'] + relative_distance
+            # 按距离排序（距离相同时按行号），选择最近的几个候选
+            nearest = np.lexsort((window, distance_diffs))[:5]  # 只考虑前5个最近的候选
+            candidate_defects, candidate_diffs = window[nearest], distance_diffs[nearest]
 
-            # 在文件2中查找距离最近的缺陷
-            candidate_defects = []
-            for defect2 in defects2:
-                if id(defect2) not in matched_defects2:
-                    defect2_abs_distance = defect2.get('absolute_distance', 0)
-                    distance_diff = abs(defect2_abs_distance - expected_distance2)
-                    if distance_diff < thresholds['distance'] * 2:  # 放宽距离阈值
-                        candidate_defects.append((defect2, distance_diff))
-
-            # 按距离排序，选择最近的几个候选
-            candidate_defects.sort(key=lambda x: x[1])
-            candidate_defects = candidate_defects[:5]  # 只考虑前5个最近的候选
-
-            for defect2, dist_diff in candidate_defects:
-                confidence, explanation = calculate_defect_similarity(defect1, defect2, thresholds)
+            if len(candidate_defects):
+                confidences, scores = calculate_defect_similarity_block(
+                    defects1, defect1_id, defects2, candidate_defects, thresholds
+                )
 
                 # 根据距离差异调整置信度
-                distance_penalty = dist_diff / (thresholds['distance'] * 2)
-                adjusted_confidence = max(0, confidence - distance_penalty * 0.3)
-
-                if adjusted_confidence > best_confidence:
-                    best_match = defect2
-                    best_confidence = adjusted_confidence
+                distance_penalty = candidate_diffs / search_radius
+                adjusted_confidences = _clamp_score(confidences - distance_penalty * 0.3)
+
+                best = _best_candidate(adjusted_confidences)
+                if best is not None:
+                    best_match = int(candidate_defects[best])
+                    best_confidence = float(adjusted_confidences[best])
+                    explanation = _similarity_explanation(
+                        scores['distance'][best], scores['clock'][best], scores['type'][best]
+                    )
                     best_explanation = f"{explanation}; 基于相对距离匹配"
 
-            if best_match and best_confidence >= min_confidence * 0.8:  # 降低阈值
-                matched_defects2.add(id(best_match))
+            if best_match is not None and best_confidence >= min_confidence * 0.8:  # 降低阈值
+                matched_defects2[best_match] = True
                 match_type = "相对距离匹配"
-                result_df = _append_defect_alignment_result(
-                    result_df, defect1, best_match, best_confidence, best_explanation, match_type
-                )
+                results.add(defect1_id, best_match, best_confidence, best_explanation, match_type)
             else:
                 match_type = "未匹配"
-                result_df = _append_defect_alignment_result(
-                    result_df, defect1, None, best_confidence,
-                    f"基于相对距离未找到匹配缺陷", match_type
-                )
+                results.add(defect1_id, None, best_confidence, f"基于相对距离未找到匹配缺陷", match_type)
         else:
             # 没有找到已对齐的环焊缝作为参考
             match_type = "未匹配"
-            result_df = _append_defect_alignment_result(
-                result_df, defect1, None, 0,
-                f"无法确定参考环焊缝", match_type
-            )
+            results.add(defect1_id, None, 0, f"无法确定参考环焊缝", match_type)
 
-        processed_defects1.add(defect1_id)  # 标记为已处理
+        processed_defects1[defect1_id] = True  # 标记为已处理
 
     # 第三阶段：处理文件2中剩余的未匹配缺陷
     print("第三阶段：处理文件2中剩余的未匹配缺陷...")
-    for defect2 in defects2:
-        if id(defect2) not in matched_defects2:
-            weld2 = defect2['weld_number']
-            mapped_weld1 = weld_alignment.get_file1_weld(weld2)
+    for defect2_id in np.flatnonzero(~matched_defects2).tolist():
+        defect2 = defects2.record(defect2_id)
+        weld2 = defect2['weld_number']
+        mapped_weld1 = weld_alignment.get_file1_weld(weld2)
 
-            if mapped_weld1:
-                explanation = f"环焊缝已对齐，但缺陷无对应"
+        if mapped_weld1:
+            explanation = f"环焊缝已对齐，但缺陷无对应"
+        else:
+            # 尝试基于相对距离匹配
+            defect2_abs_distance = defect2.get('absolute_distance', 0)
+            # print(type(defect2_abs_distance))
+            nearest_aligned = weld_alignment.get_nearest_aligned_weld2(defect2_abs_distance)
+            if nearest_aligned:
+                explanation = f"基于相对距离未找到匹配"
             else:
-                # 尝试基于相对距离匹配
-                defect2_abs_distance = defect2.get('absolute_distance', 0)
-                # print(type(defect2_abs_distance))
-                nearest_aligned = weld_alignment.get_nearest_aligned_weld2(defect2_abs_distance)
-                if nearest_aligned:
-                    explanation = f"基于相对距离未找到匹配"
-                else:
-                    explanation = f"环焊缝{weld2}在文件1中无对应"
+                explanation = f"环焊缝{weld2}在文件1中无对应"
 
-            result_df = _append_defect_alignment_result(
-                result_df, None, defect2, 0, explanation, "文件2未匹配缺陷"
-            )
+        results.add(None, defect2_id, 0, explanation, "文件2未匹配缺陷")
 
-    return result_df
-
-
-def _append_defect_alignment_result(df, defect1, defect2, confidence, explanation, match_type):
-    """
-    向缺陷对齐结果DataFrame添加一行数据
-    """
-    new_row = {
-        '文件1缺陷ID': defect1['original_index'] if defect1 else '',
-        '文件1环焊缝': defect1['weld_number'] if defect1 else '',
-        '文件1到焊缝距离': f"{defect1['distance_to_weld']:.3f}" if defect1 else '',
-        '文件1时钟方位': f"{defect1['clock_position']:.1f}" if defect1 else '',
-        '文件1缺陷类型': defect1.get('defect_type', '') if defect1 else '',
-        '文件1深度': f"{defect1['depth']:.2f}" if defect1 else '',
-        '文件1长度': f"{defect1['length']:.1f}" if defect1 else '',
-        '文件1宽度': f"{defect1['width']:.1f}" if defect1 else '',
-        '文件1注释': defect1.get('comment', '') if defect1 else '',
-        '文件1绝对距离': f"{defect1.get('absolute_distance', 0):.3f}" if defect1 else '',
-        '文件2缺陷ID': defect2['original_index'] if defect2 else '',
-        '文件2环焊缝': defect2['weld_number'] if defect2 else '',
-        '文件2到焊缝距离': f"{defect2['distance_to_weld']:.3f}" if defect2 else '',
-        '文件2时钟方位': f"{defect2['clock_position']:.1f}" if defect2 else '',
-        '文件2缺陷类型': defect2.get('defect_type', '') if defect2 else '',
-        '文件2深度': f"{defect2['depth']:.2f}" if defect2 else '',
-        '文件2长度': f"{defect2['length']:.1f}" if defect2 else '',
-        '文件2宽度': f"{defect2['width']:.1f}" if defect2 else '',
-        '文件2注释': defect2.get('comment', '') if defect2 else '',
-        '文件2绝对距离': f"{defect2.get('absolute_distance', 0):.3f}" if defect2 else '',
-        '匹配置信度': f"{confidence:.3f}" if confidence > 0 else '',
-        '匹配说明': explanation,
-        '匹配类型': match_type
-    }
-    return pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+    return results.to_frame(defects1, defects2)
 
 
 def sort_weld_alignment_results(weld_alignment: WeldAlignment) -> List[Dict]:
@@ -1524,46 +1866,8 @@ def sort_weld_alignment_results(weld_alignment: WeldAlignment) -> List[Dict]:
     Returns:
         List[Dict]: 排序后的环焊缝对齐结果
     """
-    # 合并所有焊缝数据
-    all_welds = []
-
-    # 添加对齐的焊缝
-    for alignment in weld_alignment.alignments:
-        if alignment['file1_distance'] != 0 and alignment['file2_distance'] != 0:
-            all_welds.append({
-                '类型': '对齐',
-                '文件1环焊缝': alignment['file1_weld'],
-                '文件1绝对距离': alignment['file1_distance'],
-                '文件1相对距离': alignment['file1_redis'],
-                '文件2环焊缝': alignment['file2_weld'],
-                '文件2绝对距离': alignment['file2_distance'],
-                '文件2相对距离': alignment['file2_redis'],
-                '对齐置信度': alignment['confidence']
-            })
-        elif alignment['file1_distance'] == 0:
-            all_welds.append({
-                '类型': '文件2未对齐',
-                '文件1环焊缝': alignment['file1_weld'],
-                '文件1绝对距离': alignment['file1_distance'],
-                '文件1相对距离': alignment['file1_redis'],
-                '文件2环焊缝': alignment['file2_weld'],
-                '文件2绝对距离': alignment['file2_distance'],
-                '文件2相对距离': alignment['file2_redis'],
-                '对齐置信度': alignment['confidence']
-            })
-        else:
-            all_welds.append({
-                '类型': '文件1未对齐',
-                '文件1环焊缝': alignment['file1_weld'],
-                '文件1绝对距离': alignment['file1_distance'],
-                '文件1相对距离': alignment['file1_redis'],
-                '文件2环焊缝': alignment['file2_weld'],
-                '文件2绝对距离': alignment['file2_distance'],
-                '文件2相对距离': alignment['file2_redis'],
-                '对齐置信度': alignment['confidence']
-            })
-
-    return all_welds
+    # 合并所有焊缝数据（报告表直接由列式存储生成，需要 DataFrame 时请使用 weld_alignment.to_report_frame()）
+    return weld_alignment.to_report_frame().to_dict('records')
 
 
 def sort_defect_alignment_results(defect_alignment_df: pd.DataFrame) -> pd.DataFrame:
@@ -1577,38 +1881,34 @@ def sort_defect_alignment_results(defect_alignment_df: pd.DataFrame) -> pd.DataF
         pd.DataFrame: 排序后的缺陷对齐结果
     """
 
-    # 创建排序键：优先使用文件1绝对距离，如果为空则使用文件2绝对距离
-    def get_sort_key(row):
-        if row['文件1绝对距离'] != '':
-            try:
-                return float(row['文件1绝对距离'])
-            except:
-                return float('inf')
-        elif row['文件2绝对距离'] != '':
-            try:
-                return float(row['文件2绝对距离'])
-            except:
-                return float('inf')
-        else:
-            return float('inf')
-
-    # 添加排序键
-    sort_keys = defect_alignment_df.apply(get_sort_key, axis=1)
+    # 创建排序键：优先使用文件1绝对距离，如果为空则使用文件2绝对距离（两者都为空时排在最后）
+    distance1 = pd.to_numeric(defect_alignment_df['文件1绝对距离'], errors='coerce')
+    distance2 = pd.to_numeric(defect_alignment_df['文件2绝对距离'], errors='coerce')
+    sort_keys = distance1.fillna(distance2).fillna(float('inf')).to_numpy()
 
     # 按排序键排序
-    sorted_indices = sort_keys.argsort()
+    sorted_indices = np.argsort(sort_keys, kind='stable')
     sorted_df = defect_alignment_df.iloc[sorted_indices].reset_index(drop=True)
 
     return sorted_df
 
 
-def calculate_base_distances_from_data(rel_dist1: List[float], rel_dist2: List[float]) -> List[float]:
+# 基础距离候选 = 倍数 × (均值 + 标准差)，按优先级排列；前 3 个为原先使用的取值
+BASE_DISTANCE_MULTIPLIERS = (1, 5, 10, 2, 3, 7, 15, 20, 1.5, 4)
+
+# 环焊缝对齐默认尝试的基础距离候选数量（全部倍数）
+DEFAULT_BASE_DISTANCE_CANDIDATES = len(BASE_DISTANCE_MULTIPLIERS)
+
+
+def calculate_base_distances_from_data(rel_dist1: List[float], rel_dist2: List[float],
+                                       max_candidates: int = 3) -> List[float]:
     """
     根据相对距离数据的统计特征计算基础距离值
 
     Args:
         rel_dist1: 文件1相对距离列表
         rel_dist2: 文件2相对距离列表
+        max_candidates: 候选数量，取 BASE_DISTANCE_MULTIPLIERS 中前若干个倍数（默认3个）
 
     Returns:
         List[float]: 计算得到的基础距离值列表
@@ -1646,9 +1946,8 @@ def calculate_base_distances_from_data(rel_dist1: List[float], rel_dist2: List[f
 
     # 添加基于标准差的值
     if std_val > 0:
-        base_distances.add(round(mean_val + std_val, 1))
-        base_distances.add(round(5 * (mean_val + std_val), 1))
-        base_distances.add(round(10 * (mean_val + std_val), 1))
+        for multiplier in BASE_DISTANCE_MULTIPLIERS[:max_candidates]:
+            base_distances.add(round(multiplier * (mean_val + std_val), 1))
         # base_distances.add(round(10 * (mean_val + std_val), 1))
         # base_distances.add(10)
 
@@ -1661,15 +1960,25 @@ def calculate_base_distances_from_data(rel_dist1: List[float], rel_dist2: List[f
 
     filtered_base_distances = [math.ceil(d) for d in base_distances if min_distance <= d <= max_distance]
 
-    # 排序并返回前5个值
-    filtered_base_distances.sort()
-    return filtered_base_distances[:3]
+    # 去重、排序并返回
+    filtered_base_distances = sorted(set(filtered_base_distances))
+    return filtered_base_distances[:max_candidates]
 
 
-def find_best_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1, weld_nums2_str, abs_dist2, rel_dist2):
+# 环焊缝总数少于该值时顺序计算，进程池的启动开销不划算
+PARALLEL_SWEEP_MIN_WELDS = 20000
+
+
+def find_best_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1, weld_nums2_str, abs_dist2, rel_dist2,
+                             max_candidates: int = DEFAULT_BASE_DISTANCE_CANDIDATES, parallel: bool = True,
+                             max_workers: Optional[int] = None, engine: str = 'greedy', tiling: bool = False):
     """
     尝试不同的基础距离值，找到环焊缝对齐数最高的结果
 
+    各基础距离的对齐互不依赖，数据量较大时在进程池中并行计算；
+    统计特征只计算一次，所有候选共用。结果按候选顺序比较（对齐数严格更多才替换），
+    与顺序执行完全一致。
+
     Args:
         weld_nums1_str: 文件1环焊缝编号字符串列表
         abs_dist1: 文件1绝对距离列表
@@ -1677,12 +1986,41 @@ def find_best_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1, weld_nums2_st
         weld_nums2_str: 文件2环焊缝编号字符串列表
         abs_dist2: 文件2绝对距离列表
         rel_dist2: 文件2相对距离列表
+        max_candidates: 基础距离候选数量，默认尝试 BASE_DISTANCE_MULTIPLIERS 中的全部倍数
+        parallel: 是否并行计算
+        max_workers: 进程数，默认为 CPU 核数
+        engine: 对齐引擎，'greedy' 为分段累加匹配，'dp' 为带状动态规划（不使用基础距离，返回 0）
+        tiling: 是否按锚点分块并行对齐（适用于超长管线）
 
     Returns:
         tuple: (最佳环焊缝对齐结果, 最佳基础距离值)
     """
+    if engine not in ('greedy', 'dp'):
+        raise ValueError(f"未知的环焊缝对齐引擎: {engine}")
+
+    if tiling:
+        # 避免循环导入：分块对齐依赖本模块的对齐函数
+        from Tools.align_tools.tiled_alignment import tiled_weld_alignment
+
+        return tiled_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1,
+                                    weld_nums2_str, abs_dist2, rel_dist2,
+                                    engine=engine, max_candidates=max_candidates,
+                                    parallel=parallel, max_workers=max_workers)
+
+    statistics = calculate_weld_statistics(rel_dist1, rel_dist2)
+    if engine == 'dp':
+        # 避免循环导入：动态规划引擎依赖本模块的 WeldAlignment
+        from Tools.align_tools.dp_alignment import dp_weld_alignment
+
+        print("使用动态规划引擎进行环焊缝对齐...")
+        weld_alignment = dp_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1,
+                                           weld_nums2_str, abs_dist2, rel_dist2,
+                                           statistics=statistics)
+        print(f"动态规划对齐 {weld_alignment.aligned_count} 对环焊缝")
+        return weld_alignment, 0
+
     # 根据数据统计特征计算基础距离值
-    base_distances = calculate_base_distances_from_data(rel_dist1, rel_dist2)
+    base_distances = calculate_base_distances_from_data(rel_dist1, rel_dist2, max_candidates)
 
     best_alignment = None
     best_base_distance = 0
@@ -1691,21 +2029,35 @@ def find_best_weld_alignment(weld_nums1_str, abs_dist1, rel_dist1, weld_nums2_st
     print("正在尝试不同的基础距离值...")
     print(f"尝试的基础距离值: {base_distances}")
 
-    for base_distance in base_distances:
-        print(f"\n尝试基础距离: {base_distance}米")
-        weld_alignment = comprehensive_weld_alignment(
-            weld_nums1_str, abs_dist1, rel_dist1,
-            weld_nums2_str, abs_dist2, rel_dist2,
-            base_distance=base_distance,
-            similarity_threshold=0.1
-        )
+    args = (weld_nums1_str, abs_dist1, rel_dist1, weld_nums2_str, abs_dist2, rel_dist2)
+    alignments = None
+    if parallel and len(base_distances) > 1 and len(rel_dist1) + len(rel_dist2) >= PARALLEL_SWEEP_MIN_WELDS:
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(base_distances), max_workers or os.cpu_count() or 1)) as executor:
+                futures = [executor.submit(comprehensive_weld_alignment, *args,
+                                           base_distance=base_distance, similarity_threshold=0.1,
+                                           statistics=statistics)
+                           for base_distance in base_distances]
+                alignments = [future.result() for future in futures]
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            print(f"并行对齐失败，改为顺序计算: {e}")
+            alignments = None
+
+    for idx, base_distance in enumerate(base_distances):
+        if alignments is not None:
+            weld_alignment = alignments[idx]
+        else:
+            print(f"\n尝试基础距离: {base_distance}米")
+            weld_alignment = comprehensive_weld_alignment(
+                *args,
+                base_distance=base_distance,
+                similarity_threshold=0.1,
+                statistics=statistics
+            )
 
         aligned_count = weld_alignment.aligned_count
         print(f"基础距离 {base_distance}米: 对齐 {aligned_count} 对环焊缝")
-        # print(aligned_count, max_aligned_count)
-        # print(aligned_count > max_aligned_count)
         if aligned_count > max_aligned_count:
-            # print("in")
             max_aligned_count = aligned_count
             best_alignment = weld_alignment
             best_base_distance = base_distance
@@ -1726,9 +2078,12 @@ def get_sheet_names(file_path):
         List[str]: 工作表名称列表
     """
     try:
+        # CSV / Parquet 没有工作表，视为单个工作表
+        if os.path.splitext(file_path)[1].lower() not in ('.xlsx', '.xlsm', '.xls', '.xlsb', '.ods'):
+            return ['Sheet1']
         # 使用ExcelFile获取所有工作表名称
-        excel_file = pd.ExcelFile(file_path)
-        sheet_names = excel_file.sheet_names
+        with pd.ExcelFile(file_path, engine=select_excel_engine(file_path)) as excel_file:
+            sheet_names = excel_file.sheet_names
         return sheet_names
     except Exception as e:
         print(f"获取工作表名称时出错: {e}")
@@ -1737,20 +2092,28 @@ def get_sheet_names(file_path):
 
 
 @tool
-def step1_analyze_pipeline_data(filename1: str, filename2: str):
+def step1_analyze_pipeline_data(filename1: str, filename2: str, engine: str = "greedy", tiling: bool = False,
+                                max_candidates: int = DEFAULT_BASE_DISTANCE_CANDIDATES):
     """
     第一阶段：数据读取与初步分析
     
     功能：
-    1. 读取 Excel 文件。
+    1. 读取 Excel 文件（也支持 CSV / Parquet）。
     2. 进行环焊缝对齐。
     3. 读取缺陷数据。
     4. 分析缺陷分布并生成 metric 向量。
+
+    Args:
+        filename1 (str): 第一个文件名
+        filename2 (str): 第二个文件名
+        engine (str): 环焊缝对齐引擎，"greedy"（默认，分段累加）或 "dp"（动态规划）
+        tiling (bool): 是否按锚点分块并行对齐，适用于上百公里的长管线
+        max_candidates (int): 尝试的基础距离候选数量（最多 10 个，取 3 即原先的 1/5/10 倍三个取值）
     
     Returns:
         dict: 包含所有中间数据的字典，如果出错则返回 None。
               包含 keys: 'metric', 'defects1', 'defects2', 'weld_alignment', 
-                        'filename1', 'filename2', 'best_base_distance', 'df1', 'df2'
+                        'filename1', 'filename2', 'best_base_distance', 'aligned_count', 'context_handle'
         str: 错误信息（如果成功则为 None）
     """
     base_dir = os.path.join(os.getcwd(), "UploadedFiles")
@@ -1763,18 +2126,20 @@ def step1_analyze_pipeline_data(filename1: str, filename2: str):
     if not os.path.exists(file2_path): return None, f"错误：找不到文件 {filename2}"
 
     try:
-        print("正在读取文件1...")
-        sheet_names1 = get_sheet_names(file1_path)
-        df1 = pd.read_excel(file1_path, sheet_name=sheet_names1[0])
-
-        print("正在读取文件2...")
-        sheet_names2 = get_sheet_names(file2_path)
-        df2 = pd.read_excel(file2_path, sheet_name=sheet_names2[0])
-
-        # 读取环焊缝数据
-        print("正在提取环焊缝数据...")
-        abs_dist1, rel_dist1, weld_nums1 = read_weld_data(df1)
-        abs_dist2, rel_dist2, weld_nums2 = read_weld_data(df2)
+        # 同样的两个文件（按内容哈希）和对齐参数已经算过时，直接复用环焊缝对齐与缺陷提取结果
+        # （先查进程内缓存，再查磁盘上的对齐产物；专家只修改缺陷阈值时只需重新运行第二阶段）
+        artifact_key = alignment_artifact_key(file1_path, file2_path, engine=engine, tiling=tiling,
+                                              max_candidates=max_candidates)
+        cached = get_cached_artifact(artifact_key, filename1, filename2)
+        if cached is not None:
+            print("输入文件与对齐参数未变化，复用已有的环焊缝对齐与缺陷数据")
+            return cached, None
+
+        # 读取两个文件并提取环焊缝、缺陷数据（两个文件在子进程中并行解析；
+        # 按文件内容哈希缓存，未变化的文件不再解析 Excel）
+        print("正在读取文件1和文件2...")
+        (abs_dist1, rel_dist1, weld_nums1, defects1), (abs_dist2, rel_dist2, weld_nums2, defects2) = \
+            ingest_listings([file1_path, file2_path])
 
         # 转换为字符串列表
         weld_nums1_str = [str(w) for w in weld_nums1]
@@ -1787,7 +2152,10 @@ def step1_analyze_pipeline_data(filename1: str, filename2: str):
         print("正在进行环焊缝对齐...")
         weld_alignment, best_base_distance = find_best_weld_alignment(
             weld_nums1_str, abs_dist1, rel_dist1,
-            weld_nums2_str, abs_dist2, rel_dist2
+            weld_nums2_str, abs_dist2, rel_dist2,
+            max_candidates=max_candidates,
+            engine=engine,
+            tiling=tiling
         )
 
         # 统计对齐结果（用于打印日志，实际数据存在 weld_alignment 中）
@@ -1795,11 +2163,6 @@ def step1_analyze_pipeline_data(filename1: str, filename2: str):
         print(f"使用最佳基础距离 {best_base_distance}米")
         print(f"成功对齐 {aligned_count} 对环焊缝")
 
-        # 读取缺陷数据
-        print("正在提取缺陷数据...")
-        defects1 = read_defect_data(df1, file_type=1)
-        defects2 = read_defect_data(df2, file_type=2)
-
         print(f"文件1: 找到 {len(defects1)} 个缺陷")
         print(f"文件2: 找到 {len(defects2)} 个缺陷")
 
@@ -1818,8 +2181,10 @@ def step1_analyze_pipeline_data(filename1: str, filename2: str):
             'best_base_distance': best_base_distance,
             'filename1': filename1,
             'filename2': filename2,
-            'aligned_count': aligned_count # 传递统计数据方便后续使用
+            'aligned_count': aligned_count, # 传递统计数据方便后续使用
+            'context_handle': artifact_key  # 对齐产物句柄，图状态中只保存它（见 alignment_artifacts.resolve_context）
         }
+        put_cached_artifact(artifact_key, context_data)
 
         return context_data, None
 
@@ -1829,7 +2194,8 @@ def step1_analyze_pipeline_data(filename1: str, filename2: str):
         return None, f"第一阶段处理错误: {str(e)}"
 
 @tool
-def step2_generate_alignment_report(context_data: dict, thresholds: dict, min_confidence: float, save_type: str, output_dir=None):
+def step2_generate_alignment_report(context_data: dict, thresholds: dict, min_confidence: float, save_type: str, output_dir=None,
+                                    assignment: str = "greedy"):
     """
     第二阶段：报告生成
     
@@ -1837,6 +2203,7 @@ def step2_generate_alignment_report(context_data: dict, thresholds: dict, min_co
         context_data (dict): 第一阶段返回的数据字典。
         min_confidence (float): 外部计算好的置信度阈值。
         save_type (str): 保存文件的类型，默认或专家。
+        assignment (str): 已对齐环焊缝内的缺陷匹配方式，"greedy"（默认）或 "optimal"（按环焊缝最优分配，需要 scipy）
         
     Returns:
         str: 执行结果报告，包含文件路径。
@@ -1870,23 +2237,20 @@ def step2_generate_alignment_report(context_data: dict, thresholds: dict, min_co
         # 使用优化后的阈值进行缺陷对齐
         print("正在进行缺陷对齐...")
         defect_alignment_df = align_defects_with_comprehensive_mapping(
-            defects1, defects2, weld_alignment, thresholds, min_confidence
+            defects1, defects2, weld_alignment, thresholds, min_confidence, assignment=assignment
         )
 
         # 对结果进行排序
         print("正在对结果进行排序...")
         # 排序环焊缝对齐结果
-        sorted_weld_alignment = sort_weld_alignment_results(weld_alignment)
+        weld_alignment_df = weld_alignment.to_report_frame()
         # 排序缺陷对齐结果
         sorted_defect_alignment = sort_defect_alignment_results(defect_alignment_df)
 
         # 统计匹配结果
-        exact_matches = len(sorted_defect_alignment[
-            (sorted_defect_alignment['匹配类型'] == '环焊缝对齐匹配')
-        ])
-        relative_matches = len(sorted_defect_alignment[
-            (sorted_defect_alignment['匹配类型'] == '相对距离匹配')
-        ])
+        match_counts = sorted_defect_alignment['匹配类型'].value_counts()
+        exact_matches = int(match_counts.get('环焊缝对齐匹配', 0))
+        relative_matches = int(match_counts.get('相对距离匹配', 0))
         total_matches = exact_matches + relative_matches
 
         print(f"环焊缝对齐匹配: {exact_matches} 对缺陷")
@@ -1894,20 +2258,16 @@ def step2_generate_alignment_report(context_data: dict, thresholds: dict, min_co
         print(f"总匹配: {total_matches} 对缺陷")
 
         # 计算环焊缝统计数据（用于报告）
-        file1_only_count = sum(1 for a in weld_alignment.alignments
-                               if a['file1_weld'] != ' ' and a['file2_weld'] == ' ')
-        file2_only_count = sum(1 for a in weld_alignment.alignments
-                               if a['file1_weld'] == ' ' and a['file2_weld'] != ' ')
+        file1_only_count, file2_only_count = weld_alignment.count_unpaired_welds()
 
         # 保存结果
         print("正在保存结果...")
         with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
             # 保存排序后的环焊缝对齐结果
-            weld_alignment_df = pd.DataFrame(sorted_weld_alignment)
             weld_alignment_df.to_excel(writer, sheet_name='环焊缝对齐', index=False)
 
-            # 保存排序后的缺陷对齐结果
-            sorted_defect_alignment.to_excel(writer, sheet_name='缺陷对齐结果', index=False)
+            # 保存排序后的缺陷对齐结果（数值列此时才按报告精度取舍小数位，空值写为空单元格）
+            round_for_report(sorted_defect_alignment).to_excel(writer, sheet_name='缺陷对齐结果', index=False)
 
             # 添加数据统计
             stats_data = {
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from Tools.align_tools.column_schema import mapping_signature
+from Tools.align_tools.defect_table import DefectTable
+from Tools.align_tools.ingest_cache import READER_VERSION, file_content_hash
+
+# 对齐产物（环焊缝对齐 + 缺陷提取 + 分布指标）的结构或算法发生变化时递增，使旧缓存自动失效
+ARTIFACT_VERSION = 2
+
+# 进程内最多保留的对齐产物个数（每个产物包含两份缺陷表和一个环焊缝对齐结果）
+MEMORY_CACHE_SIZE = 4
+
+# 磁盘上最多保留的对齐产物个数，超过时删除最久未使用的
+MAX_DISK_ARTIFACTS = 32
+
+DEFAULT_ARTIFACT_DIR = os.path.join("CacheFiles", "artifacts")
+
+META_FILE = 'meta.json'
+
+_MEMORY_CACHE: "OrderedDict[str, Dict]" = OrderedDict()
+_MEMORY_CACHE_LOCK = threading.Lock()
+
+
+def alignment_artifact_key(file1_path: str, file2_path: str, **params) -> str:
+    """
+    对齐产物的缓存键：两个输入文件的内容哈希 + 字段映射知识库签名 + 读取/产物版本 + 对齐参数
+
+    Args:
+        file1_path: 文件1路径
+        file2_path: 文件2路径
+        **params: 影响对齐结果的参数（如 engine、tiling）
+
+    Returns:
+        str: 十六进制缓存键（同时作为图状态中传递的句柄）
+    """
+    parts = [file_content_hash(file1_path), file_content_hash(file2_path), f"mapping={mapping_signature()}",
+             f"reader={READER_VERSION}", f"artifact={ARTIFACT_VERSION}"]
+    parts += [f"{name}={params[name]!r}" for name in sorted(params)]
+    return hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def get_cached_artifact(key: str, filename1: Optional[str] = None, filename2: Optional[str] = None,
+                        artifact_dir: Optional[str] = None) -> Optional[Dict]:
+    """
+    取出对齐产物：先查进程内缓存，再查磁盘
+
+    Args:
+        key: alignment_artifact_key 生成的缓存键
+        filename1: 本次请求的文件1名称，为 None 时沿用保存时的名称
+        filename2: 本次请求的文件2名称，为 None 时沿用保存时的名称
+        artifact_dir: 磁盘存储目录，默认为 CacheFiles/artifacts
+
+    Returns:
+        dict: 与 step1 返回结构一致的 context_data，未命中时返回 None
+    """
+    with _MEMORY_CACHE_LOCK:
+        artifact = _MEMORY_CACHE.get(key)
+        if artifact is not None:
+            _MEMORY_CACHE.move_to_end(key)
+
+    if artifact is None:
+        artifact = _load_artifact(_artifact_path(key, artifact_dir))
+        if artifact is None:
+            return None
+        _remember(key, artifact)
+
+    context_data = dict(artifact)
+    if filename1 is not None:
+        context_data['filename1'] = filename1
+    if filename2 is not None:
+        context_data['filename2'] = filename2
+    return context_data
+
+
+def put_cached_artifact(key: str, context_data: Dict, artifact_dir: Optional[str] = None, persist: bool = True):
+    """
+    保存 step1 的 context_data：放入进程内缓存，并写入磁盘（Parquet / Arrow IPC + meta.json）
+
+    Args:
+        key: alignment_artifact_key 生成的缓存键
+        context_data: step1 返回的数据字典
+        artifact_dir: 磁盘存储目录，默认为 CacheFiles/artifacts
+        persist: 是否写入磁盘
+    """
+    artifact = dict(context_data)
+    artifact['context_handle'] = key
+    _remember(key, artifact)
+    if persist:
+        try:
+            _save_artifact(_artifact_path(key, artifact_dir), artifact)
+            _prune_disk(os.path.dirname(_artifact_path(key, artifact_dir)), keep=key)
+        except (OSError, TypeError, ValueError, pa.ArrowException) as e:
+            print(f"写入对齐产物失败（不影响本次结果）: {e}")
+
+
+def resolve_context(handle: Optional[str], artifact_dir: Optional[str] = None) -> Optional[Dict]:
+    """
+    由图状态中的句柄取回 context_data
+
+    Args:
+        handle: context_data['context_handle']
+        artifact_dir: 磁盘存储目录，默认为 CacheFiles/artifacts
+
+    Returns:
+        dict: context_data，句柄为空或产物已不存在时返回 None
+    """
+    if not handle:
+        return None
+    return get_cached_artifact(handle, artifact_dir=artifact_dir)
+
+
+def clear_artifact_cache():
+    """清空进程内缓存（不删除磁盘上的产物）"""
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE.clear()
+
+
+def _remember(key: str, artifact: Dict):
+    with _MEMORY_CACHE_LOCK:
+        _MEMORY_CACHE[key] = artifact
+        _MEMORY_CACHE.move_to_end(key)
+        while len(_MEMORY_CACHE) > MEMORY_CACHE_SIZE:
+            _MEMORY_CACHE.popitem(last=False)
+
+
+def _artifact_path(key: str, artifact_dir: Optional[str]) -> str:
+    if artifact_dir is None:
+        artifact_dir = os.path.join(os.getcwd(), DEFAULT_ARTIFACT_DIR)
+    return os.path.join(artifact_dir, key)
+
+
+def _save_artifact(artifact_path: str, artifact: Dict):
+    """先写入临时目录再重命名，避免并发读取到写了一半的产物"""
+    if os.path.isdir(artifact_path):
+        return
+    tmp_path = f"{artifact_path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        weld_alignment = artifact['weld_alignment']
+        pq.write_table(pa.Table.from_pandas(weld_alignment.to_frame(), preserve_index=False),
+                       os.path.join(tmp_path, 'welds.parquet'))
+        for name in ('defects1', 'defects2'):
+            artifact[name].write_arrow_file(os.path.join(tmp_path, f'{name}.arrow'))
+
+        meta = {
+            'version': ARTIFACT_VERSION,
+            'metric': _to_json_value(artifact['metric']),
+            'best_base_distance': _to_json_value(artifact['best_base_distance']),
+            'base_distance': _to_json_value(weld_alignment.base_distance),
+            'aligned_count': int(artifact['aligned_count']),
+            'filename1': artifact.get('filename1'),
+            'filename2': artifact.get('filename2'),
+        }
+        with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, artifact_path)
+    except OSError:
+        # 目标已存在（其他进程先写完）时直接丢弃本次结果
+        if os.path.isdir(artifact_path):
+            return
+        raise
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _load_artifact(artifact_path: str) -> Optional[Dict]:
+    meta_path = os.path.join(artifact_path, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+
+    # 避免循环导入
+    from Tools.align_tools.align_defection import WeldAlignment
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('version') != ARTIFACT_VERSION:
+            return None
+        welds = pq.read_table(os.path.join(artifact_path, 'welds.parquet')).to_pandas()
+        defects1 = DefectTable.read_arrow_file(os.path.join(artifact_path, 'defects1.arrow'))
+        defects2 = DefectTable.read_arrow_file(os.path.join(artifact_path, 'defects2.arrow'))
+        weld_alignment = WeldAlignment.from_frame(welds, base_distance=meta['base_distance'])
+        artifact = {
+            'metric': meta['metric'],
+            'defects1': defects1,
+            'defects2': defects2,
+            'weld_alignment': weld_alignment,
+            'best_base_distance': meta['best_base_distance'],
+            'filename1': meta['filename1'],
+            'filename2': meta['filename2'],
+            'aligned_count': meta['aligned_count'],
+            'context_handle': os.path.basename(artifact_path)
+        }
+    except (OSError, ValueError, KeyError, AttributeError, pa.ArrowException) as e:
+        # meta.json 不完整（缺少字段或不是字典）同样视为损坏
+        print(f"对齐产物损坏，重新计算: {e}")
+        return None
+
+    # 更新访问时间，磁盘清理按最久未使用淘汰
+    try:
+        os.utime(meta_path)
+    except OSError:
+        pass
+    return artifact
+
+
+def _prune_disk(artifact_dir: str, keep: str):
+    """磁盘上的产物超过 MAX_DISK_ARTIFACTS 个时，按 meta.json 的修改时间删除最久未使用的"""
+    entries = []
+    for name in os.listdir(artifact_dir):
+        meta_path = os.path.join(artifact_dir, name, META_FILE)
+        if name != keep and os.path.exists(meta_path):
+            entries.append((os.path.getmtime(meta_path), name))
+    entries.sort()
+    for _, name in entries[:max(0, len(entries) + 1 - MAX_DISK_ARTIFACTS)]:
+        shutil.rmtree(os.path.join(artifact_dir, name), ignore_errors=True)
+
+
+def _to_json_value(value):
+    """NumPy 标量 / 字典转为可写入 JSON 的 Python 原生类型"""
+    if isinstance(value, dict):
+        return {str(k): _to_json_value(v) for k, v in value.items()}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
@@ -0,0 +1,175 @@
+import hashlib
+import os
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from Tools.KB_manage_tools.mapping_manager import MappingManager
+
+# 字段映射知识库的默认路径（与 MappingManager 的默认值一致，相对于当前工作目录）
+DEFAULT_MAPPING_PATH = "KnowledgeBase/field_mapping.json"
+
+# 语义角色 -> 知识库中的标准名
+ROLE_STANDARDS = {
+    'abs_distance': 'Log distance(m)',
+    'weld_number': 'Upstream girth weld',
+    'feature_type': 'Feature type',
+    'depth': 'Peak depth(%)',
+    'orientation': 'Clock position(h:min)',
+    'length': 'Length(mm)',
+    'width': 'Width(mm)',
+    'defect_type': 'Feature identification',
+}
+
+# 未命中知识库别名时的关键字规则（按优先级），每条规则为 (角色, 必须同时包含的关键字)
+KEYWORD_RULES = [
+    ('weld_number', ('upstream girth weld',)),
+    ('abs_distance', ('log distance',)),
+    ('orientation', ('clock position',)),
+    ('depth', ('peak depth',)),
+    ('length', ('length', 'mm')),
+    ('width', ('width', 'mm')),
+    ('feature_type', ('feature type',)),
+    ('defect_type', ('feature identification',)),
+    # 未清洗的中文表头
+    ('weld_number', ('上游环焊缝编号',)),
+    ('abs_distance', ('绝对距离',)),
+    ('orientation', ('时钟方位',)),
+    ('depth', ('深度',)),
+    ('length', ('长度', 'mm')),
+    ('width', ('宽度', 'mm')),
+    ('feature_type', ('部件/缺陷类型',)),
+    ('defect_type', ('部件/缺陷识别',)),
+]
+
+# 找不到带单位的长度/宽度列时，退而使用第一个包含这些关键字的列
+FALLBACK_KEYWORDS = {
+    'length': ('length', '长度'),
+    'width': ('width', '宽度'),
+}
+
+
+class ColumnSchema:
+    """一张表的列角色解析结果：语义角色 -> 实际列名"""
+
+    def __init__(self, columns: Dict[str, object]):
+        self.columns = columns
+
+    def get(self, role: str):
+        """获取某个角色对应的列名，不存在时返回 None"""
+        return self.columns.get(role)
+
+    @property
+    def coverage(self) -> int:
+        """解析出的角色数量"""
+        return len(self.columns)
+
+    def __repr__(self) -> str:
+        return f"ColumnSchema({self.columns})"
+
+
+def resolve_schema(df: pd.DataFrame, mapping_path: Optional[str] = None) -> ColumnSchema:
+    """
+    将表头映射为语义角色（每张表只需解析一次，供环焊缝与缺陷读取共用）
+
+    先用知识库 field_mapping.json 中的标准名和别名做精确匹配，
+    未命中时再按关键字规则匹配；同一表头签名的解析结果会被缓存。
+
+    Args:
+        df: 数据框
+        mapping_path: 知识库文件路径，默认为 DEFAULT_MAPPING_PATH
+
+    Returns:
+        ColumnSchema: 列角色解析结果
+    """
+    headers = tuple(str(col) for col in df.columns)
+    positions = _resolve_positions(headers, _mapping_signature(mapping_path))
+    return ColumnSchema({role: df.columns[pos] for role, pos in positions})
+
+
+def mapping_signature(mapping_path: Optional[str] = None) -> str:
+    """
+    字段映射知识库的内容签名
+
+    列角色解析依赖知识库中的别名，读取缓存、工作表识别缓存和对齐产物的缓存键都需要包含它，
+    修改别名后旧的缓存自动失效。只读取文件，知识库不存在时返回 'missing'（不会创建文件）。
+
+    Args:
+        mapping_path: 知识库文件路径，默认为 DEFAULT_MAPPING_PATH
+
+    Returns:
+        str: 十六进制内容哈希，或 'missing'
+    """
+    return _mapping_content_hash(*_mapping_signature(mapping_path))
+
+
+def _mapping_signature(mapping_path: Optional[str]) -> Tuple[str, Optional[float]]:
+    """知识库文件路径与修改时间（文件不存在时为 None），知识库被修改后缓存自动失效"""
+    path = DEFAULT_MAPPING_PATH if mapping_path is None else mapping_path
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    return path, mtime
+
+
+@lru_cache(maxsize=32)
+def _mapping_content_hash(mapping_path: str, mtime: Optional[float]) -> str:
+    if mtime is None:
+        return 'missing'
+    try:
+        with open(mapping_path, 'rb') as f:
+            return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    except OSError:
+        return 'missing'
+
+
+@lru_cache(maxsize=32)
+def _load_alias_index(mapping_path: str, mtime: Optional[float]) -> Dict[str, str]:
+    """别名（小写、去空白）-> 标准名；知识库不存在时只使用关键字规则"""
+    if mtime is None or not os.path.exists(mapping_path):
+        return {}
+    index = {}
+    for row in MappingManager(mapping_path).load_as_list_format():
+        standard = row[0]
+        for name in row:
+            index.setdefault(_normalize_header(name), standard)
+    return index
+
+
+@lru_cache(maxsize=256)
+def _resolve_positions(headers: Tuple[str, ...], signature: Tuple[str, Optional[float]]) -> Tuple[Tuple[str, int], ...]:
+    alias_index = _load_alias_index(*signature)
+    standard_roles = {standard: role for role, standard in ROLE_STANDARDS.items()}
+
+    resolved = {}
+    known_other = set()  # 知识库中属于其他标准字段的列，不参与关键字匹配
+    for pos, header in enumerate(headers):
+        standard = alias_index.get(_normalize_header(header))
+        if standard is not None:
+            if standard in standard_roles:
+                resolved[standard_roles[standard]] = pos
+            else:
+                known_other.add(pos)
+            continue
+
+        header_lower = header.lower()
+        for role, keywords in KEYWORD_RULES:
+            if all(keyword in header_lower for keyword in keywords):
+                resolved[role] = pos
+                break
+
+    for role, keywords in FALLBACK_KEYWORDS.items():
+        if role in resolved:
+            continue
+        for pos, header in enumerate(headers):
+            if pos not in known_other and any(keyword in header.lower() for keyword in keywords):
+                resolved[role] = pos
+                break
+
+    return tuple(resolved.items())
+
+
+def _normalize_header(name) -> str:
+    return ''.join(str(name).split()).lower()
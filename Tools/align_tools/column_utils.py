@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+
+def get_column(df: pd.DataFrame, col) -> pd.Series:
+    """
+    按列名取出一列，列不存在（列名为 None）时返回全空列
+
+    Args:
+        df: 数据框
+        col: 列名，可以为 None
+
+    Returns:
+        pd.Series: 与 df 行数一致的列
+    """
+    if col is None:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+    return df[col]
+
+
+def strip_text(series: pd.Series) -> pd.Series:
+    """
+    向量化的 str(value).strip()，空值统一转为空字符串
+
+    Args:
+        series: 任意类型的列
+
+    Returns:
+        pd.Series: 去除首尾空白后的字符串列
+    """
+    text = series.astype(str).str.strip()
+    return text.where(series.notna(), '')
+
+
+def nonblank_mask(series: pd.Series) -> np.ndarray:
+    """
+    判断每个单元格是否"有值"：既不是空值，也不是空白字符串
+
+    Args:
+        series: 任意类型的列
+
+    Returns:
+        np.ndarray: 布尔数组
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.notna().to_numpy()
+    return (strip_text(series) != '').to_numpy()
+
+
+def to_float_array(series: pd.Series) -> np.ndarray:
+    """
+    向量化的 float(str(value).strip())，无法转换的值记为 NaN
+
+    Args:
+        series: 任意类型的列
+
+    Returns:
+        np.ndarray: float64 数组
+    """
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return np.full(len(series), np.nan)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype=float, na_value=np.nan)
+    values = pd.to_numeric(strip_text(series), errors='coerce')
+    return values.to_numpy(dtype=float, na_value=np.nan)
+
+
+def nan_text_mask(series: pd.Series) -> np.ndarray:
+    """
+    判断每个单元格是否为 float() 可解析的 "nan" 文本（如 'nan'、' NaN '、'-nan'）
+
+    Args:
+        series: 任意类型的列
+
+    Returns:
+        np.ndarray: 布尔数组，数值列全部为 False
+    """
+    if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return np.zeros(len(series), dtype=bool)
+    return strip_text(series).str.lower().isin(['nan', '+nan', '-nan']).to_numpy()
+
+
+def to_int_array(series: pd.Series):
+    """
+    向量化的 int(float(str(value).strip()))
+
+    Args:
+        series: 任意类型的列
+
+    Returns:
+        tuple: (整数数组, 是否转换成功的布尔数组)
+    """
+    values = to_float_array(series)
+    valid = np.isfinite(values)
+    numbers = np.zeros(len(values), dtype=np.int64)
+    numbers[valid] = np.trunc(values[valid]).astype(np.int64)
+    return numbers, valid
+
+
+def locate_upstream_welds(df: pd.DataFrame, weld_number_col, abs_distance_col, data_cols, positions,
+                          forward_window: int = 10):
+    """
+    为指定行批量查找所属的上游环焊缝
+
+    环焊缝行的特征：上游环焊缝编号和绝对距离都不为空（且可解析为数值），
+    而深度、长度、宽度等缺陷数据列全部为空。
+    每一行优先取其自身或之前最近的环焊缝行；若之前没有环焊缝，
+    则在其后 forward_window 行（含自身）内向下查找。
+
+    Args:
+        df: 数据框
+        weld_number_col: 上游环焊缝编号列
+        abs_distance_col: 绝对距离列
+        data_cols: 缺陷数据列（深度、长度、宽度），可以包含 None
+        positions: 需要查找的行位置（按位置而非索引标签）
+        forward_window: 向下查找的行数
+
+    Returns:
+        tuple: (环焊缝编号数组, 环焊缝绝对距离数组, 是否找到的布尔数组)
+    """
+    positions = np.asarray(positions, dtype=np.int64)
+    n = len(positions)
+    weld_numbers = np.zeros(n, dtype=np.int64)
+    weld_distances = np.full(n, np.nan)
+    found = np.zeros(n, dtype=bool)
+
+    if weld_number_col is None or abs_distance_col is None or n == 0:
+        return weld_numbers, weld_distances, found
+
+    # 预先计算环焊缝行掩码
+    row_numbers, number_valid = to_int_array(df[weld_number_col])
+    row_distances = to_float_array(df[abs_distance_col])
+    # 原逐行判断只要求绝对距离能被 float() 解析，"nan" 文本同样算有值（距离为 NaN）
+    is_weld_row = number_valid & (~np.isnan(row_distances) | nan_text_mask(df[abs_distance_col]))
+    for col in data_cols:
+        if col is not None:
+            is_weld_row &= ~nonblank_mask(df[col])
+
+    weld_rows = np.flatnonzero(is_weld_row)
+    if len(weld_rows) == 0:
+        return weld_numbers, weld_distances, found
+
+    # 向上查找：最后一个位置 <= 当前行的环焊缝
+    previous = np.searchsorted(weld_rows, positions, side='right') - 1
+    has_previous = previous >= 0
+
+    # 向下查找：第一个位置 >= 当前行且在窗口内的环焊缝
+    following = np.searchsorted(weld_rows, positions, side='left')
+    following_clipped = np.minimum(following, len(weld_rows) - 1)
+    has_following = (following < len(weld_rows)) & \
+                    (weld_rows[following_clipped] < positions + forward_window)
+
+    chosen = np.where(has_previous, previous, following_clipped)
+    found = has_previous | has_following
+    chosen_rows = weld_rows[chosen[found]]
+
+    weld_numbers[found] = row_numbers[chosen_rows]
+    weld_distances[found] = row_distances[chosen_rows]
+    return weld_numbers, weld_distances, found
@@ -0,0 +1,140 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from Tools.align_tools.defect_table import DefectTable
+
+# 缺陷对齐结果的列名（顺序即报告中的列顺序）
+DEFECT_RESULT_COLUMNS = [
+    '文件1缺陷ID', '文件1环焊缝', '文件1到焊缝距离', '文件1时钟方位',
+    '文件1缺陷类型', '文件1深度', '文件1长度', '文件1宽度', '文件1注释', '文件1绝对距离',
+    '文件2缺陷ID', '文件2环焊缝', '文件2到焊缝距离', '文件2时钟方位',
+    '文件2缺陷类型', '文件2深度', '文件2长度', '文件2宽度', '文件2注释', '文件2绝对距离',
+    '匹配置信度', '匹配说明', '匹配类型'
+]
+
+# 每侧缺陷的列：列名后缀 -> DefectTable 字段
+_SIDE_COLUMNS = (
+    ('缺陷ID', 'original_index'),
+    ('环焊缝', 'weld_number'),
+    ('到焊缝距离', 'distance_to_weld'),
+    ('时钟方位', 'clock_position'),
+    ('缺陷类型', 'defect_type'),
+    ('深度', 'depth'),
+    ('长度', 'length'),
+    ('宽度', 'width'),
+    ('注释', 'comment'),
+    ('绝对距离', 'absolute_distance'),
+)
+
+# 导出报告时数值列保留的小数位数
+DEFECT_REPORT_DECIMALS = {
+    '文件1到焊缝距离': 3, '文件1时钟方位': 1, '文件1深度': 2, '文件1长度': 1, '文件1宽度': 1, '文件1绝对距离': 3,
+    '文件2到焊缝距离': 3, '文件2时钟方位': 1, '文件2深度': 2, '文件2长度': 1, '文件2宽度': 1, '文件2绝对距离': 3,
+    '匹配置信度': 3,
+}
+
+
+class DefectAlignmentRows:
+    """
+    缺陷对齐结果的收集器
+
+    对齐过程中每条结果只记录两侧的缺陷行号（无对应缺陷时为 -1）和匹配信息，
+    最后由 to_frame 一次性按列取出缺陷字段生成 DataFrame，避免逐行拼接。
+    """
+
+    def __init__(self):
+        self.rows1: List[int] = []
+        self.rows2: List[int] = []
+        self.confidence: List[float] = []
+        self.explanation: List[str] = []
+        self.match_type: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.match_type)
+
+    def add(self, defect1_id: Optional[int], defect2_id: Optional[int], confidence: float,
+            explanation: str, match_type: str):
+        """
+        追加一条对齐结果
+
+        Args:
+            defect1_id: 文件1缺陷行号，无对应缺陷时为 None
+            defect2_id: 文件2缺陷行号，无对应缺陷时为 None
+            confidence: 匹配置信度（不大于 0 时报告中留空）
+            explanation: 匹配说明
+            match_type: 匹配类型
+        """
+        self.rows1.append(-1 if defect1_id is None else int(defect1_id))
+        self.rows2.append(-1 if defect2_id is None else int(defect2_id))
+        self.confidence.append(confidence)
+        self.explanation.append(explanation)
+        self.match_type.append(match_type)
+
+    def to_frame(self, defects1: DefectTable, defects2: DefectTable) -> pd.DataFrame:
+        """
+        生成缺陷对齐结果 DataFrame
+
+        数值列保持 float64（无对应缺陷或置信度不大于 0 时为 NaN），缺陷ID为可空整数，
+        文本列无对应缺陷时为空字符串；导出时再由 round_for_report 按 DEFECT_REPORT_DECIMALS 取舍小数位。
+
+        Args:
+            defects1: 文件1缺陷表
+            defects2: 文件2缺陷表
+
+        Returns:
+            pd.DataFrame: 列顺序为 DEFECT_RESULT_COLUMNS
+        """
+        columns = {}
+        for prefix, defects, rows in (('文件1', defects1, self.rows1), ('文件2', defects2, self.rows2)):
+            columns.update(_side_columns(prefix, defects, np.asarray(rows, dtype=np.int64)))
+
+        confidence = np.asarray(self.confidence, dtype=np.float64)
+        columns['匹配置信度'] = np.where(confidence > 0, confidence, np.nan)
+        columns['匹配说明'] = np.asarray(self.explanation, dtype=object)
+        columns['匹配类型'] = np.asarray(self.match_type, dtype=object)
+        return pd.DataFrame(columns, columns=DEFECT_RESULT_COLUMNS)
+
+
+def _side_columns(prefix: str, defects: DefectTable, rows: np.ndarray) -> Dict[str, object]:
+    """按行号一次性取出一侧缺陷的所有列（行号为 -1 表示无对应缺陷）"""
+    present = rows >= 0
+    picked = rows[present]
+    columns = {}
+    for suffix, field in _SIDE_COLUMNS:
+        values = getattr(defects, field)
+        if isinstance(values, pd.Categorical):
+            # 编码 -1（缺失值）取到末尾的空字符串
+            labels = np.append(np.asarray(values.categories, dtype=object), '')
+            column = np.full(len(rows), '', dtype=object)
+            column[present] = labels[values.codes[picked]]
+        elif field == 'original_index':
+            column = pd.array(np.zeros(len(rows), dtype=np.int64), dtype='Int64')
+            column[present] = values[picked]
+            column[~present] = pd.NA
+        else:
+            column = np.full(len(rows), np.nan, dtype=np.float64)
+            column[present] = values[picked]
+        columns[f'{prefix}{suffix}'] = column
+    return columns
+
+
+def round_for_report(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    按报告精度（DEFECT_REPORT_DECIMALS）取舍数值列的小数位
+
+    与原逐行格式化 f"{value:.3f}" 的取舍一致：按浮点数的精确值四舍五入（Python 内置 round）。
+    DataFrame.round 先乘以 10^n 再取整，正好落在一半上的值（如 0.0005、123.4565）会与原报告不同。
+
+    Args:
+        frame: DefectAlignmentRows.to_frame 生成的缺陷对齐结果
+
+    Returns:
+        pd.DataFrame: 取舍后的副本
+    """
+    rounded = frame.copy()
+    for column, decimals in DEFECT_REPORT_DECIMALS.items():
+        values = frame[column].to_numpy(dtype=np.float64)
+        rounded[column] = np.array([round(value, decimals) for value in values.tolist()], dtype=np.float64)
+    return rounded
+
@@ -0,0 +1,187 @@
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy 为可选依赖，缺失时回退到贪心匹配
+    linear_sum_assignment = None
+
+from Tools.align_tools.align_defection import (WeldAlignment, calculate_defect_similarity_block,
+                                               _similarity_explanation)
+from Tools.align_tools.defect_table import DefectTable
+
+# 缺陷匹配方式：'greedy' 按文件1顺序逐个取最佳候选，'optimal' 在每个已对齐环焊缝内求整体最优的一对一分配
+ASSIGNMENT_MODES = ('greedy', 'optimal')
+
+# 参与分配的文件1缺陷少于该值时顺序计算，进程池的启动开销不划算
+PARALLEL_ASSIGNMENT_MIN_DEFECTS = 20000
+
+# 每个进程任务包含的环焊缝分组数
+ASSIGNMENT_CHUNK_SIZE = 500
+
+# 分配结果：文件1缺陷行号 -> (文件2缺陷行号或 None, 置信度, 说明)
+Assignment = Dict[int, Tuple[Optional[int], float, str]]
+
+
+def optimal_assignment_available() -> bool:
+    """是否可以使用最优分配（需要 scipy）"""
+    return linear_sum_assignment is not None
+
+
+def assign_defects_by_weld(defects1: DefectTable, defects2: DefectTable, weld_alignment: WeldAlignment,
+                           thresholds: Dict, min_confidence: float, parallel: bool = True,
+                           max_workers: Optional[int] = None) -> Assignment:
+    """
+    在每个已对齐的环焊缝内，对两份数据的缺陷求一对一最优分配
+
+    贪心匹配按文件1顺序逐个取最佳候选，密集缺陷群中先处理的缺陷可能抢走后面缺陷的正确对应。
+    这里对每个环焊缝构建相似度矩阵，置信度低于 min_confidence 的配对不允许（门限），
+    用 linear_sum_assignment 求置信度总和最大的匹配。各环焊缝互不影响，数据量较大时在进程池中并行计算。
+
+    Args:
+        defects1: 文件1缺陷表
+        defects2: 文件2缺陷表
+        weld_alignment: 环焊缝对齐结果
+        thresholds: 阈值配置
+        min_confidence: 最小置信度（门限）
+        parallel: 是否并行计算
+        max_workers: 进程数，默认为 CPU 核数
+
+    Returns:
+        dict: 文件1缺陷行号 -> (文件2缺陷行号或 None, 置信度, 说明)，只包含所在环焊缝已对齐的缺陷；
+              未分配的缺陷给出其所在环焊缝内最高的候选置信度（与贪心匹配的“置信度过低”说明一致）
+    """
+    if linear_sum_assignment is None:
+        raise ImportError("最优分配需要 scipy，请安装 scipy 或使用贪心匹配")
+
+    assignment = {}
+    buckets = []
+    for rows1, rows2 in _weld_bucket_pairs(defects1, defects2, weld_alignment):
+        if len(rows2):
+            buckets.append((rows1, rows2))
+        else:
+            # 对应环焊缝下没有文件2缺陷（含对应为空白占位的环焊缝），无需计算
+            assignment.update(_assign_bucket(defects1, defects2, rows1, rows2, thresholds, min_confidence))
+    chunks = [buckets[i:i + ASSIGNMENT_CHUNK_SIZE] for i in range(0, len(buckets), ASSIGNMENT_CHUNK_SIZE)]
+
+    results = None
+    total = sum(len(rows1) for rows1, _ in buckets)
+    workers = min(len(chunks), max_workers or os.cpu_count() or 1)
+    if parallel and workers > 1 and total >= PARALLEL_ASSIGNMENT_MIN_DEFECTS:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # 每个任务只携带本批用到的缺陷行，而不是整张缺陷表
+                tasks = (_chunk_task(defects1, defects2, chunk, thresholds, min_confidence) for chunk in chunks)
+                results = list(executor.map(_assign_chunk, tasks))
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            print(f"并行缺陷分配失败，改为顺序计算: {e}")
+            results = None
+    if results is None:
+        results = [_assign_chunk((defects1, defects2, chunk, thresholds, min_confidence, None, None))
+                   for chunk in chunks]
+
+    for chunk in results:
+        assignment.update(chunk)
+    return assignment
+
+
+def _weld_bucket_pairs(defects1: DefectTable, defects2: DefectTable,
+                       weld_alignment: WeldAlignment) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """按对应的文件2环焊缝分组：(文件1缺陷行号, 文件2缺陷行号)，按文件1行号排序"""
+    rows1_by_weld2 = {}
+    for weld1, rows1 in defects1.weld_buckets().items():
+        weld2 = weld_alignment.get_file2_weld(weld1)
+        if weld2:
+            rows1_by_weld2.setdefault(weld2, []).append(rows1)
+
+    empty = np.zeros(0, dtype=np.int64)
+    buckets2 = defects2.weld_buckets()
+    pairs = []
+    for weld2, parts in rows1_by_weld2.items():
+        rows1 = np.sort(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+        pairs.append((rows1, buckets2.get(weld2, empty)))
+    pairs.sort(key=lambda pair: pair[0][0])
+    return pairs
+
+
+def _chunk_task(defects1: DefectTable, defects2: DefectTable, chunk: List[Tuple[np.ndarray, np.ndarray]],
+                thresholds: Dict, min_confidence: float) -> Tuple:
+    """
+    构建进程池任务：取出本批环焊缝分组用到的缺陷子表，分组行号改为子表中的位置
+
+    Returns:
+        tuple: (文件1子表, 文件2子表, 分组, 阈值, 最小置信度, 子表行号 -> 文件1行号, 子表行号 -> 文件2行号)
+    """
+    rows1 = np.concatenate([bucket_rows1 for bucket_rows1, _ in chunk])
+    rows2 = np.concatenate([bucket_rows2 for _, bucket_rows2 in chunk])
+    local_buckets = []
+    offset1 = offset2 = 0
+    for bucket_rows1, bucket_rows2 in chunk:
+        local_buckets.append((np.arange(offset1, offset1 + len(bucket_rows1)),
+                              np.arange(offset2, offset2 + len(bucket_rows2))))
+        offset1 += len(bucket_rows1)
+        offset2 += len(bucket_rows2)
+    return (_compact_take(defects1, rows1), _compact_take(defects2, rows2), local_buckets,
+            thresholds, min_confidence, rows1, rows2)
+
+
+def _compact_take(defects: DefectTable, rows: np.ndarray) -> DefectTable:
+    """按行号取出子表，并去掉分类列中未用到的类别（减小进程间传输的数据量）"""
+    table = defects.take(rows)
+    for field in DefectTable.CATEGORICAL_FIELDS:
+        setattr(table, field, getattr(table, field).remove_unused_categories())
+    return table
+
+
+def _assign_chunk(task) -> Assignment:
+    """分配一批环焊缝分组（进程池任务）；给出子表行号映射时，结果换算回原表行号"""
+    defects1, defects2, buckets, thresholds, min_confidence, rows1, rows2 = task
+    assignment = {}
+    for bucket_rows1, bucket_rows2 in buckets:
+        assignment.update(_assign_bucket(defects1, defects2, bucket_rows1, bucket_rows2, thresholds, min_confidence))
+    if rows1 is None:
+        return assignment
+    return {int(rows1[defect1_id]): (None if defect2_id is None else int(rows2[defect2_id]), confidence, explanation)
+            for defect1_id, (defect2_id, confidence, explanation) in assignment.items()}
+
+
+def _assign_bucket(defects1: DefectTable, defects2: DefectTable, rows1: np.ndarray, rows2: np.ndarray,
+                   thresholds: Dict, min_confidence: float) -> Assignment:
+    """单个环焊缝内的最优分配"""
+    if len(rows2) == 0:
+        return {int(defect1_id): (None, 0, "") for defect1_id in rows1}
+
+    scores = [calculate_defect_similarity_block(defects1, int(defect1_id), defects2, rows2, thresholds)
+              for defect1_id in rows1]
+    confidence = np.vstack([confidences for confidences, _ in scores])
+
+    # 门限：低于 min_confidence 的配对权重为 0，分配后丢弃（NaN 同样视为不可配对）
+    allowed = confidence >= min_confidence
+    row_index, col_index = linear_sum_assignment(np.where(allowed, confidence, 0.0), maximize=True)
+
+    assignment = {}
+    taken = np.zeros(len(rows2), dtype=bool)
+    for i, j in zip(row_index, col_index):
+        if allowed[i, j]:
+            _, parts = scores[i]
+            explanation = _similarity_explanation(parts['distance'][j], parts['clock'][j], parts['type'][j])
+            assignment[int(rows1[i])] = (int(rows2[j]), float(confidence[i, j]), f"{explanation}; 按环焊缝最优分配")
+            taken[j] = True
+
+    # 未分配的缺陷：记录剩余候选中的最高置信度
+    for i, defect1_id in enumerate(rows1):
+        defect1_id = int(defect1_id)
+        if defect1_id in assignment:
+            continue
+        remaining = np.where(taken | ~(confidence[i] > 0), -np.inf, confidence[i])
+        if np.isfinite(remaining).any():
+            j = int(np.argmax(remaining))
+            assignment[defect1_id] = (int(rows2[j]), float(confidence[i, j]), "")
+        else:
+            assignment[defect1_id] = (None, 0, "")
+    return assignment
@@ -0,0 +1,297 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class DefectTable:
+    """
+    缺陷数据的列式容器
+
+    数值字段以 NumPy 数组存储，环焊缝编号、缺陷类型、注释以分类数组存储，
+    缺陷通过整数行号（0 ~ len-1）标识，取代原先 list-of-dict 中的 id(defect)。
+    """
+
+    NUMERIC_FIELDS = ('distance_to_weld', 'clock_position', 'depth', 'length', 'width', 'absolute_distance')
+    CATEGORICAL_FIELDS = ('weld_number', 'defect_type', 'comment')
+    FIELDS = ('weld_number', 'distance_to_weld', 'clock_position', 'depth', 'length', 'width',
+              'defect_type', 'comment', 'original_index', 'absolute_distance')
+
+    def __init__(self, weld_number, distance_to_weld, clock_position, depth, length, width,
+                 defect_type, comment, original_index, absolute_distance):
+        self.distance_to_weld = np.asarray(distance_to_weld, dtype=np.float64)
+        self.clock_position = np.asarray(clock_position, dtype=np.float64)
+        self.depth = np.asarray(depth, dtype=np.float64)
+        self.length = np.asarray(length, dtype=np.float64)
+        self.width = np.asarray(width, dtype=np.float64)
+        self.absolute_distance = np.asarray(absolute_distance, dtype=np.float64)
+        self.original_index = np.asarray(original_index, dtype=np.int64)
+        self.weld_number = _to_categorical(weld_number)
+        self.defect_type = _to_categorical(defect_type)
+        self.comment = _to_categorical(comment)
+
+        self._weld_buckets = None  # 环焊缝编号 -> 行号，首次按环焊缝查找时建立
+        self._distance_order = None  # 按绝对距离排序的行号，首次按距离查找时建立
+
+        n = len(self.distance_to_weld)
+        for field in self.FIELDS:
+            if len(getattr(self, field)) != n:
+                raise ValueError(f"缺陷字段 {field} 的长度与其他字段不一致")
+
+    def __len__(self) -> int:
+        return len(self.distance_to_weld)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for row in range(len(self)):
+            yield self.record(row)
+
+    def __repr__(self) -> str:
+        return f"DefectTable({len(self)} defects)"
+
+    @property
+    def row_ids(self) -> np.ndarray:
+        """所有缺陷的整数行号"""
+        return np.arange(len(self))
+
+    def record(self, row: int) -> Dict:
+        """
+        以字典形式取出一条缺陷（与原 list-of-dict 中的缺陷字典字段一致）
+
+        Args:
+            row: 行号
+
+        Returns:
+            dict: 缺陷字典
+        """
+        return {
+            'weld_number': _category_value(self.weld_number, row),
+            'distance_to_weld': float(self.distance_to_weld[row]),
+            'clock_position': float(self.clock_position[row]),
+            'depth': float(self.depth[row]),
+            'length': float(self.length[row]),
+            'width': float(self.width[row]),
+            'defect_type': _category_value(self.defect_type, row),
+            'comment': _category_value(self.comment, row),
+            'original_index': int(self.original_index[row]),
+            'absolute_distance': float(self.absolute_distance[row])
+        }
+
+    def rows_for_weld(self, weld_number) -> np.ndarray:
+        """
+        查找某个环焊缝下的所有缺陷行号（按原顺序）
+
+        Args:
+            weld_number: 环焊缝编号
+
+        Returns:
+            np.ndarray: 行号数组
+        """
+        rows = self.weld_buckets().get(weld_number)
+        if rows is None:
+            return np.zeros(0, dtype=np.int64)
+        return rows
+
+    def weld_buckets(self) -> Dict[str, np.ndarray]:
+        """
+        按环焊缝编号分组的缺陷行号（首次调用时一次性建立：编码稳定排序后切分，之后按编号直接取）
+
+        Returns:
+            dict: 环焊缝编号 -> 行号数组（按原顺序）
+        """
+        if self._weld_buckets is None:
+            codes = self.weld_number.codes
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            bounds = np.flatnonzero(np.diff(sorted_codes)) + 1
+            buckets = {}
+            for rows in np.split(order, bounds):
+                if len(rows) and codes[rows[0]] >= 0:
+                    buckets[self.weld_number.categories[codes[rows[0]]]] = rows
+            self._weld_buckets = buckets
+        return self._weld_buckets
+
+    def distance_windows(self, centers, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批量查询绝对距离落在 center ± radius 内的缺陷（按绝对距离排序后二分查找，排序结果首次调用时建立）
+
+        窗口两端略微放宽以吸收浮点舍入，调用方仍需按 |absolute_distance - center| < radius 精确筛选。
+
+        Args:
+            centers: 查询中心（绝对距离）数组
+            radius: 查询半径
+
+        Returns:
+            tuple: (order, lo, hi)，第 i 个中心的候选行号为 order[lo[i]:hi[i]]（按绝对距离升序）
+        """
+        if self._distance_order is None:
+            self._distance_order = np.argsort(self.absolute_distance, kind='stable')
+        order = self._distance_order
+        sorted_distances = self.absolute_distance[order]
+        centers = np.asarray(centers, dtype=np.float64)
+        margin = radius + 1e-9 * (np.abs(centers) + radius)
+        lo = np.searchsorted(sorted_distances, centers - margin, side='left')
+        hi = np.searchsorted(sorted_distances, centers + margin, side='right')
+        return order, lo, hi
+
+    def to_records(self) -> List[Dict]:
+        """转换为原先的 list-of-dict 形式"""
+        return list(self)
+
+    def take(self, rows) -> 'DefectTable':
+        """按行号取出子表"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return DefectTable(**{field: _take(getattr(self, field), rows) for field in self.FIELDS})
+
+    @property
+    def nbytes(self) -> int:
+        """列数据占用的字节数（分类数组按编码计算）"""
+        total = sum(getattr(self, field).nbytes for field in self.NUMERIC_FIELDS) + self.original_index.nbytes
+        for field in self.CATEGORICAL_FIELDS:
+            column = getattr(self, field)
+            total += column.codes.nbytes + sum(len(str(c)) for c in column.categories)
+        return total
+
+    def to_frame(self) -> pd.DataFrame:
+        """转换为 DataFrame（分类列保持 category 类型，便于写入 Parquet）"""
+        return pd.DataFrame({field: getattr(self, field) for field in self.FIELDS})
+
+    def to_arrow(self) -> pa.Table:
+        """
+        转换为 Arrow 表：数值列直接由 NumPy 数组构建（NaN 原样保存，不生成空值位图），分类列为字典编码
+
+        Returns:
+            pyarrow.Table: 列名为 FIELDS
+        """
+        return pa.table({field: pa.array(getattr(self, field)) for field in self.FIELDS})
+
+    @classmethod
+    def from_arrow(cls, table) -> 'DefectTable':
+        """
+        从 to_arrow() / to_frame() 写出的 Arrow/Parquet 表恢复
+
+        Args:
+            table: pyarrow.Table
+
+        Returns:
+            DefectTable: 列式缺陷表
+        """
+        columns = {}
+        for field in cls.FIELDS:
+            column = table.column(field)
+            if field in cls.CATEGORICAL_FIELDS:
+                columns[field] = column.to_pandas().array
+            elif column.num_chunks == 1 and column.null_count == 0:
+                # 单块且没有空值的数值列直接引用 Arrow 缓冲区（只读视图，不复制）
+                columns[field] = column.chunk(0).to_numpy(zero_copy_only=True)
+            else:
+                columns[field] = column.to_numpy()
+        return cls(**columns)
+
+    def write_arrow_file(self, path: str):
+        """
+        写入不压缩的 Arrow IPC 文件，供 read_arrow_file 内存映射读取
+
+        Args:
+            path: 文件路径
+        """
+        table = self.to_arrow()
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    @classmethod
+    def read_arrow_file(cls, path: str) -> 'DefectTable':
+        """
+        以内存映射方式读取 write_arrow_file 写出的文件
+
+        数值列直接引用映射的文件页面（只读数组），不解压、不复制，页面在访问时才载入；
+        映射在数组被释放后关闭。分类列需要解码为 pandas.Categorical。
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            DefectTable: 列式缺陷表
+        """
+        source = pa.memory_map(path, 'r')
+        return cls.from_arrow(pa.ipc.open_file(source).read_all())
+
+    @classmethod
+    def empty(cls) -> 'DefectTable':
+        return cls.from_records([])
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict]) -> 'DefectTable':
+        """
+        从原先的缺陷字典列表构建列式表
+
+        Args:
+            records: 缺陷字典列表
+
+        Returns:
+            DefectTable: 列式缺陷表
+        """
+        records = list(records)
+        return cls(
+            weld_number=[str(d['weld_number']) for d in records],
+            distance_to_weld=[d['distance_to_weld'] for d in records],
+            clock_position=[d['clock_position'] for d in records],
+            depth=[d['depth'] for d in records],
+            length=[d['length'] for d in records],
+            width=[d['width'] for d in records],
+            defect_type=[d.get('defect_type', '') for d in records],
+            comment=[d.get('comment', '') for d in records],
+            original_index=[d.get('original_index', i + 1) for i, d in enumerate(records)],
+            absolute_distance=[d.get('absolute_distance', 0) for d in records]
+        )
+
+    @classmethod
+    def concat(cls, tables: Iterable['DefectTable']) -> 'DefectTable':
+        """按顺序拼接多个缺陷表"""
+        tables = list(tables)
+        if not tables:
+            return cls.empty()
+        columns = {}
+        for field in cls.FIELDS:
+            parts = [getattr(t, field) for t in tables]
+            if field in cls.CATEGORICAL_FIELDS:
+                columns[field] = np.concatenate([np.asarray(p, dtype=object) for p in parts])
+            else:
+                columns[field] = np.concatenate(parts)
+        return cls(**columns)
+
+
+def as_defect_table(defects) -> DefectTable:
+    """
+    将缺陷数据统一转换为 DefectTable（兼容旧的 list-of-dict）
+
+    Args:
+        defects: DefectTable 或缺陷字典列表，None 视为空表
+
+    Returns:
+        DefectTable: 列式缺陷表
+    """
+    if isinstance(defects, DefectTable):
+        return defects
+    if defects is None:
+        return DefectTable.empty()
+    return DefectTable.from_records(defects)
+
+
+def _to_categorical(values) -> pd.Categorical:
+    if isinstance(values, pd.Categorical):
+        return values
+    return pd.Categorical(np.asarray(values, dtype=object))
+
+
+def _category_value(column: pd.Categorical, row: int) -> Optional[str]:
+    code = column.codes[row]
+    if code < 0:
+        return ''
+    return column.categories[code]
+
+
+def _take(column, rows: np.ndarray):
+    if isinstance(column, pd.Categorical):
+        return column.take(rows)
+    return column[rows]
@@ -0,0 +1,208 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from Tools.align_tools.align_defection import (WeldAlignment, calculate_weld_statistics, find_alignment_start,
+                                               select_weld_thresholds)
+
+# 允许的移动 (a, b)：文件1前进 a 个环焊缝、文件2前进 b 个环焊缝后匹配一对
+# a、b 大于 1 表示中间有环焊缝未匹配（换管割除 / 新增管节），但不允许两边同时跳过
+DP_MOVES = ((1, 1), (1, 2), (2, 1), (1, 3), (3, 1))
+
+
+def dp_weld_alignment(weld_numbers1: List[str], absolute_distances1: List[float], redis1: List[float],
+                      weld_numbers2: List[str], absolute_distances2: List[float], redis2: List[float],
+                      band_width: int = 40, merge_penalty: float = 0.5, gap_penalty: float = 0.2,
+                      max_step_cost: float = 3.0,
+                      statistics: Optional[Dict[str, float]] = None) -> WeldAlignment:
+    """
+    基于带状动态规划（Needleman-Wunsch / DTW）的全局环焊缝对齐
+
+    与贪心的分段累加不同，动态规划在整条管线上选择总得分最高的匹配路径，
+    局部走错不会影响后续。每一步匹配一对环焊缝，得分为 1 减去两段管长之差（以绝对阈值归一化），
+    允许一侧多跨 1~2 个环焊缝（合并/拆分），每多跨一个扣 merge_penalty。
+    只在按里程推算的对应位置附近 band_width 个环焊缝内搜索，计算量与管线长度成线性关系。
+    起点和终点开放：对齐两端未匹配的环焊缝按 gap_penalty 计罚。
+
+    Args:
+        weld_numbers1: 文件1环焊缝编号列表
+        absolute_distances1: 文件1绝对距离列表
+        redis1: 文件1相对距离列表
+        weld_numbers2: 文件2环焊缝编号列表
+        absolute_distances2: 文件2绝对距离列表
+        redis2: 文件2相对距离列表
+        band_width: 带宽（对应位置两侧各搜索的环焊缝数）
+        merge_penalty: 每跨过一个未匹配环焊缝的扣分
+        gap_penalty: 两端每个未匹配环焊缝的扣分
+        max_step_cost: 单步管长差扣分上限
+        statistics: calculate_weld_statistics 的结果，为 None 时重新计算
+
+    Returns:
+        WeldAlignment: 环焊缝对齐结果（与贪心算法结构相同）
+    """
+    result = WeldAlignment()
+    n, m = len(redis1), len(redis2)
+    if n == 0 or m == 0:
+        _append_unpaired(result, weld_numbers1, absolute_distances1, redis1, range(n),
+                         weld_numbers2, absolute_distances2, redis2, range(m))
+        result.count_aligned_welds()
+        return result
+
+    if statistics is None:
+        statistics = calculate_weld_statistics(redis1, redis2)
+    abs_threshold, rel_threshold = select_weld_thresholds(statistics)
+
+    r1 = np.asarray(redis1, dtype=float)
+    r2 = np.asarray(redis2, dtype=float)
+    cum1 = np.cumsum(r1)
+    cum2 = np.cumsum(r2)
+
+    # 带的中心：按起始点换算里程后，文件1每个环焊缝在文件2中的对应位置
+    centers = _band_centers(np.asarray(absolute_distances1, dtype=float),
+                            np.asarray(absolute_distances2, dtype=float),
+                            r1, r2, abs_threshold)
+    band = 2 * band_width + 1
+    lows = np.clip(centers - band_width, 0, max(m - band, 0))
+    begin1, begin2, end1, end2 = _overlap_bounds(centers, n, m)
+
+    cols = np.arange(band)
+    max_a = max(a for a, _ in DP_MOVES)
+    history = [None] * (max_a + 1)  # 最近几行的得分（滚动存储）
+    back = np.zeros((n, band), dtype=np.int8)  # 0 表示路径从该点开始，k 表示 DP_MOVES[k-1]
+
+    # 文件2中以 j 结尾、跨 b 个环焊缝的段长，越界处为 NaN（比较结果恒为 False）
+    padded = int(lows.max()) + band
+    seg2_by_b = {}
+    for b in {b for _, b in DP_MOVES}:
+        seg2 = np.full(padded, np.nan)
+        seg2[b:m] = cum2[b:] - cum2[:-b]
+        seg2_by_b[b] = seg2
+
+    best_score, best_cell = -np.inf, None
+    for i in range(n):
+        low = lows[i]
+        j = low + cols
+        # 开放起点：路径可以从任意一对开始，起点之前的环焊缝按 gap_penalty 计罚
+        score = -gap_penalty * (max(0, i - begin1) + np.maximum(0, j - begin2)).astype(float)
+        moves = np.zeros(band, dtype=np.int8)
+
+        for k, (a, b) in enumerate(DP_MOVES, start=1):
+            if i - a < 0:
+                continue
+            # 上一行的带与本行错开 shift 列，取值只需切片
+            shift = low - lows[i - a] - b
+            c0, c1 = max(0, -shift), min(band, band - shift)
+            if c0 >= c1:
+                continue
+            seg1 = cum1[i] - cum1[i - a]
+            seg2 = seg2_by_b[b][low + c0:low + c1]
+            step = 1 - np.minimum(np.abs(seg1 - seg2) / abs_threshold, max_step_cost) \
+                - merge_penalty * (a + b - 2)
+            candidate = history[(i - a) % len(history)][c0 + shift:c1 + shift] + step
+            better = candidate > score[c0:c1]
+            score[c0:c1][better] = candidate[better]
+            moves[c0:c1][better] = k
+
+        score[j >= m] = -np.inf
+        history[i % len(history)] = score
+        back[i] = moves
+
+        # 开放终点：终点之后的环焊缝按 gap_penalty 计罚
+        final = score - gap_penalty * (max(0, end1 - i) + np.maximum(0, end2 - j))
+        col = int(np.argmax(final))
+        if final[col] > best_score:
+            best_score, best_cell = final[col], (i, col)
+
+    # 回溯匹配路径
+    path = []
+    i, col = best_cell
+    while True:
+        j = int(lows[i] + col)
+        move = int(back[i, col])
+        path.append((i, j, move))
+        if move == 0:
+            break
+        a, b = DP_MOVES[move - 1]
+        i, j = i - a, j - b
+        col = j - lows[i]
+    path.reverse()
+
+    _build_alignment(result, path, weld_numbers1, absolute_distances1, redis1,
+                     weld_numbers2, absolute_distances2, redis2, cum1, cum2, abs_threshold, rel_threshold)
+    result.count_aligned_welds()
+    return result
+
+
+def _band_centers(abs1: np.ndarray, abs2: np.ndarray, r1: np.ndarray, r2: np.ndarray,
+                  abs_threshold: float) -> np.ndarray:
+    """以起始匹配点确定两份数据的里程偏移，推算文件1每个环焊缝在文件2中的对应位置"""
+    start = find_alignment_start(r1.tolist(), r2.tolist(), abs_threshold, min(4, len(r1), len(r2)))
+    start1, start2 = start if start is not None else (0, 0)
+    shift = abs2[start2] - abs1[start1]
+    pos = np.searchsorted(abs2, abs1 + shift)
+    left = np.clip(pos - 1, 0, len(abs2) - 1)
+    right = np.clip(pos, 0, len(abs2) - 1)
+    nearer = np.abs(abs2[left] - (abs1 + shift)) <= np.abs(abs2[right] - (abs1 + shift))
+    return np.where(nearer, left, right).astype(np.int64)
+
+
+def _overlap_bounds(centers: np.ndarray, n: int, m: int) -> Tuple[int, int, int, int]:
+    """两份数据重叠段的起止位置（起点之前、终点之后未匹配的环焊缝不计罚）"""
+    inside = np.flatnonzero((centers > 0) & (centers < m - 1))
+    if len(inside) == 0:
+        return 0, 0, n - 1, m - 1
+    first, last = inside[0], inside[-1]
+    return int(first), int(max(centers[first] - 1, 0)), int(last), int(min(centers[last] + 1, m - 1))
+
+
+def _build_alignment(result: WeldAlignment, path, weld_numbers1, absolute_distances1, redis1,
+                     weld_numbers2, absolute_distances2, redis2, cum1, cum2, abs_threshold, rel_threshold):
+    """按匹配路径写入对齐结果，段长差不满足阈值的步不计为对齐"""
+    first_i, first_j, _ = path[0]
+    _append_unpaired(result, weld_numbers1, absolute_distances1, redis1, range(first_i),
+                     weld_numbers2, absolute_distances2, redis2, range(first_j))
+
+    prev_i, prev_j = first_i, first_j
+    for step_idx, (i, j, move) in enumerate(path):
+        if step_idx == 0:
+            seg1, seg2 = redis1[i], redis2[j]
+        else:
+            # 中间跨过的环焊缝记为未匹配
+            _append_unpaired(result, weld_numbers1, absolute_distances1, redis1, range(prev_i + 1, i),
+                             weld_numbers2, absolute_distances2, redis2, range(prev_j + 1, j))
+            seg1, seg2 = cum1[i] - cum1[prev_i], cum2[j] - cum2[prev_j]
+
+        diff = abs(seg1 - seg2)
+        similar = diff < abs_threshold or (seg1 > 0 and diff / seg1 < rel_threshold) \
+            or (seg2 > 0 and diff / seg2 < rel_threshold)
+        if similar:
+            confidence = max(0, 1 - 2 * diff / (seg1 + seg2) / abs_threshold) if seg1 + seg2 > 0 else 1.0
+            result.add_alignment(
+                weld1=weld_numbers1[i],
+                dist1=absolute_distances1[i],
+                redis1=redis1[i],
+                weld2=weld_numbers2[j],
+                dist2=absolute_distances2[j],
+                redis2=redis2[j],
+                confidence=confidence
+            )
+        else:
+            _append_unpaired(result, weld_numbers1, absolute_distances1, redis1, [i],
+                             weld_numbers2, absolute_distances2, redis2, [j])
+        prev_i, prev_j = i, j
+
+    _append_unpaired(result, weld_numbers1, absolute_distances1, redis1, range(prev_i + 1, len(redis1)),
+                     weld_numbers2, absolute_distances2, redis2, range(prev_j + 1, len(redis2)))
+
+
+def _append_unpaired(result: WeldAlignment, weld_numbers1, absolute_distances1, redis1, indices1,
+                     weld_numbers2, absolute_distances2, redis2, indices2):
+    indices1 = list(indices1)
+    indices2 = list(indices2)
+    if indices1:
+        result.add_alignments(welds1=[weld_numbers1[idx] for idx in indices1],
+                              dists1=[absolute_distances1[idx] for idx in indices1],
+                              redis1=[redis1[idx] for idx in indices1])
+    if indices2:
+        result.add_alignments(welds2=[weld_numbers2[idx] for idx in indices2],
+                              dists2=[absolute_distances2[idx] for idx in indices2],
+                              redis2=[redis2[idx] for idx in indices2])
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import pickle
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from Tools.align_tools.column_schema import mapping_signature, resolve_schema
+from Tools.align_tools.defect_table import DefectTable
+from Tools.align_tools.listing_reader import read_listing
+from Tools.align_tools.stream_ingest import should_stream, stream_ingest_listing
+
+# 读取/提取逻辑发生变化时递增，使旧缓存自动失效
+READER_VERSION = 5
+
+DEFAULT_CACHE_DIR = os.path.join("CacheFiles", "ingest")
+
+# 待解析文件总大小低于该值时顺序读取：Windows（spawn）下每个子进程要重新导入对齐模块（约 1~2 秒），
+# 小文件并行反而更慢
+PARALLEL_INGEST_MIN_BYTES = 16 * 1024 * 1024
+
+
+def file_content_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """
+    计算文件内容哈希（分块读取，避免一次性载入大文件）
+
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ingest_listing(file_path: str, cache_dir: Optional[str] = None, use_cache: bool = True,
+                   streaming: Optional[bool] = None) -> Tuple[List[float], List[float], List[int], DefectTable]:
+    """
+    读取一份管道列表并提取环焊缝与缺陷数据，结果按文件内容哈希（及字段映射知识库签名）缓存到磁盘
+    （环焊缝为 Parquet，缺陷表为不压缩的 Arrow IPC 文件）
+
+    首次读取时解析 Excel 并写入缓存；之后同一内容的文件直接以内存映射方式读取缓存的缺陷列，
+    不再打开 Excel。
+
+    Args:
+        file_path: 文件路径
+        cache_dir: 缓存目录，默认为当前目录下的 CacheFiles/ingest
+        use_cache: 是否使用缓存
+        streaming: 是否分块流式读取，默认对超过 STREAMING_THRESHOLD_BYTES 的 xlsx / csv 自动启用
+
+    Returns:
+        tuple: (绝对距离列表, 相对距离列表, 焊缝编号列表, 缺陷表)
+    """
+    cache_path = _cache_path(file_path, cache_dir) if use_cache else None
+    if cache_path is not None:
+        cached = _load_cached_tables(cache_path)
+        if cached is not None:
+            print(f"命中读取缓存: {os.path.basename(file_path)}")
+            return cached
+
+    result = extract_listing(file_path, streaming)
+    if cache_path is not None:
+        _try_save_cached_tables(cache_path, *result)
+    return result
+
+
+def ingest_listings(file_paths: List[str], cache_dir: Optional[str] = None, use_cache: bool = True,
+                    streaming: Optional[bool] = None, parallel: bool = True) -> List[Tuple]:
+    """
+    同时读取多份管道列表（各文件互不依赖，未命中缓存的文件总大小超过 PARALLEL_INGEST_MIN_BYTES 时在进程池中并行解析）
+
+    子进程只返回提取后的紧凑数组和缺陷表，不回传整张数据框；
+    进程池不可用（如受限环境、序列化失败）时自动退回顺序读取。
+
+    Args:
+        file_paths: 文件路径列表
+        cache_dir: 缓存目录，默认为当前目录下的 CacheFiles/ingest
+        use_cache: 是否使用缓存
+        streaming: 是否分块流式读取，默认按文件大小自动判断
+        parallel: 是否使用进程池并行解析
+
+    Returns:
+        list: 与 file_paths 顺序一致的 (绝对距离列表, 相对距离列表, 焊缝编号列表, 缺陷表)
+    """
+    results = [None] * len(file_paths)
+    cache_paths = [None] * len(file_paths)
+    pending = []
+    for i, file_path in enumerate(file_paths):
+        if use_cache:
+            cache_paths[i] = _cache_path(file_path, cache_dir)
+            cached = _load_cached_tables(cache_paths[i])
+            if cached is not None:
+                print(f"命中读取缓存: {os.path.basename(file_path)}")
+                results[i] = cached
+                continue
+        pending.append(i)
+
+    # 只有一个文件需要解析、文件较小或只有一个 CPU 时不值得启动子进程
+    max_workers = min(len(pending), os.cpu_count() or 1)
+    if parallel and max_workers > 1 and _total_size([file_paths[i] for i in pending]) >= PARALLEL_INGEST_MIN_BYTES:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {i: executor.submit(extract_listing, file_paths[i], streaming) for i in pending}
+                for i, future in futures.items():
+                    results[i] = future.result()
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            print(f"并行读取失败，改为顺序读取: {e}")
+
+    for i in pending:
+        if results[i] is None:
+            results[i] = extract_listing(file_paths[i], streaming)
+        if cache_paths[i] is not None:
+            _try_save_cached_tables(cache_paths[i], *results[i])
+
+    return results
+
+
+def extract_listing(file_path: str, streaming: Optional[bool] = None) -> Tuple[List[float], List[float], List[int], DefectTable]:
+    """
+    解析一份管道列表（不经过缓存），提取环焊缝与缺陷数据
+
+    Args:
+        file_path: 文件路径
+        streaming: 是否分块流式读取，默认按文件大小自动判断
+
+    Returns:
+        tuple: (绝对距离列表, 相对距离列表, 焊缝编号列表, 缺陷表)
+    """
+    # 避免循环导入：提取函数位于 align_defection 中
+    from Tools.align_tools.align_defection import read_weld_data, read_defect_data
+
+    if streaming is None:
+        streaming = should_stream(file_path)
+
+    if streaming:
+        print(f"正在流式读取文件 {os.path.basename(file_path)}...")
+        return stream_ingest_listing(file_path)
+
+    print(f"正在读取文件 {os.path.basename(file_path)}...")
+    df, _ = read_listing(file_path)
+    # 表头只解析一次，环焊缝与缺陷读取共用
+    schema = resolve_schema(df)
+    abs_dist, rel_dist, weld_nums = read_weld_data(df, schema)
+    defects = read_defect_data(df, schema=schema)
+    return abs_dist, rel_dist, weld_nums, defects
+
+
+def _total_size(file_paths: List[str]) -> int:
+    total = 0
+    for file_path in file_paths:
+        try:
+            total += os.path.getsize(file_path)
+        except OSError:
+            pass
+    return total
+
+
+def _cache_path(file_path: str, cache_dir: Optional[str]) -> str:
+    if cache_dir is None:
+        cache_dir = os.path.join(os.getcwd(), DEFAULT_CACHE_DIR)
+    # 列角色由字段映射知识库决定，修改别名后同一文件需要重新解析
+    return os.path.join(cache_dir, f"{file_content_hash(file_path)}_v{READER_VERSION}_m{mapping_signature()[:16]}")
+
+
+def _try_save_cached_tables(cache_path: str, abs_dist, rel_dist, weld_nums, defects: DefectTable):
+    try:
+        _save_cached_tables(cache_path, abs_dist, rel_dist, weld_nums, defects)
+    except (OSError, pa.ArrowException) as e:
+        print(f"写入读取缓存失败（不影响本次结果）: {e}")
+
+
+def _save_cached_tables(cache_path: str, abs_dist, rel_dist, weld_nums, defects: DefectTable):
+    """先写入临时目录再重命名，避免并发读取到写了一半的缓存"""
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        welds = pa.table({
+            'absolute_distance': pa.array(np.asarray(abs_dist, dtype=np.float64)),
+            'relative_distance': pa.array(np.asarray(rel_dist, dtype=np.float64)),
+            'weld_number': pa.array(np.asarray(weld_nums, dtype=np.int64)),
+        })
+        pq.write_table(welds, os.path.join(tmp_path, 'welds.parquet'))
+        defects.write_arrow_file(os.path.join(tmp_path, 'defects.arrow'))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # 目标已存在（其他进程先写完）时直接丢弃本次结果
+        if os.path.isdir(cache_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        raise
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def _load_cached_tables(cache_path: str):
+    welds_path = os.path.join(cache_path, 'welds.parquet')
+    defects_path = os.path.join(cache_path, 'defects.arrow')
+    if not (os.path.exists(welds_path) and os.path.exists(defects_path)):
+        return None
+    try:
+        welds = pq.read_table(welds_path)
+        defects = DefectTable.read_arrow_file(defects_path)
+    except (OSError, pa.ArrowException) as e:
+        print(f"读取缓存损坏，重新解析: {e}")
+        return None
+
+    abs_dist = welds.column('absolute_distance').to_numpy().tolist()
+    rel_dist = welds.column('relative_distance').to_numpy().tolist()
+    weld_nums = welds.column('weld_number').to_numpy().tolist()
+    if rel_dist:
+        # 与 read_weld_data 保持一致：第一个相对距离为整数 0
+        rel_dist[0] = 0
+
+    return abs_dist, rel_dist, weld_nums, defects
@@ -0,0 +1,174 @@
+import importlib.util
+import json
+import os
+import pandas as pd
+from typing import Callable, Dict, List, Optional, Tuple
+
+from Tools.align_tools.column_schema import mapping_signature, resolve_schema
+
+# 名称中包含这些关键字的工作表在得分相同时优先（旧工具约定的 "Pipeline Listing" / "管道列表"）
+LISTING_SHEET_HINTS = ('pipeline listing', '管道列表', 'listing')
+
+# 文件内容哈希 + 字段映射知识库签名 -> 检测出的工作表名（进程内缓存，另有 json 文件持久化）
+_SHEET_CACHE: Dict[str, str] = {}
+
+SHEET_CACHE_FILE = 'sheet_detection.json'
+
+# 后缀 -> 读取函数，读取函数签名为 reader(file_path, sheet_name) -> (DataFrame, 工作表名列表)
+_READERS: Dict[str, Callable] = {}
+
+
+def register_reader(suffixes, reader: Callable):
+    """
+    注册某类文件的读取函数
+
+    Args:
+        suffixes: 文件后缀（如 '.csv'）或后缀列表
+        reader: 读取函数 reader(file_path, sheet_name) -> (DataFrame, 工作表名列表)
+    """
+    if isinstance(suffixes, str):
+        suffixes = [suffixes]
+    for suffix in suffixes:
+        _READERS[suffix.lower()] = reader
+
+
+def select_excel_engine(file_path: str) -> Optional[str]:
+    """
+    为 Excel 文件选择解析引擎
+
+    已安装 python-calamine 时优先使用 calamine（Rust 实现，速度快得多）；
+    否则 xlsx 使用 openpyxl（pandas 会以 read_only=True 的流式模式打开），
+    其他格式交给 pandas 默认引擎。
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        str: pandas 的 engine 参数
+    """
+    if importlib.util.find_spec('python_calamine') is not None:
+        return 'calamine'
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in ('.xlsx', '.xlsm'):
+        return 'openpyxl'
+    return None
+
+
+def read_listing(file_path: str, sheet_name: Optional[str] = None) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    读取一份管道列表文件，整个过程只打开一次文件
+
+    根据后缀自动选择读取方式：Excel 走快速引擎，CSV / Parquet 直接读取。
+
+    Args:
+        file_path: 文件路径
+        sheet_name: 工作表名称，默认自动识别管道列表所在的工作表（CSV / Parquet 忽略）
+
+    Returns:
+        tuple: (数据框, 工作表名列表)
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    reader = _READERS.get(suffix, _read_excel)
+    return reader(file_path, sheet_name)
+
+
+def detect_listing_sheet(file_path: str, sheet_names: List[str], read_headers: Callable) -> str:
+    """
+    自动识别工作簿中的管道列表工作表
+
+    按表头能映射到的列角色数量为每个工作表打分（必须的绝对距离、环焊缝编号列优先），
+    得分相同时名称包含 LISTING_SHEET_HINTS 的优先，再按原顺序取第一个。
+    识别结果按文件内容哈希和字段映射知识库签名缓存，同一文件再次读取时不再逐个读取表头；
+    修改知识库中的别名后重新识别。
+
+    Args:
+        file_path: 文件路径
+        sheet_names: 工作表名称列表
+        read_headers: 读取表头的函数 read_headers(sheet_name) -> 表头列表
+
+    Returns:
+        str: 工作表名称
+    """
+    if len(sheet_names) <= 1:
+        return sheet_names[0]
+
+    # 避免循环导入：哈希与缓存目录定义在 ingest_cache 中
+    from Tools.align_tools.ingest_cache import file_content_hash, DEFAULT_CACHE_DIR
+
+    cache_key = f"{file_content_hash(file_path)}_m{mapping_signature()[:16]}"
+    sidecar_path = os.path.join(os.getcwd(), DEFAULT_CACHE_DIR, SHEET_CACHE_FILE)
+    cached = _SHEET_CACHE.get(cache_key) or _load_sheet_sidecar(sidecar_path).get(cache_key)
+    if cached in sheet_names:
+        _SHEET_CACHE[cache_key] = cached
+        return cached
+
+    best_sheet, best_score = sheet_names[0], None
+    for name in sheet_names:
+        try:
+            headers = read_headers(name)
+        except Exception as e:
+            print(f"读取工作表 {name} 的表头失败: {e}")
+            continue
+        schema = resolve_schema(pd.DataFrame(columns=headers))
+        required = sum(schema.get(role) is not None for role in ('abs_distance', 'weld_number'))
+        hinted = any(hint in str(name).lower() for hint in LISTING_SHEET_HINTS)
+        score = (required, schema.coverage, hinted)
+        if best_score is None or score > best_score:
+            best_sheet, best_score = name, score
+
+    if best_sheet != sheet_names[0]:
+        print(f"自动识别管道列表工作表: {best_sheet}")
+    _SHEET_CACHE[cache_key] = best_sheet
+    _save_sheet_sidecar(sidecar_path, cache_key, best_sheet)
+    return best_sheet
+
+
+def _load_sheet_sidecar(sidecar_path: str) -> Dict[str, str]:
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_sheet_sidecar(sidecar_path: str, cache_key: str, sheet_name: str):
+    data = _load_sheet_sidecar(sidecar_path)
+    data[cache_key] = sheet_name
+    tmp_path = f"{sidecar_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(sidecar_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, sidecar_path)
+    except OSError as e:
+        print(f"写入工作表识别缓存失败（不影响本次结果）: {e}")
+
+
+def _read_excel(file_path: str, sheet_name: Optional[str] = None) -> Tuple[pd.DataFrame, List[str]]:
+    """用同一个 ExcelFile 对象识别工作表并解析，避免重复打开工作簿"""
+    with pd.ExcelFile(file_path, engine=select_excel_engine(file_path)) as excel_file:
+        sheet_names = excel_file.sheet_names
+        target = sheet_name
+        if target is None:
+            target = detect_listing_sheet(file_path, sheet_names,
+                                          lambda name: list(excel_file.parse(name, nrows=0).columns))
+        df = excel_file.parse(target)
+    return df, sheet_names
+
+
+def _read_csv(file_path: str, sheet_name: Optional[str] = None) -> Tuple[pd.DataFrame, List[str]]:
+    """读取 CSV，依次尝试 UTF-8（含 BOM）与 GBK 编码"""
+    try:
+        df = pd.read_csv(file_path, encoding='utf-8-sig')
+    except UnicodeDecodeError:
+        df = pd.read_csv(file_path, encoding='gbk')
+    return df, ['Sheet1']
+
+
+def _read_parquet(file_path: str, sheet_name: Optional[str] = None) -> Tuple[pd.DataFrame, List[str]]:
+    return pd.read_parquet(file_path), ['Sheet1']
+
+
+register_reader(['.xlsx', '.xlsm', '.xls', '.xlsb', '.ods'], _read_excel)
+register_reader(['.csv', '.txt'], _read_csv)
+register_reader(['.parquet', '.pq'], _read_parquet)
@@ -0,0 +1,440 @@
+import codecs
+import os
+import numpy as np
+import pandas as pd
+from typing import Iterator, List, Optional, Tuple
+
+from Tools.align_tools.column_schema import resolve_schema
+from Tools.align_tools.column_utils import get_column, strip_text, nonblank_mask, to_float_array, to_int_array
+from Tools.align_tools.defect_table import DefectTable
+from Tools.align_tools.listing_reader import detect_listing_sheet
+
+# 超过该大小的文件默认使用流式读取
+STREAMING_THRESHOLD_BYTES = 32 * 1024 * 1024
+
+# 每次处理的行数
+DEFAULT_CHUNK_SIZE = 20000
+
+STREAMABLE_SUFFIXES = ('.xlsx', '.xlsm', '.csv', '.txt')
+
+# 与 pandas 读取 Excel 时默认识别为空值的字符串一致
+NA_STRINGS = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+              '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+
+def should_stream(file_path: str) -> bool:
+    """
+    判断文件是否应该使用流式读取（格式支持且文件足够大）
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        bool: 是否流式读取
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix not in STREAMABLE_SUFFIXES:
+        return False
+    try:
+        return os.path.getsize(file_path) >= STREAMING_THRESHOLD_BYTES
+    except OSError:
+        return False
+
+
+def stream_ingest_listing(file_path: str, sheet_name: Optional[str] = None,
+                          chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[List[float], List[float], List[int], DefectTable]:
+    """
+    分块流式读取管道列表并提取环焊缝与缺陷数据
+
+    结果与 read_weld_data + read_defect_data 一致，但内存中只保留当前数据块、
+    已提取的紧凑列以及查找上游环焊缝所需的少量状态。
+
+    Args:
+        file_path: 文件路径（xlsx / xlsm / csv）
+        sheet_name: 工作表名称，默认自动识别管道列表所在的工作表
+        chunk_size: 每块行数
+
+    Returns:
+        tuple: (绝对距离列表, 相对距离列表, 焊缝编号列表, 缺陷表)
+    """
+    headers, chunks = iter_listing_chunks(file_path, sheet_name, chunk_size)
+    ingest = StreamingListingIngest(headers)
+    for chunk in chunks:
+        ingest.feed(chunk)
+    return ingest.finish()
+
+
+def iter_listing_chunks(file_path: str, sheet_name: Optional[str] = None,
+                        chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[list, Iterator[pd.DataFrame]]:
+    """
+    按块读取文件，返回表头和数据块迭代器
+
+    Args:
+        file_path: 文件路径
+        sheet_name: 工作表名称（CSV 忽略）
+        chunk_size: 每块行数
+
+    Returns:
+        tuple: (表头列表, DataFrame 迭代器)
+    """
+    suffix = os.path.splitext(file_path)[1].lower()
+    if suffix in ('.csv', '.txt'):
+        return _iter_csv_chunks(file_path, chunk_size)
+    return _iter_excel_chunks(file_path, sheet_name, chunk_size)
+
+
+def _iter_excel_chunks(file_path: str, sheet_name: Optional[str], chunk_size: int):
+    """openpyxl 只读模式逐行读取，不会把整个工作表载入内存"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    if sheet_name is None:
+        sheet_name = detect_listing_sheet(
+            file_path, workbook.sheetnames,
+            lambda name: _make_headers(next(workbook[name].iter_rows(max_row=1, values_only=True), ()))
+        )
+    worksheet = workbook[sheet_name]
+    rows = worksheet.iter_rows(values_only=True)
+    try:
+        header_row = next(rows)
+    except StopIteration:
+        workbook.close()
+        return [], iter(())
+    headers = _make_headers(header_row)
+
+    def generate():
+        try:
+            buffer = []
+            for row in rows:
+                row = tuple(row[:len(headers)]) + (None,) * (len(headers) - len(row))
+                buffer.append(row)
+                if len(buffer) >= chunk_size:
+                    yield _records_to_frame(buffer, headers)
+                    buffer = []
+            # 与 pandas 一致：丢弃末尾的全空行
+            while buffer and all(v is None for v in buffer[-1]):
+                buffer.pop()
+            if buffer:
+                yield _records_to_frame(buffer, headers)
+        finally:
+            workbook.close()
+
+    return headers, generate()
+
+
+def _records_to_frame(records, headers) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(records, columns=headers)
+    for col in frame.columns[frame.dtypes == object]:
+        frame[col] = frame[col].mask(frame[col].isin(NA_STRINGS))
+    return frame
+
+
+def _iter_csv_chunks(file_path: str, chunk_size: int):
+    encoding = _detect_csv_encoding(file_path)
+    reader = pd.read_csv(file_path, encoding=encoding, chunksize=chunk_size)
+    first = next(reader, None)
+    if first is None:
+        return [], iter(())
+
+    def generate():
+        yield first
+        yield from reader
+
+    return list(first.columns), generate()
+
+
+def _detect_csv_encoding(file_path: str, probe_size: int = 4 * 1024 * 1024) -> str:
+    """用文件开头的一段内容判断编码：UTF-8（含 BOM）优先，否则按 GBK 读取"""
+    with open(file_path, 'rb') as f:
+        head = f.read(probe_size)
+    try:
+        codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'gbk'
+
+
+def _make_headers(header_row) -> list:
+    """与 pandas 的表头处理一致：空表头命名为 Unnamed: i，重复表头追加 .1 / .2 后缀"""
+    headers = []
+    seen = {}
+    for i, name in enumerate(header_row):
+        if name is None:
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
+
+
+class _WeldCollector:
+    """按出现顺序收集一类环焊缝候选行（编号为空时自动编号 10、20、30...）"""
+
+    def __init__(self):
+        self.distances = []
+        self.numbers = []
+        self.auto_count = 0
+
+    def add(self, is_weld, abs_values, weld_values, weld_valid, weld_missing):
+        auto_numbered = is_weld & weld_missing
+        weld_values = weld_values.copy()
+        count = int(auto_numbered.sum())
+        weld_values[auto_numbered] = (np.arange(1, count + 1) + self.auto_count) * 10
+        self.auto_count += count
+        keep = is_weld & (weld_valid | weld_missing)
+        self.distances.append(abs_values[keep])
+        self.numbers.append(weld_values[keep])
+
+    def result(self):
+        if not self.distances:
+            return [], [], []
+        kept_distances = np.concatenate(self.distances)
+        kept_numbers = np.concatenate(self.numbers)
+        order = np.argsort(kept_distances, kind='stable')
+        sorted_distances = kept_distances[order]
+        relative_distances = [0] + np.round(np.diff(sorted_distances), 4).tolist()
+        return sorted_distances.tolist(), relative_distances, kept_numbers[order].tolist()
+
+
+class StreamingListingIngest:
+    """
+    流式提取器：逐块接收数据行，增量生成环焊缝和缺陷的列式数据
+
+    跨数据块保留的状态：
+    - 最近一个环焊缝行（缺陷向上查找上游环焊缝）
+    - 尚未找到上游环焊缝的缺陷（文件开头、第一个环焊缝之前，最多向下查找 forward_window 行）
+    - 缺陷绝对距离的前向填充值、缺陷序号计数、环焊缝自动编号计数
+    - "环焊缝"类型标记与自动标记两套环焊缝候选，读完后按是否存在"环焊缝"类型选择其一
+    """
+
+    def __init__(self, headers, forward_window: int = 10):
+        # 避免循环导入：分类和时钟方位转换函数位于 align_defection 中
+        from Tools.align_tools.align_defection import classify_defect_type, convert_clock_column
+
+        self._classify_defect_type = classify_defect_type
+        self._convert_clock_column = convert_clock_column
+        self.forward_window = forward_window
+
+        self.schema = resolve_schema(pd.DataFrame(columns=headers))
+        if self.schema.get('abs_distance') is None:
+            raise ValueError("未找到绝对距离列")
+
+        self.rows_seen = 0
+        self.defect_count = 0
+        self.has_weld_type = False
+        self.tagged_welds = _WeldCollector()
+        self.auto_welds = _WeldCollector()
+        self.plain_welds = _WeldCollector()
+
+        self.last_weld = None  # (编号, 绝对距离)
+        self.last_defect_abs = None
+        self.pending = []  # 尚未找到上游环焊缝的缺陷批次
+        self.emitted = []  # 已确定上游环焊缝的缺陷批次
+        self.emitted_count = 0
+        self.auto_tag_rows = []  # 自动标记为环焊缝的缺陷行在输出中的位置
+        self.classified = {}
+
+    def feed(self, chunk: pd.DataFrame):
+        """
+        处理一个数据块
+
+        Args:
+            chunk: 数据块（列与表头一致，行按文件顺序）
+        """
+        chunk = chunk.reset_index(drop=True)
+        schema = self.schema
+        weld_column = get_column(chunk, schema.get('weld_number'))
+        depth_column = get_column(chunk, schema.get('depth'))
+        abs_values = to_float_array(chunk[schema.get('abs_distance')])
+        abs_valid = ~np.isnan(abs_values)
+        weld_values, weld_valid = to_int_array(weld_column)
+
+        # 自动标记条件：上游环焊缝编号不为空且深度为空
+        auto_weld = nonblank_mask(weld_column) & ~nonblank_mask(depth_column)
+        self._collect_welds(chunk, abs_values, abs_valid, weld_column, weld_values, weld_valid, auto_weld)
+        self._collect_defects(chunk, abs_values, abs_valid, weld_values, weld_valid, auto_weld)
+        self.rows_seen += len(chunk)
+
+    def finish(self) -> Tuple[List[float], List[float], List[int], DefectTable]:
+        """
+        结束读取，返回提取结果
+
+        Returns:
+            tuple: (绝对距离列表, 相对距离列表, 焊缝编号列表, 缺陷表)
+        """
+        use_auto_tag = self.schema.get('feature_type') is not None and not self.has_weld_type
+        if self.schema.get('feature_type') is None:
+            welds = self.plain_welds.result()
+        elif use_auto_tag:
+            print("未找到环焊缝类型，正在自动标记...")
+            welds = self.auto_welds.result()
+        else:
+            welds = self.tagged_welds.result()
+
+        defects = DefectTable.concat(self.emitted)
+        if use_auto_tag and self.auto_tag_rows:
+            # 与 read_weld_data 就地修改数据框的效果一致：自动标记的行注释变为"环焊缝"
+            rows = np.concatenate(self.auto_tag_rows)
+            patched_rows = rows[:, 0]
+            type_missing = rows[:, 1].astype(bool)
+            comments = np.asarray(defects.comment, dtype=object)
+            defect_types = np.asarray(defects.defect_type, dtype=object)
+            comments[patched_rows] = '环焊缝'
+            defect_types[patched_rows[type_missing]] = self._classify('环焊缝')
+            defects.comment = pd.Categorical(comments)
+            defects.defect_type = pd.Categorical(defect_types)
+
+        return welds[0], welds[1], welds[2], defects
+
+    def _collect_welds(self, chunk, abs_values, abs_valid, weld_column, weld_values, weld_valid, auto_weld):
+        type_col = self.schema.get('feature_type')
+        weld_missing = weld_column.isna().to_numpy()
+        if type_col is not None:
+            tagged = (strip_text(chunk[type_col]) == '环焊缝').to_numpy()
+            if tagged.any() and not self.has_weld_type:
+                self.has_weld_type = True
+                self.auto_welds = None
+            self.tagged_welds.add(tagged & abs_valid, abs_values, weld_values, weld_valid, weld_missing)
+            if self.auto_welds is not None:
+                self.auto_welds.add(auto_weld & abs_valid, abs_values, weld_values, weld_valid, weld_missing)
+        elif self.schema.get('weld_number') is not None:
+            self.plain_welds.add(weld_valid & abs_valid, abs_values, weld_values, weld_valid,
+                                 np.zeros(len(chunk), dtype=bool))
+
+    def _collect_defects(self, chunk, abs_values, abs_valid, weld_values, weld_valid, auto_weld):
+        schema = self.schema
+        has_defect_data = np.zeros(len(chunk), dtype=bool)
+        for col in (schema.get('depth'), schema.get('length'), schema.get('width')):
+            if col is not None:
+                has_defect_data |= nonblank_mask(chunk[col])
+
+        # 环焊缝行：上游环焊缝编号和绝对距离有效，且深度、长度、宽度都为空
+        weld_rows = np.flatnonzero(weld_valid & abs_valid & ~has_defect_data)
+        if schema.get('weld_number') is None:
+            weld_rows = weld_rows[:0]
+
+        defect_rows = np.flatnonzero(has_defect_data)
+        batch = self._build_batch(chunk, defect_rows, abs_values, auto_weld)
+        self.defect_count += len(defect_rows)
+
+        # 向上查找：块内最近的环焊缝，块内没有时沿用上一块最后一个环焊缝
+        previous = np.searchsorted(weld_rows, defect_rows, side='right') - 1
+        has_previous = previous >= 0
+        anchor_numbers = np.zeros(len(defect_rows), dtype=np.int64)
+        anchor_distances = np.full(len(defect_rows), np.nan)
+        anchor_numbers[has_previous] = weld_values[weld_rows[previous[has_previous]]]
+        anchor_distances[has_previous] = abs_values[weld_rows[previous[has_previous]]]
+        if self.last_weld is not None:
+            anchor_numbers[~has_previous] = self.last_weld[0]
+            anchor_distances[~has_previous] = self.last_weld[1]
+            has_previous[:] = True
+
+        # 第一个环焊缝之前的缺陷：等待向下查找
+        if not has_previous.all():
+            self.pending.append(_take_batch(batch, ~has_previous))
+        if len(weld_rows) and self.pending:
+            first_weld = self.rows_seen + weld_rows[0]
+            pending = _concat_batches(self.pending)
+            self.pending = []
+            found = first_weld < pending['position'] + self.forward_window
+            pending = _take_batch(pending, found)
+            count = len(pending['position'])
+            self._emit(pending, np.full(count, weld_values[weld_rows[0]]), np.full(count, abs_values[weld_rows[0]]))
+
+        self._emit(_take_batch(batch, has_previous), anchor_numbers[has_previous], anchor_distances[has_previous])
+
+        # 向下查找窗口已超出当前块的缺陷不可能再找到环焊缝
+        next_row = self.rows_seen + len(chunk)
+        self.pending = [b for b in (_take_batch(p, p['position'] + self.forward_window > next_row)
+                                    for p in self.pending) if len(b['position'])]
+
+        if len(weld_rows):
+            last = weld_rows[-1]
+            self.last_weld = (int(weld_values[last]), float(abs_values[last]))
+
+    def _build_batch(self, chunk, rows, abs_values, auto_weld) -> dict:
+        """提取一批缺陷行的字段（上游环焊缝确定之前即可计算的部分）"""
+        schema = self.schema
+        batch = {
+            'position': self.rows_seen + rows,
+            'number': self.defect_count + np.arange(1, len(rows) + 1),
+            'abs': abs_values[rows],
+            'depth': np.nan_to_num(to_float_array(get_column(chunk, schema.get('depth')))[rows], nan=0),
+            'length': np.nan_to_num(to_float_array(get_column(chunk, schema.get('length')))[rows], nan=0),
+            'width': np.nan_to_num(to_float_array(get_column(chunk, schema.get('width')))[rows], nan=0),
+            'clock': self._convert_clock_column(get_column(chunk, schema.get('orientation')).iloc[rows]),
+            'auto_weld': auto_weld[rows] if schema.get('feature_type') is not None else np.zeros(len(rows), bool),
+        }
+
+        comments = np.full(len(rows), "", dtype=object)
+        if schema.get('feature_type') is not None:
+            comment_values = chunk[schema.get('feature_type')].iloc[rows]
+            comments = np.where(comment_values.notna(), comment_values.astype(str), "").astype(object)
+
+        defect_types = np.full(len(rows), "", dtype=object)
+        type_missing = np.ones(len(rows), dtype=bool)
+        if schema.get('defect_type') is not None:
+            type_values = chunk[schema.get('defect_type')].iloc[rows]
+            defect_types = np.where(type_values.notna(), type_values.astype(str), "").astype(object)
+            type_missing = type_values.isna().to_numpy()
+        classify_rows = type_missing & (comments != "")
+        if classify_rows.any():
+            defect_types[classify_rows] = [self._classify(c) for c in comments[classify_rows]]
+
+        batch['comment'] = comments
+        batch['defect_type'] = defect_types
+        batch['type_missing'] = type_missing
+        return batch
+
+    def _emit(self, batch, weld_numbers, weld_distances):
+        """确定上游环焊缝后写入结果"""
+        count = len(batch['position'])
+        if count == 0:
+            return
+        defect_abs = batch['abs']
+        distances_to_weld = np.where(~np.isnan(defect_abs), defect_abs - weld_distances, 0)
+
+        # 缺陷绝对距离为空时沿用上一个有效的缺陷绝对距离（跨块延续），若之前都没有则使用环焊缝的绝对距离
+        filled = defect_abs.copy()
+        if self.last_defect_abs is not None and np.isnan(filled[0]):
+            filled[0] = self.last_defect_abs
+        filled = pd.Series(filled).ffill().to_numpy()
+        if not np.isnan(filled[-1]):
+            self.last_defect_abs = float(filled[-1])
+        absolute_distances = np.where(np.isnan(filled), weld_distances, filled)
+
+        auto_weld = np.flatnonzero(batch['auto_weld'])
+        if len(auto_weld):
+            self.auto_tag_rows.append(np.column_stack([self.emitted_count + auto_weld,
+                                                       batch['type_missing'][auto_weld]]).astype(np.int64))
+
+        self.emitted.append(DefectTable(
+            weld_number=weld_numbers.astype(np.int64).astype(str),
+            distance_to_weld=[round(d, 3) for d in distances_to_weld.tolist()],
+            clock_position=batch['clock'],
+            depth=batch['depth'],
+            length=batch['length'],
+            width=batch['width'],
+            defect_type=batch['defect_type'],
+            comment=batch['comment'],
+            original_index=batch['number'],
+            absolute_distance=absolute_distances
+        ))
+        self.emitted_count += count
+
+    def _classify(self, comment):
+        """每种注释只分类一次"""
+        if comment not in self.classified:
+            self.classified[comment] = self._classify_defect_type(comment)
+        return self.classified[comment]
+
+
+def _take_batch(batch: dict, mask) -> dict:
+    return {key: values[mask] for key, values in batch.items()}
+
+
+def _concat_batches(batches: List[dict]) -> dict:
+    return {key: np.concatenate([b[key] for b in batches]) for key in batches[0]}
@@ -0,0 +1,195 @@
+import bisect
+import os
+import pickle
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from Tools.align_tools.align_defection import (WeldAlignment, calculate_weld_statistics, select_weld_thresholds,
+                                               comprehensive_weld_alignment, find_best_weld_alignment,
+                                               DEFAULT_BASE_DISTANCE_CANDIDATES)
+
+# 锚点所需的连续匹配管节数
+ANCHOR_LENGTH = 12
+
+# 相邻锚点之间至少间隔的环焊缝数（即每个分块的大致规模）
+DEFAULT_TILE_SIZE = 2000
+
+
+def find_tile_anchors(redis1: List[float], redis2: List[float], abs_threshold: float,
+                      anchor_length: int = ANCHOR_LENGTH, tile_size: int = DEFAULT_TILE_SIZE) -> List[Tuple[int, int]]:
+    """
+    查找用于分块的高置信度锚点
+
+    锚点是连续 anchor_length 个管节长度量化后完全相同、且在两份数据中都只出现一次的位置对，
+    再用原判据逐位验证。唯一匹配先经过最长递增子序列过滤（保证锚点在两份数据中顺序一致），
+    再按 tile_size 的间隔挑选。
+
+    Args:
+        redis1: 文件1相对距离列表
+        redis2: 文件2相对距离列表
+        abs_threshold: 相对距离绝对误差阈值
+        anchor_length: 连续匹配管节数
+        tile_size: 相邻锚点的最小间隔（环焊缝数）
+
+    Returns:
+        list: 锚点 (文件1位置, 文件2位置) 列表，按位置升序
+    """
+    r1 = np.asarray(redis1, dtype=float)
+    r2 = np.asarray(redis2, dtype=float)
+    if len(r1) < anchor_length or len(r2) < anchor_length:
+        return []
+
+    # 量化后的滑动窗口，两份数据统一编号
+    windows1 = sliding_window_view(np.floor(r1 / abs_threshold).astype(np.int64), anchor_length)
+    windows2 = sliding_window_view(np.floor(r2 / abs_threshold).astype(np.int64), anchor_length)
+    _, inverse = np.unique(np.concatenate([windows1, windows2]), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    ids1, ids2 = inverse[:len(windows1)], inverse[len(windows1):]
+    counts1 = np.bincount(ids1, minlength=inverse.max() + 1)
+    counts2 = np.bincount(ids2, minlength=inverse.max() + 1)
+
+    # 两份数据中都只出现一次的窗口
+    position2 = np.full(len(counts2), -1, dtype=np.int64)
+    position2[ids2] = np.arange(len(ids2))
+    starts1 = np.flatnonzero((counts1[ids1] == 1) & (counts2[ids1] == 1))
+    starts2 = position2[ids1[starts1]]
+
+    # 用原判据逐位验证
+    keep = np.ones(len(starts1), dtype=bool)
+    for t in range(anchor_length):
+        keep &= np.abs(r1[starts1 + t] - r2[starts2 + t]) < abs_threshold
+    starts1, starts2 = starts1[keep], starts2[keep]
+    if len(starts1) == 0:
+        return []
+
+    # 最长递增子序列：去掉与整体顺序矛盾的锚点
+    keep = _longest_increasing_subsequence(starts2)
+    starts1, starts2 = starts1[keep], starts2[keep]
+
+    anchors = []
+    for i, j in zip(starts1.tolist(), starts2.tolist()):
+        if i < tile_size or j < 1:
+            continue
+        if anchors and (i - anchors[-1][0] < tile_size or j <= anchors[-1][1]):
+            continue
+        if len(r1) - i < tile_size // 2:
+            break
+        anchors.append((i, j))
+    return anchors
+
+
+def tiled_weld_alignment(weld_numbers1: List[str], absolute_distances1: List[float], redis1: List[float],
+                         weld_numbers2: List[str], absolute_distances2: List[float], redis2: List[float],
+                         engine: str = 'greedy', max_candidates: int = DEFAULT_BASE_DISTANCE_CANDIDATES,
+                         tile_size: int = DEFAULT_TILE_SIZE, parallel: bool = True,
+                         max_workers: Optional[int] = None) -> Tuple[WeldAlignment, float]:
+    """
+    分块对齐长管线的环焊缝
+
+    先用唯一的长管节序列找出锚点，在锚点处把两份数据切成互不依赖的分块，
+    各分块在进程池中独立对齐（每块内部仍按原引擎选择最佳基础距离），最后按顺序拼接。
+    每个分块从锚点开始，起始点匹配在块内即可完成，单块内存与计算量有界。
+
+    Args:
+        weld_numbers1: 文件1环焊缝编号列表
+        absolute_distances1: 文件1绝对距离列表
+        redis1: 文件1相对距离列表
+        weld_numbers2: 文件2环焊缝编号列表
+        absolute_distances2: 文件2绝对距离列表
+        redis2: 文件2相对距离列表
+        engine: 分块内使用的对齐引擎，'greedy' 或 'dp'
+        max_candidates: 分块内基础距离候选数量
+        tile_size: 分块大小（环焊缝数）
+        parallel: 是否并行对齐各分块
+        max_workers: 进程数，默认为 CPU 核数
+
+    Returns:
+        tuple: (拼接后的环焊缝对齐结果, 各分块中最常用的基础距离)
+    """
+    statistics = calculate_weld_statistics(redis1, redis2)
+    abs_threshold, _ = select_weld_thresholds(statistics)
+    anchors = find_tile_anchors(redis1, redis2, abs_threshold, tile_size=tile_size)
+    print(f"分块对齐: 找到 {len(anchors)} 个锚点，共 {len(anchors) + 1} 个分块")
+
+    bounds1 = [0] + [i for i, _ in anchors] + [len(redis1)]
+    bounds2 = [0] + [j for _, j in anchors] + [len(redis2)]
+    tiles = []
+    for k in range(len(bounds1) - 1):
+        s1, e1, s2, e2 = bounds1[k], bounds1[k + 1], bounds2[k], bounds2[k + 1]
+        tiles.append((weld_numbers1[s1:e1], absolute_distances1[s1:e1], redis1[s1:e1],
+                      weld_numbers2[s2:e2], absolute_distances2[s2:e2], redis2[s2:e2],
+                      engine, max_candidates))
+
+    results = None
+    if parallel and len(tiles) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(len(tiles), max_workers or os.cpu_count() or 1)) as executor:
+                results = list(executor.map(_align_tile, tiles))
+        except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+            print(f"并行分块对齐失败，改为顺序计算: {e}")
+            results = None
+    if results is None:
+        results = [_align_tile(tile) for tile in tiles]
+
+    # 按顺序拼接各分块结果
+    stitched = WeldAlignment()
+    for alignment, _ in results:
+        stitched.extend_alignment(alignment)
+    stitched.count_aligned_welds()
+
+    base_distance = Counter(d for _, d in results).most_common(1)[0][0] if results else 0
+    stitched.base_distance = base_distance
+    print(f"分块对齐完成: 对齐 {stitched.aligned_count} 对环焊缝")
+    return stitched, base_distance
+
+
+def _align_tile(tile) -> Tuple[WeldAlignment, float]:
+    """对齐单个分块（进程池任务）"""
+    weld_numbers1, absolute_distances1, redis1, weld_numbers2, absolute_distances2, redis2, engine, max_candidates = tile
+    if len(redis1) == 0 or len(redis2) == 0:
+        # 一侧没有环焊缝，另一侧全部未匹配
+        alignment = WeldAlignment()
+        alignment.add_alignments(welds1=weld_numbers1, dists1=absolute_distances1, redis1=redis1)
+        alignment.add_alignments(welds2=weld_numbers2, dists2=absolute_distances2, redis2=redis2)
+        alignment.count_aligned_welds()
+        return alignment, 0
+
+    alignment, base_distance = find_best_weld_alignment(
+        weld_numbers1, absolute_distances1, redis1,
+        weld_numbers2, absolute_distances2, redis2,
+        max_candidates=max_candidates, parallel=False, engine=engine
+    )
+    if alignment is None:
+        # 所有候选都没有对齐（或没有候选）时按默认基础距离对齐
+        alignment = comprehensive_weld_alignment(weld_numbers1, absolute_distances1, redis1,
+                                                 weld_numbers2, absolute_distances2, redis2)
+        base_distance = alignment.base_distance
+    return alignment, base_distance
+
+
+def _longest_increasing_subsequence(values: np.ndarray) -> np.ndarray:
+    """严格递增的最长子序列（O(n log n)），返回保留元素的下标"""
+    tails = []  # tails[k]：长度为 k+1 的递增子序列的最小结尾值
+    tail_idx = []
+    previous = np.full(len(values), -1, dtype=np.int64)
+    for idx, value in enumerate(values.tolist()):
+        pos = bisect.bisect_left(tails, value)
+        if pos > 0:
+            previous[idx] = tail_idx[pos - 1]
+        if pos == len(tails):
+            tails.append(value)
+            tail_idx.append(idx)
+        else:
+            tails[pos] = value
+            tail_idx[pos] = idx
+    keep = []
+    idx = tail_idx[-1] if tail_idx else -1
+    while idx >= 0:
+        keep.append(idx)
+        idx = previous[idx]
+    return np.asarray(keep[::-1], dtype=np.int64)
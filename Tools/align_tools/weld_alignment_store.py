@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, Optional
+
+# 未对齐一侧的环焊缝编号占位符（与报告中的空白一致）
+MISSING_WELD = ' '
+
+# 对齐对的字段（顺序即报告中的列顺序）
+ALIGNMENT_FIELDS = ('file1_weld', 'file1_distance', 'file1_redis',
+                    'file2_weld', 'file2_distance', 'file2_redis', 'confidence')
+WELD_FIELDS = ('file1_weld', 'file2_weld')
+
+# 环焊缝对齐报告的列名
+REPORT_COLUMNS = {
+    'file1_weld': '文件1环焊缝',
+    'file1_distance': '文件1绝对距离',
+    'file1_redis': '文件1相对距离',
+    'file2_weld': '文件2环焊缝',
+    'file2_distance': '文件2绝对距离',
+    'file2_redis': '文件2相对距离',
+    'confidence': '对齐置信度',
+}
+
+_INITIAL_CAPACITY = 64
+
+
+class AlignmentRecord:
+    """
+    单个对齐对（只读），按需从列存储中取出
+
+    支持 record['file1_weld'] 形式的访问，与原先的对齐字典兼容。
+    """
+
+    __slots__ = ALIGNMENT_FIELDS
+
+    def __init__(self, file1_weld, file1_distance, file1_redis, file2_weld, file2_distance, file2_redis, confidence):
+        self.file1_weld = file1_weld
+        self.file1_distance = file1_distance
+        self.file1_redis = file1_redis
+        self.file2_weld = file2_weld
+        self.file2_distance = file2_distance
+        self.file2_redis = file2_redis
+        self.confidence = confidence
+
+    def __getitem__(self, key: str):
+        if key not in ALIGNMENT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default=None):
+        return getattr(self, key) if key in ALIGNMENT_FIELDS else default
+
+    def keys(self):
+        return ALIGNMENT_FIELDS
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in ALIGNMENT_FIELDS}
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AlignmentRecord):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    def __repr__(self) -> str:
+        return f"AlignmentRecord({self.to_dict()})"
+
+
+class AlignmentColumns:
+    """
+    对齐对的列式存储
+
+    距离、相对距离、置信度存为 float64 数组，环焊缝编号存为 object 数组（未对齐一侧为 MISSING_WELD），
+    容量按倍数增长，支持逐条与批量追加。
+    """
+
+    def __init__(self):
+        self._size = 0
+        self._data = {field: self._allocate(field, _INITIAL_CAPACITY) for field in ALIGNMENT_FIELDS}
+
+    @staticmethod
+    def _allocate(field: str, capacity: int) -> np.ndarray:
+        if field in WELD_FIELDS:
+            return np.full(capacity, MISSING_WELD, dtype=object)
+        return np.zeros(capacity, dtype=np.float64)
+
+    def _reserve(self, extra: int):
+        """保证还能再追加 extra 条"""
+        needed = self._size + extra
+        capacity = len(self._data['confidence'])
+        if needed <= capacity:
+            return
+        # 反序列化后的空存储容量为 0，翻倍前先恢复到初始容量
+        capacity = max(capacity, _INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        for field in ALIGNMENT_FIELDS:
+            grown = self._allocate(field, capacity)
+            grown[:self._size] = self._data[field][:self._size]
+            self._data[field] = grown
+
+    def __len__(self) -> int:
+        return self._size
+
+    def column(self, field: str) -> np.ndarray:
+        """某个字段的有效数据（视图，不要修改）"""
+        return self._data[field][:self._size]
+
+    def append(self, file1_weld, file1_distance, file1_redis, file2_weld, file2_distance, file2_redis, confidence):
+        """追加一个对齐对"""
+        self._reserve(1)
+        row = self._size
+        self._data['file1_weld'][row] = file1_weld
+        self._data['file1_distance'][row] = file1_distance
+        self._data['file1_redis'][row] = file1_redis
+        self._data['file2_weld'][row] = file2_weld
+        self._data['file2_distance'][row] = file2_distance
+        self._data['file2_redis'][row] = file2_redis
+        self._data['confidence'][row] = confidence
+        self._size += 1
+
+    def extend(self, count: int, **columns):
+        """
+        批量追加 count 个对齐对
+
+        Args:
+            count: 追加条数
+            **columns: 字段名 -> 数组或标量；未给出的环焊缝编号为 MISSING_WELD，数值为 0
+        """
+        if count <= 0:
+            return
+        self._reserve(count)
+        lo, hi = self._size, self._size + count
+        for field in ALIGNMENT_FIELDS:
+            if field in columns:
+                self._data[field][lo:hi] = columns[field]
+            elif field in WELD_FIELDS:
+                self._data[field][lo:hi] = MISSING_WELD
+            else:
+                self._data[field][lo:hi] = 0
+        self._size = hi
+
+    def record(self, row: int) -> AlignmentRecord:
+        """取出第 row 个对齐对"""
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError(row)
+        return AlignmentRecord(*(_native(self._data[field][row]) for field in ALIGNMENT_FIELDS))
+
+    def paired_mask(self) -> np.ndarray:
+        """两侧都有环焊缝的对齐对"""
+        return (self.column('file1_weld') != MISSING_WELD) & (self.column('file2_weld') != MISSING_WELD)
+
+    def to_frame(self, rename: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """转换为 DataFrame（数值列保持数值类型）"""
+        frame = pd.DataFrame({field: self.column(field).copy() for field in ALIGNMENT_FIELDS})
+        return frame.rename(columns=rename) if rename else frame
+
+    def __getstate__(self):
+        # 序列化时只保留有效数据
+        return {'_size': self._size, '_data': {field: self.column(field).copy() for field in ALIGNMENT_FIELDS}}
+
+    def __setstate__(self, state):
+        self._size = state['_size']
+        self._data = state['_data']
+
+
+class AlignmentView:
+    """对齐对的只读序列视图，兼容原先的 list-of-dict 用法（遍历、下标、len）"""
+
+    def __init__(self, columns: AlignmentColumns):
+        self._columns = columns
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __bool__(self) -> bool:
+        return len(self._columns) > 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._columns.record(row) for row in range(*item.indices(len(self._columns)))]
+        return self._columns.record(item)
+
+    def __iter__(self) -> Iterator[AlignmentRecord]:
+        values = [self._columns.column(field).tolist() for field in ALIGNMENT_FIELDS]
+        for row in zip(*values):
+            yield AlignmentRecord(*row)
+
+    def __repr__(self) -> str:
+        return f"AlignmentView({len(self)} alignments)"
+
+
+def _native(value):
+    """NumPy 标量转为 Python 原生类型"""
+    return value.item() if isinstance(value, np.generic) else value
@@ -14,4 +14,5 @@ class AgentState(TypedDict):
     current_record_id: Optional[str] # 新增 当前存储进对齐记忆库记录的id
     default_thresholds_vector: List[float] # 默认五维阈值
     expert_thresholds_vector: List[float] # 专家五维阈值
-    record_min_confidence: float
\ No newline at end of file
+    record_min_confidence: float
+    context_handle: Optional[str]   # 新增 对齐产物句柄（step1 结果存于磁盘，节点按句柄取回，不再把缺陷数据放进状态）
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+环焊缝/缺陷对齐的质量与耗时基准
+
+在仓库根目录运行：
+    python -m benchmarks.run_alignment_bench --sizes 1000 10000 100000
+    python -m benchmarks.run_alignment_bench --sizes 20000 --engine dp --output bench.jsonl
+
+对每个规模生成一对模拟内检测数据，分别计时 read_weld_data、find_best_weld_alignment、
+read_defect_data、align_defects_with_comprehensive_mapping，并按真实对应关系计算
+环焊缝与缺陷匹配的精确率/召回率。峰值内存用 tracemalloc 在单独一轮中测量
+（只统计主进程；find_best_weld_alignment 的进程池子进程不计入）。
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic_ili import SyntheticRunPair, generate_run_pair
+from Tools.align_tools.align_defection import (read_weld_data, read_defect_data, find_best_weld_alignment,
+                                               analyze_defect_distribution, set_confidence_by_density,
+                                               align_defects_with_comprehensive_mapping,
+                                               DEFAULT_BASE_DISTANCE_CANDIDATES)
+
+DEFAULT_SIZES = (1000, 5000, 20000, 100000)
+
+# 与 node_align_process 中的默认阈值一致
+DEFAULT_THRESHOLDS = {
+    'distance': 1.0,
+    'clock_position': 45,
+    'length': 10,
+    'width': 10,
+    'depth': 2,
+}
+
+MATCHED_TYPES = ('环焊缝对齐匹配', '相对距离匹配')
+
+
+def run_benchmark(pair: SyntheticRunPair, engine: str = 'greedy', tiling: bool = False,
+                  min_confidence: Optional[float] = None, measure_memory: bool = True,
+                  assignment: str = 'greedy', max_candidates: int = DEFAULT_BASE_DISTANCE_CANDIDATES) -> Dict:
+    """
+    对一对模拟数据运行完整的对齐流程并统计各阶段耗时、峰值内存和匹配质量
+
+    Args:
+        pair: generate_run_pair 的结果
+        engine: 环焊缝对齐引擎
+        tiling: 是否分块对齐
+        min_confidence: 缺陷匹配置信度阈值，为 None 时按缺陷分布计算（与智能体流程一致）
+        measure_memory: 是否额外运行一轮测量峰值内存
+        assignment: 缺陷匹配方式，'greedy' 或 'optimal'
+        max_candidates: 基础距离候选数量
+
+    Returns:
+        dict: 基准结果
+    """
+    stages = _stages(pair, engine, tiling, min_confidence, assignment, max_candidates)
+
+    result = {
+        'welds1': pair.params['n_welds'],
+        'defect_rows1': int(len(pair.df1) - pair.params['n_welds']),
+        'engine': engine,
+        'tiling': tiling,
+        'assignment': assignment,
+        'max_candidates': max_candidates,
+    }
+    outputs = {}
+    for name, func in stages:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            outputs[name] = func(outputs)
+        result[f'{name}_seconds'] = round(time.perf_counter() - start, 4)
+
+    if measure_memory:
+        memory_outputs = {}
+        for name, func in stages:
+            gc.collect()
+            tracemalloc.start()
+            with contextlib.redirect_stdout(io.StringIO()):
+                memory_outputs[name] = func(memory_outputs)
+            result[f'{name}_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1e6, 2)
+            tracemalloc.stop()
+        del memory_outputs
+
+    weld_alignment, _ = outputs['weld_alignment']
+    defects1, defects2 = outputs['read_defects']
+    defect_result = outputs['defect_alignment']
+
+    n_welds = len(outputs['read_welds'][0][0]) + len(outputs['read_welds'][1][0])
+    n_defects = len(defects1) + len(defects2)
+    result['weld_throughput_per_s'] = round(n_welds / max(result['weld_alignment_seconds'], 1e-9))
+    result['defect_throughput_per_s'] = round(n_defects / max(result['defect_alignment_seconds'], 1e-9))
+    result.update(_prefixed('weld', weld_scores(weld_alignment, pair.weld_truth)))
+    result.update(_prefixed('defect', defect_scores(defect_result, pair.defect_truth)))
+    return result
+
+
+def _stages(pair: SyntheticRunPair, engine: str, tiling: bool,
+            min_confidence: Optional[float], assignment: str = 'greedy',
+            max_candidates: int = DEFAULT_BASE_DISTANCE_CANDIDATES) -> List[Tuple[str, Callable]]:
+    """各阶段按顺序执行，后一阶段从 outputs 中取前一阶段的结果"""
+
+    def read_welds(outputs):
+        # read_weld_data 可能会给数据框补充环焊缝标记，使用副本
+        return read_weld_data(pair.df1.copy()), read_weld_data(pair.df2.copy())
+
+    def align_welds(outputs):
+        (abs1, rel1, nums1), (abs2, rel2, nums2) = outputs['read_welds']
+        return find_best_weld_alignment([str(w) for w in nums1], abs1, rel1,
+                                        [str(w) for w in nums2], abs2, rel2,
+                                        max_candidates=max_candidates, engine=engine, tiling=tiling)
+
+    def read_defects(outputs):
+        return read_defect_data(pair.df1.copy()), read_defect_data(pair.df2.copy())
+
+    def align_defects(outputs):
+        defects1, defects2 = outputs['read_defects']
+        confidence = min_confidence
+        if confidence is None:
+            metric = analyze_defect_distribution(defects1, defects2)
+            confidence = set_confidence_by_density(metric) if isinstance(metric, dict) else metric
+        weld_alignment, _ = outputs['weld_alignment']
+        return align_defects_with_comprehensive_mapping(defects1, defects2, weld_alignment,
+                                                        DEFAULT_THRESHOLDS, confidence, assignment=assignment)
+
+    return [('read_welds', read_welds), ('weld_alignment', align_welds),
+            ('read_defects', read_defects), ('defect_alignment', align_defects)]
+
+
+def weld_scores(weld_alignment, weld_truth: Dict[str, str]) -> Dict[str, float]:
+    """
+    环焊缝配对的精确率/召回率
+
+    Args:
+        weld_alignment: WeldAlignment
+        weld_truth: 文件1环焊缝编号 -> 文件2环焊缝编号
+
+    Returns:
+        dict: precision、recall、pairs（算法给出的配对数）
+    """
+    pairs = [(a['file1_weld'], a['file2_weld']) for a in weld_alignment.alignments
+             if a['file1_weld'] != ' ' and a['file2_weld'] != ' ']
+    correct = sum(1 for weld1, weld2 in pairs if weld_truth.get(_weld_key(weld1)) == _weld_key(weld2))
+    return _precision_recall(correct, len(pairs), len(weld_truth))
+
+
+def defect_scores(defect_result, defect_truth: Dict[int, int]) -> Dict[str, float]:
+    """
+    缺陷配对的精确率/召回率（只统计“环焊缝对齐匹配”和“相对距离匹配”两类结果）
+
+    Args:
+        defect_result: align_defects_with_comprehensive_mapping 的结果
+        defect_truth: 文件1缺陷序号 -> 文件2缺陷序号
+
+    Returns:
+        dict: precision、recall、pairs（算法给出的配对数）
+    """
+    matched = defect_result[defect_result['匹配类型'].isin(MATCHED_TYPES)]
+    pairs = list(zip(matched['文件1缺陷ID'].tolist(), matched['文件2缺陷ID'].tolist()))
+    correct = sum(1 for id1, id2 in pairs if defect_truth.get(int(id1)) == int(id2))
+    return _precision_recall(correct, len(pairs), len(defect_truth))
+
+
+def _precision_recall(correct: int, predicted: int, actual: int) -> Dict[str, float]:
+    return {
+        'precision': round(correct / predicted, 4) if predicted else 0.0,
+        'recall': round(correct / actual, 4) if actual else 0.0,
+        'pairs': predicted,
+    }
+
+
+def _prefixed(prefix: str, values: Dict) -> Dict:
+    return {f'{prefix}_{key}': value for key, value in values.items()}
+
+
+def _weld_key(weld) -> str:
+    """环焊缝编号统一为整数字符串（读取时可能得到 10 或 10.0）"""
+    try:
+        return str(int(float(weld)))
+    except (TypeError, ValueError):
+        return str(weld)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="环焊缝/缺陷对齐基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="环焊缝数（可多个）")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--engine', choices=('greedy', 'dp'), default='greedy', help="环焊缝对齐引擎")
+    parser.add_argument('--tiling', action='store_true', help="按锚点分块对齐")
+    parser.add_argument('--assignment', choices=('greedy', 'optimal'), default='greedy',
+                        help="缺陷匹配方式（optimal 需要 scipy）")
+    parser.add_argument('--max-candidates', type=int, default=DEFAULT_BASE_DISTANCE_CANDIDATES,
+                        help="基础距离候选数量（3 即原先的取值）")
+    parser.add_argument('--defects-per-joint', type=float, default=1.0, help="每个管节的平均缺陷数")
+    parser.add_argument('--min-confidence', type=float, default=None, help="缺陷匹配置信度阈值")
+    parser.add_argument('--no-memory', action='store_true', help="不测量峰值内存（省去一轮运行）")
+    parser.add_argument('--output', default=None, help="结果追加写入的 JSON Lines 文件")
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        pair = generate_run_pair(size, seed=args.seed, defects_per_joint=args.defects_per_joint)
+        result = run_benchmark(pair, engine=args.engine, tiling=args.tiling,
+                               min_confidence=args.min_confidence, measure_memory=not args.no_memory,
+                               assignment=args.assignment, max_candidates=args.max_candidates)
+        print(f"\n=== {size} 个环焊缝 / {result['defect_rows1']} 个缺陷 ({args.engine}{', 分块' if args.tiling else ''}"
+              f"{', 最优分配' if args.assignment == 'optimal' else ''}) ===")
+        for key, value in result.items():
+            print(f"{key:>32}: {value}")
+        if args.output:
+            with open(args.output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+import json
+
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+# 生成的管道列表使用的表头（与知识库标准名一致，读取时无需别名映射）
+COLUMNS = ['Log distance(m)', 'Upstream girth weld', 'Feature type', 'Peak depth(%)',
+           'Length(mm)', 'Width(mm)', 'Clock position(h:min)', 'Feature identification']
+
+DEFECT_COMMENTS = ('金属损失', '凹陷', '制造缺陷', 'corrosion')
+DEFECT_IDENTIFICATIONS = ('外部腐蚀', '内部腐蚀', '制造缺陷')
+
+
+class SyntheticRunPair:
+    """
+    一对模拟的内检测管道列表及其真实对应关系
+
+    Attributes:
+        df1: 第一次内检测的管道列表
+        df2: 第二次内检测的管道列表
+        weld_truth: 文件1环焊缝编号 -> 文件2环焊缝编号（两次都检出的同一物理环焊缝）
+        defect_truth: 文件1缺陷序号 -> 文件2缺陷序号（与 read_defect_data 的 original_index 一致）
+        params: 生成参数
+    """
+
+    def __init__(self, df1: pd.DataFrame, df2: pd.DataFrame, weld_truth: Dict[str, str],
+                 defect_truth: Dict[int, int], params: Dict):
+        self.df1 = df1
+        self.df2 = df2
+        self.weld_truth = weld_truth
+        self.defect_truth = defect_truth
+        self.params = params
+
+    def __repr__(self) -> str:
+        return (f"SyntheticRunPair({len(self.weld_truth)} weld pairs, {len(self.defect_truth)} defect pairs, "
+                f"rows={len(self.df1)}/{len(self.df2)})")
+
+
+def generate_run_pair(n_welds: int, seed: int = 0,
+                      joint_length_mean: float = 12.0, joint_length_std: float = 1.5,
+                      short_joint_ratio: float = 0.02,
+                      odometer_scale: float = 1.0005, odometer_drift: float = 0.02,
+                      odometer_offset: float = 100.0, position_noise: float = 0.05,
+                      removed_joint_ratio: float = 0.005, inserted_joint_ratio: float = 0.005,
+                      missing_weld_ratio: float = 0.005,
+                      defects_per_joint: float = 1.0, defect_missing_ratio: float = 0.05,
+                      defect_new_ratio: float = 0.05, defect_distance_noise: float = 0.1,
+                      clock_noise: float = 8.0, depth_noise: float = 2.0, size_noise: float = 5.0) -> SyntheticRunPair:
+    """
+    生成同一条管线两次内检测的模拟管道列表
+
+    第二次检测相对第一次：
+    - 里程计有比例误差（odometer_scale）、随管节累积的随机漂移（odometer_drift，每个管节的标准差）和起点偏移；
+    - 部分管节被割除（removed_joint_ratio）或新插入管节（inserted_joint_ratio）；
+    - 部分环焊缝未检出（missing_weld_ratio，该环焊缝前后两个管节在列表中合并为一个）；
+    - 缺陷位置、时钟方位、深度、尺寸带有测量噪声，部分缺陷未检出或为新增缺陷。
+
+    Args:
+        n_welds: 第一次检测的环焊缝数
+        seed: 随机种子
+        joint_length_mean: 管节长度均值（米）
+        joint_length_std: 管节长度标准差（米）
+        short_joint_ratio: 短管节（1~4 米）的比例
+        odometer_scale: 第二次检测里程计的比例误差
+        odometer_drift: 里程计随机漂移（每个管节的标准差，米）
+        odometer_offset: 第二次检测的里程起点偏移（米）
+        position_noise: 环焊缝位置测量噪声（米）
+        removed_joint_ratio: 割除管节的比例
+        inserted_joint_ratio: 新插入管节的比例
+        missing_weld_ratio: 第二次检测未检出的环焊缝比例
+        defects_per_joint: 每个管节的平均缺陷数
+        defect_missing_ratio: 第二次检测未检出的缺陷比例
+        defect_new_ratio: 第二次检测新增缺陷的比例（相对第一次缺陷数）
+        defect_distance_noise: 缺陷位置测量噪声（米）
+        clock_noise: 时钟方位噪声（度）
+        depth_noise: 深度噪声（%）
+        size_noise: 长度/宽度噪声（mm）
+
+    Returns:
+        SyntheticRunPair: 两份管道列表及真实对应关系
+    """
+    params = dict(locals())
+    rng = np.random.default_rng(seed)
+
+    # ---------- 第一次检测：管节与环焊缝 ----------
+    lengths = np.clip(rng.normal(joint_length_mean, joint_length_std, n_welds), 1.0, None)
+    short = rng.random(n_welds) < short_joint_ratio
+    lengths[short] = rng.uniform(1.0, 4.0, np.count_nonzero(short))
+    weld_pos1 = np.concatenate([[0.0], np.cumsum(lengths[:-1])])  # 第 k 个管节的起点即第 k 个环焊缝
+    weld_numbers1 = (np.arange(n_welds) + 1) * 10
+
+    # ---------- 第二次检测：管线改造后的物理环焊缝 ----------
+    # 三个并行列表：物理位置、对应的文件1管节序号（新插入为 -1）、是否检出
+    removed = rng.random(n_welds) < removed_joint_ratio
+    removed[0] = False
+    inserted = rng.random(n_welds) < inserted_joint_ratio
+    missing = rng.random(n_welds) < missing_weld_ratio
+    missing[0] = False
+
+    physical2, source2, reported2 = [], [], []
+    joint_start2 = np.full(n_welds, np.nan)  # 文件1管节在第二次检测中的物理起点（割除的管节为 NaN）
+    position = 0.0
+    for k in range(n_welds):
+        if removed[k]:
+            continue
+        joint_start2[k] = position
+        physical2.append(position)
+        source2.append(k)
+        reported2.append(not missing[k])
+        position += lengths[k]
+        if inserted[k]:
+            physical2.append(position)
+            source2.append(-1)
+            reported2.append(True)
+            position += max(1.0, rng.normal(joint_length_mean, joint_length_std))
+    physical2 = np.asarray(physical2)
+    source2 = np.asarray(source2)
+    reported2 = np.asarray(reported2)
+
+    # 里程计：比例误差 + 在环焊缝处采样的随机游走漂移（中间线性插值）+ 起点偏移
+    drift = np.cumsum(rng.normal(0, odometer_drift, len(physical2)))
+
+    def odometer(x):
+        return odometer_offset + odometer_scale * x + np.interp(x, physical2, drift)
+
+    weld_dist2 = odometer(physical2[reported2]) + rng.normal(0, position_noise, np.count_nonzero(reported2))
+    weld_numbers2 = np.arange(1, np.count_nonzero(reported2) + 1)
+    weld_truth = {str(weld_numbers1[k]): str(w2)
+                  for k, w2 in zip(source2[reported2].tolist(), weld_numbers2.tolist()) if k >= 0}
+
+    # ---------- 缺陷 ----------
+    counts = rng.poisson(defects_per_joint, n_welds)
+    joint_of_defect = np.repeat(np.arange(n_welds), counts)
+    n_defects = len(joint_of_defect)
+    offsets = rng.uniform(0.05, 0.95, n_defects) * lengths[joint_of_defect]
+    clock1 = rng.uniform(0, 360, n_defects)
+    depth1 = rng.uniform(5, 60, n_defects)
+    length1 = np.exp(rng.normal(3.0, 0.6, n_defects))
+    width1 = np.exp(rng.normal(3.0, 0.6, n_defects))
+    comments = rng.choice(DEFECT_COMMENTS, n_defects)
+    identifications = rng.choice(DEFECT_IDENTIFICATIONS, n_defects)
+    defect_dist1 = weld_pos1[joint_of_defect] + offsets
+
+    # 第二次检测中仍存在且被检出的缺陷
+    kept = ~np.isnan(joint_start2[joint_of_defect]) & (rng.random(n_defects) >= defect_missing_ratio)
+    kept_ids = np.flatnonzero(kept)
+    defect_dist2 = odometer(joint_start2[joint_of_defect[kept_ids]] + offsets[kept_ids]) \
+        + rng.normal(0, defect_distance_noise, len(kept_ids))
+    clock2 = np.mod(clock1[kept_ids] + rng.normal(0, clock_noise, len(kept_ids)), 360)
+    depth2 = np.clip(depth1[kept_ids] + rng.normal(0, depth_noise, len(kept_ids)), 1, 99)
+    length2 = np.clip(length1[kept_ids] + rng.normal(0, size_noise, len(kept_ids)), 1, None)
+    width2 = np.clip(width1[kept_ids] + rng.normal(0, size_noise, len(kept_ids)), 1, None)
+
+    # 第二次检测新增的缺陷
+    n_new = rng.binomial(n_defects, defect_new_ratio) if n_defects else 0
+    new_dist2 = odometer(rng.uniform(0, physical2[-1] + lengths[-1], n_new))
+
+    listing1, order1 = _build_listing(
+        weld_pos1, weld_numbers1, defect_dist1, clock1, depth1, length1, width1, comments, identifications)
+    listing2, order2 = _build_listing(
+        weld_dist2, weld_numbers2,
+        np.concatenate([defect_dist2, new_dist2]),
+        np.concatenate([clock2, rng.uniform(0, 360, n_new)]),
+        np.concatenate([depth2, rng.uniform(5, 60, n_new)]),
+        np.concatenate([length2, np.exp(rng.normal(3.0, 0.6, n_new))]),
+        np.concatenate([width2, np.exp(rng.normal(3.0, 0.6, n_new))]),
+        np.concatenate([comments[kept_ids], rng.choice(DEFECT_COMMENTS, n_new)]),
+        np.concatenate([identifications[kept_ids], rng.choice(DEFECT_IDENTIFICATIONS, n_new)]))
+
+    # 缺陷序号：按列表中出现的顺序从 1 开始编号（与 read_defect_data 的 original_index 一致）
+    ordinal1 = np.empty(n_defects, dtype=np.int64)
+    ordinal1[order1] = np.arange(1, n_defects + 1)
+    ordinal2 = np.empty(len(order2), dtype=np.int64)
+    ordinal2[order2] = np.arange(1, len(order2) + 1)
+    defect_truth = dict(zip(ordinal1[kept_ids].tolist(), ordinal2[:len(kept_ids)].tolist()))
+
+    return SyntheticRunPair(listing1, listing2, weld_truth, defect_truth, params)
+
+
+def _build_listing(weld_dist, weld_numbers, defect_dist, clock, depth, length, width,
+                   comments, identifications):
+    """
+    组装管道列表：环焊缝行与缺陷行按里程排序，缺陷行的上游环焊缝编号取前一个环焊缝
+
+    Returns:
+        tuple: (管道列表 DataFrame, 缺陷在列表中的出现顺序（缺陷下标数组）)
+    """
+    n_welds, n_defects = len(weld_dist), len(defect_dist)
+    distances = np.concatenate([weld_dist, defect_dist])
+    # 同一位置时环焊缝排在缺陷前面
+    order = np.lexsort((np.r_[np.zeros(n_welds), np.ones(n_defects)], distances))
+    is_weld = order < n_welds
+    defect_ids = order[~is_weld] - n_welds
+
+    weld_col = np.full(len(order), np.nan)
+    weld_col[is_weld] = np.asarray(weld_numbers, dtype=float)[order[is_weld]]
+    upstream = pd.Series(weld_col).ffill().to_numpy()
+
+    frame = pd.DataFrame({
+        'Log distance(m)': np.round(distances[order], 3),
+        'Upstream girth weld': pd.array(np.where(np.isnan(upstream), np.nan, upstream), dtype='Int64'),
+        'Feature type': np.where(is_weld, '环焊缝', None),
+        'Peak depth(%)': np.nan,
+        'Length(mm)': np.nan,
+        'Width(mm)': np.nan,
+        'Clock position(h:min)': None,
+        'Feature identification': None,
+    }, columns=COLUMNS)
+
+    rows = np.flatnonzero(~is_weld)
+    frame.loc[rows, 'Feature type'] = np.asarray(comments, dtype=object)[defect_ids]
+    frame.loc[rows, 'Peak depth(%)'] = np.round(np.asarray(depth)[defect_ids], 1)
+    frame.loc[rows, 'Length(mm)'] = np.round(np.asarray(length)[defect_ids], 1)
+    frame.loc[rows, 'Width(mm)'] = np.round(np.asarray(width)[defect_ids], 1)
+    frame.loc[rows, 'Clock position(h:min)'] = _format_clock(np.asarray(clock)[defect_ids])
+    frame.loc[rows, 'Feature identification'] = np.asarray(identifications, dtype=object)[defect_ids]
+    return frame, defect_ids
+
+
+def _format_clock(degrees: np.ndarray) -> np.ndarray:
+    """角度 -> "h:mm" 时钟方位"""
+    minutes = np.round(np.mod(degrees, 360) / 360 * 720).astype(np.int64) % 720
+    hours = minutes // 60
+    hours = np.where(hours == 0, 12, hours)
+    return np.array([f"{h}:{m:02d}" for h, m in zip(hours.tolist(), (minutes % 60).tolist())], dtype=object)
+
+
+def write_run_pair(pair: SyntheticRunPair, path1: str, path2: str, truth_path: Optional[str] = None):
+    """
+    把模拟数据写成文件（后缀决定格式：.xlsx / .csv / .parquet），可选写出真实对应关系（JSON）
+
+    Args:
+        pair: generate_run_pair 的结果
+        path1: 文件1路径
+        path2: 文件2路径
+        truth_path: 真实对应关系的 JSON 路径
+    """
+    for frame, path in ((pair.df1, path1), (pair.df2, path2)):
+        if path.endswith('.csv'):
+            frame.to_csv(path, index=False, encoding='utf-8-sig')
+        elif path.endswith('.parquet'):
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_excel(path, index=False)
+    if truth_path:
+        with open(truth_path, 'w', encoding='utf-8') as f:
+            json.dump({'welds': pair.weld_truth,
+                       'defects': {str(k): v for k, v in pair.defect_truth.items()},
+                       'params': {k: v for k, v in pair.params.items() if isinstance(v, (int, float))}},
+                      f, ensure_ascii=False, indent=4)
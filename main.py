@@ -129,7 +129,7 @@ with st.sidebar:
         # 只要页面刷新（用户做了选择），这里就会执行，将新状态同步给 Agent
         update_agent_memory({"alignment_scenario": memory_value})
 
-        f1 = st.file_uploader("基准文件 File 1", type=["xlsx", "xls"], key="align1")
+        f1 = st.file_uploader("基准文件 File 1", type=["xlsx", "xls", "csv", "parquet"], key="align1")
         if f1:
             path = os.path.join(UPLOAD_DIR, f1.name)
             with open(path, "wb") as f:
@@ -137,7 +137,7 @@ with st.sidebar:
             update_agent_memory({"align_file1": f1.name})
             st.info(f"基准文件：{f1.name}")
 
-        f2 = st.file_uploader("目标文件 File 2", type=["xlsx", "xls"], key="align2")
+        f2 = st.file_uploader("目标文件 File 2", type=["xlsx", "xls", "csv", "parquet"], key="align2")
         if f2:
             path = os.path.join(UPLOAD_DIR, f2.name)
             with open(path, "wb") as f:
@@ -0,0 +1,129 @@
+import contextlib
+import io
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from benchmarks.run_alignment_bench import DEFAULT_THRESHOLDS, _stages
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools import alignment_artifacts
+from Tools.align_tools.align_defection import analyze_defect_distribution, align_defects_with_comprehensive_mapping
+from Tools.align_tools.alignment_artifacts import (ARTIFACT_VERSION, META_FILE, alignment_artifact_key,
+                                                   clear_artifact_cache, get_cached_artifact, put_cached_artifact,
+                                                   resolve_context)
+from Tools.align_tools.column_schema import DEFAULT_MAPPING_PATH
+
+
+def test_artifact_key_changes_with_field_mapping(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    file1, file2 = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    file1.write_text('Log distance(m),Upstream girth weld\n0,10\n', encoding='utf-8')
+    file2.write_text('Log distance(m),Upstream girth weld\n0,20\n', encoding='utf-8')
+    key = alignment_artifact_key(str(file1), str(file2), engine='greedy', tiling=False)
+    assert alignment_artifact_key(str(file1), str(file2), engine='greedy', tiling=False) == key
+    assert alignment_artifact_key(str(file1), str(file2), engine='dp', tiling=False) != key
+
+    mapping_path = tmp_path / DEFAULT_MAPPING_PATH
+    mapping_path.parent.mkdir(parents=True)
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程']}]), encoding='utf-8')
+    assert alignment_artifact_key(str(file1), str(file2), engine='greedy', tiling=False) != key
+
+
+@pytest.fixture(scope='module')
+def step1_context():
+    """模拟数据上第一阶段的 context_data"""
+    pair = generate_run_pair(200, seed=1)
+    outputs = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, stage in _stages(pair, 'greedy', False, 0.5)[:3]:
+            outputs[name] = stage(outputs)
+        defects1, defects2 = outputs['read_defects']
+        weld_alignment, best_base_distance = outputs['weld_alignment']
+        metric = analyze_defect_distribution(defects1, defects2)
+    return {
+        'metric': metric,
+        'defects1': defects1,
+        'defects2': defects2,
+        'weld_alignment': weld_alignment,
+        'best_base_distance': best_base_distance,
+        'filename1': 'a.xlsx',
+        'filename2': 'b.xlsx',
+        'aligned_count': weld_alignment.aligned_count,
+    }
+
+
+@pytest.fixture(autouse=True)
+def _empty_memory_cache():
+    clear_artifact_cache()
+    yield
+    clear_artifact_cache()
+
+
+def _defect_results(context):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return align_defects_with_comprehensive_mapping(context['defects1'], context['defects2'],
+                                                        context['weld_alignment'], DEFAULT_THRESHOLDS, 0.5)
+
+
+def test_round_trip_through_disk(step1_context, tmp_path):
+    put_cached_artifact('k1', step1_context, artifact_dir=str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ['k1']
+    assert sorted(os.listdir(tmp_path / 'k1')) == ['defects1.arrow', 'defects2.arrow', META_FILE,
+                                                  'welds.parquet']
+    clear_artifact_cache()
+
+    loaded = resolve_context('k1', artifact_dir=str(tmp_path))
+    assert loaded is not None
+    assert loaded['context_handle'] == 'k1'
+    original_welds = step1_context['weld_alignment']
+    pd.testing.assert_frame_equal(loaded['weld_alignment'].to_frame(), original_welds.to_frame())
+    assert loaded['weld_alignment'].base_distance == original_welds.base_distance
+    assert loaded['weld_alignment'].aligned_count == original_welds.aligned_count
+    assert loaded['aligned_count'] == step1_context['aligned_count']
+    assert loaded['best_base_distance'] == step1_context['best_base_distance']
+    assert loaded['metric'] == pytest.approx(step1_context['metric'])
+    for name in ('defects1', 'defects2'):
+        pd.testing.assert_frame_equal(loaded[name].to_frame(), step1_context[name].to_frame())
+
+    # 第二阶段结果与未落盘时一致
+    pd.testing.assert_frame_equal(_defect_results(loaded), _defect_results(step1_context))
+
+    # 请求中的文件名覆盖保存时的名称
+    renamed = get_cached_artifact('k1', 'c.xlsx', 'd.xlsx', artifact_dir=str(tmp_path))
+    assert (renamed['filename1'], renamed['filename2']) == ('c.xlsx', 'd.xlsx')
+
+
+def test_no_temporary_directories_left(step1_context, tmp_path):
+    put_cached_artifact('k1', step1_context, artifact_dir=str(tmp_path))
+    # 已存在的产物不会被覆盖，也不留下临时目录
+    put_cached_artifact('k1', step1_context, artifact_dir=str(tmp_path))
+    assert os.listdir(tmp_path) == ['k1']
+
+
+def test_prune_keeps_newest(step1_context, tmp_path, monkeypatch):
+    monkeypatch.setattr(alignment_artifacts, 'MAX_DISK_ARTIFACTS', 3)
+    for k in range(5):
+        put_cached_artifact(f'k{k}', step1_context, artifact_dir=str(tmp_path))
+        os.utime(tmp_path / f'k{k}' / META_FILE, (1000 + k, 1000 + k))
+    assert sorted(os.listdir(tmp_path)) == ['k2', 'k3', 'k4']
+
+
+@pytest.mark.parametrize('meta_text', ['{not json', json.dumps({'version': ARTIFACT_VERSION + 1}),
+                                       json.dumps({'version': ARTIFACT_VERSION})])
+def test_bad_meta_is_a_miss(step1_context, tmp_path, meta_text):
+    put_cached_artifact('k1', step1_context, artifact_dir=str(tmp_path))
+    clear_artifact_cache()
+    (tmp_path / 'k1' / META_FILE).write_text(meta_text, encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert get_cached_artifact('k1', artifact_dir=str(tmp_path)) is None
+
+
+def test_corrupt_parquet_is_a_miss(step1_context, tmp_path):
+    put_cached_artifact('k1', step1_context, artifact_dir=str(tmp_path))
+    clear_artifact_cache()
+    (tmp_path / 'k1' / 'defects1.arrow').write_bytes(b'not arrow')
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert get_cached_artifact('k1', artifact_dir=str(tmp_path)) is None
+    assert resolve_context(None, artifact_dir=str(tmp_path)) is None
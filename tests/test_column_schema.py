@@ -0,0 +1,29 @@
+import json
+import os
+
+import pandas as pd
+
+from Tools.align_tools.column_schema import DEFAULT_MAPPING_PATH, mapping_signature, resolve_schema
+
+HEADERS = ['Log distance(m)', 'Upstream girth weld', 'Feature type', 'Clock position(h:min)', 'Length(mm)']
+
+
+def test_resolve_schema_does_not_create_mapping_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    schema = resolve_schema(pd.DataFrame(columns=HEADERS))
+    assert schema.get('abs_distance') == 'Log distance(m)'
+    assert schema.get('weld_number') == 'Upstream girth weld'
+    assert mapping_signature() == 'missing'
+    assert not os.path.exists(tmp_path / DEFAULT_MAPPING_PATH)
+
+
+def test_mapping_signature_follows_content(tmp_path):
+    mapping_path = tmp_path / 'field_mapping.json'
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程']}]), encoding='utf-8')
+    before = mapping_signature(str(mapping_path))
+    assert resolve_schema(pd.DataFrame(columns=['里程']), str(mapping_path)).get('abs_distance') == '里程'
+
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程(m)']}]), encoding='utf-8')
+    os.utime(mapping_path, (1, 1))
+    assert mapping_signature(str(mapping_path)) != before
+    assert resolve_schema(pd.DataFrame(columns=['里程']), str(mapping_path)).get('abs_distance') is None
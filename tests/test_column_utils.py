@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Tools.align_tools.column_utils import locate_upstream_welds
+
+WELD_COL, DISTANCE_COL = '上游环焊缝', '绝对距离'
+DATA_COLS = ['深度', '长度', '宽度']
+
+# 各种"空"单元格
+BLANKS = [None, np.nan, '', '   ']
+
+
+def _is_weld_row(row, data_cols):
+    """原逐行判断：编号、绝对距离不为空，深度、长度、宽度都为空"""
+    weld_num = row.get(WELD_COL)
+    abs_dist = row.get(DISTANCE_COL)
+    data_empty = all(col is None or pd.isna(row.get(col)) or str(row.get(col)).strip() == '' for col in data_cols)
+    return (pd.notna(weld_num) and pd.notna(abs_dist) and
+            str(weld_num).strip() != '' and str(abs_dist).strip() != '' and data_empty)
+
+
+def _legacy_lookup(df, data_cols, idx):
+    """原 read_defect_data 的查找：从当前行向上逐行查找环焊缝，找不到时向下查找 10 行"""
+    for rows in (range(idx, -1, -1), range(idx, min(idx + 10, len(df)))):
+        for i in rows:
+            search_row = df.iloc[i]
+            if _is_weld_row(search_row, data_cols):
+                try:
+                    return (int(float(str(search_row.get(WELD_COL)).strip())),
+                            float(str(search_row.get(DISTANCE_COL)).strip()))
+                except (ValueError, TypeError):
+                    continue
+    return None
+
+
+def _random_listing(rng, n):
+    """随机管道列表：环焊缝行、缺陷行（部分带环焊缝编号）、空白行和无法解析的单元格混排"""
+    rows = []
+    weld = int(rng.integers(1, 100)) * 10
+    distance = float(rng.uniform(0, 100))
+    for _ in range(n):
+        kind = rng.choice(['weld', 'defect', 'weld_with_data', 'blank', 'junk'], p=[0.2, 0.45, 0.1, 0.1, 0.15])
+        blank = lambda: BLANKS[int(rng.integers(len(BLANKS)))]
+        row = {WELD_COL: blank(), DISTANCE_COL: f"{distance:.3f}", '深度': blank(), '长度': blank(), '宽度': blank()}
+        if kind in ('weld', 'weld_with_data'):
+            weld += 10
+            row[WELD_COL] = rng.choice([str(weld), f" {weld}.0 ", weld, float(weld)])
+        if kind in ('defect', 'weld_with_data'):
+            col = DATA_COLS[int(rng.integers(len(DATA_COLS)))]
+            row[col] = rng.choice([f"{rng.uniform(0, 50):.1f}", round(float(rng.uniform(0, 50)), 1)])
+        if kind == 'blank':
+            row[DISTANCE_COL] = blank()
+        if kind == 'junk':
+            row[WELD_COL] = rng.choice(['abc', 'nan', str(weld)])
+            row[DISTANCE_COL] = rng.choice(['-', 'nan', ' NaN ', f"{distance:.3f}"])
+        rows.append(row)
+        distance += float(rng.uniform(0, 5))
+    return pd.DataFrame(rows, dtype=object)
+
+
+def _assert_matches_legacy(df, data_cols):
+    positions = np.arange(len(df))
+    numbers, distances, found = locate_upstream_welds(df, WELD_COL, DISTANCE_COL, data_cols, positions)
+    for idx in positions:
+        expected = _legacy_lookup(df, data_cols, idx)
+        assert found[idx] == (expected is not None), idx
+        if expected is not None:
+            assert numbers[idx] == expected[0], idx
+            np.testing.assert_equal(distances[idx], expected[1])
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_legacy_scan(seed):
+    rng = np.random.default_rng(seed)
+    _assert_matches_legacy(_random_listing(rng, int(rng.integers(5, 60))), DATA_COLS)
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_matches_legacy_scan_without_width_column(seed):
+    rng = np.random.default_rng(seed)
+    df = _random_listing(rng, 40).drop(columns='宽度')
+    _assert_matches_legacy(df, ['深度', '长度', None])
+
+
+def test_defect_before_first_weld():
+    df = pd.DataFrame({
+        WELD_COL: [None, '', '120', None, None, None, None, None, None, None, None, None, '130'],
+        DISTANCE_COL: ['1.0', '2.0', '3.0', '4.0', '5.0', '6.0', '7.0', '8.0', '9.0', '10.0', '11.0', '12.0', '13.0'],
+        '深度': ['1.5', '  ', None, '2', None, None, None, None, None, None, None, None, None],
+        '长度': [None] * 13,
+        '宽度': [None] * 13,
+    }, dtype=object)
+    numbers, distances, found = locate_upstream_welds(df, WELD_COL, DISTANCE_COL, DATA_COLS, [0, 1, 3])
+    # 前两行向下找到第 2 行的环焊缝；第 3 行向上找到同一个
+    assert found.tolist() == [True, True, True]
+    assert numbers.tolist() == [120, 120, 120]
+    assert distances.tolist() == [3.0, 3.0, 3.0]
+    _assert_matches_legacy(df, DATA_COLS)
+
+
+def test_weld_row_with_defect_data_is_not_a_weld():
+    df = pd.DataFrame({
+        WELD_COL: ['100', '110', None],
+        DISTANCE_COL: ['0.0', '12.0', '13.0'],
+        '深度': [None, '3.0', '2.0'],
+        '长度': [None, None, None],
+        '宽度': [None, None, None],
+    }, dtype=object)
+    numbers, _, found = locate_upstream_welds(df, WELD_COL, DISTANCE_COL, DATA_COLS, [1, 2])
+    assert found.tolist() == [True, True]
+    assert numbers.tolist() == [100, 100]
+    _assert_matches_legacy(df, DATA_COLS)
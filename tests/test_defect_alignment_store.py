@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from Tools.align_tools.defect_alignment_store import (DEFECT_REPORT_DECIMALS, DEFECT_RESULT_COLUMNS,
+                                                      DefectAlignmentRows, round_for_report)
+from Tools.align_tools.defect_table import DefectTable
+
+# 原 _append_defect_alignment_result 逐行拼接得到的结果（数值列为按报告精度格式化的字符串）
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'defect_alignment_rows.csv')
+
+# 对齐结果：(文件1缺陷行号, 文件2缺陷行号, 置信度, 说明, 匹配类型)
+RESULTS = [
+    (0, 0, 0.9375, '距离差0.010m; 方位差2.0°; 类型匹配', '环焊缝匹配'),
+    (1, 2, 0.6125, '距离差0.120m; 方位差15.0°; 类型相近', '距离匹配'),
+    (2, None, 0.4444, '', '文件1独有(置信度过低)'),
+    (3, None, 0, '', '文件1独有'),
+    (None, 1, 0, '', '文件2独有'),
+    (4, 3, 1.0, '距离差0.000m; 方位差0.0°; 类型匹配', '环焊缝匹配'),
+    (None, 4, -1, '', '文件2独有'),
+]
+
+
+def _defect_tables():
+    """小规模缺陷表：包含 0 值、缺失类型/注释以及正好落在保留位数一半上的数值"""
+    defects1 = DefectTable(
+        weld_number=[10, 10, 20, 20, 30],
+        distance_to_weld=[0.0005, 1.2345, 2.0, 0.0, 123.4565],
+        clock_position=[0.35, 90.05, 359.95, 0.0, 180.0],
+        depth=[0.125, 2.675, 0.0, 1.005, 10.0],
+        length=[0.25, 1.05, 0.0, 30.0, 12.35],
+        width=[0.15, 0.0, 2.45, 5.0, 7.75],
+        defect_type=['外部腐蚀', '内部腐蚀', None, 'Dent', '制造缺陷'],
+        comment=['', '注释A', None, '', 'B'],
+        original_index=[1, 2, 3, 5, 8],
+        absolute_distance=[100.0005, 101.2345, 1234.5675, 2000.0, 99999.9995],
+    )
+    defects2 = DefectTable(
+        weld_number=[110, 110, 110, 130, 140],
+        distance_to_weld=[0.0105, 3.3335, 1.3545, 123.4565, 9.0],
+        clock_position=[2.35, 45.0, 75.05, 180.0, 270.25],
+        depth=[0.135, 0.0, 2.665, 10.0, 3.335],
+        length=[0.35, 8.0, 1.15, 12.35, 0.0],
+        width=[0.15, 1.0, 0.0, 7.75, 6.65],
+        defect_type=['外部腐蚀', None, '内部腐蚀', '制造缺陷', '焊缝异常'],
+        comment=['', '', '注释C', 'B', None],
+        original_index=[11, 12, 13, 14, 15],
+        absolute_distance=[200.0105, 203.3335, 201.3545, 2999.9995, 4000.125],
+    )
+    return defects1, defects2
+
+
+def _result_frame():
+    defects1, defects2 = _defect_tables()
+    rows = DefectAlignmentRows()
+    for result in RESULTS:
+        rows.add(*result)
+    return rows.to_frame(defects1, defects2)
+
+
+def _load_fixture():
+    return pd.read_csv(FIXTURE_PATH, dtype=str, keep_default_na=False)
+
+
+def test_columns_and_dtypes():
+    frame = _result_frame()
+    assert list(frame.columns) == DEFECT_RESULT_COLUMNS
+    assert list(frame.columns) == list(_load_fixture().columns)
+
+    dtypes = frame.dtypes.astype(str)
+    assert set(dtypes[dtypes == 'float64'].index) == set(DEFECT_REPORT_DECIMALS)
+    assert list(dtypes[dtypes == 'Int64'].index) == ['文件1缺陷ID', '文件2缺陷ID']
+    assert (dtypes[~dtypes.isin(['float64', 'Int64'])] == 'object').all()
+
+
+def test_matches_row_by_row_output():
+    frame = _result_frame()
+    rounded = round_for_report(frame)
+    fixture = _load_fixture()
+    assert len(frame) == len(fixture)
+
+    for column in DEFECT_RESULT_COLUMNS:
+        new, old = frame[column], fixture[column]
+        if column in DEFECT_REPORT_DECIMALS:
+            decimals = DEFECT_REPORT_DECIMALS[column]
+            # 按原精度格式化与原字符串一致；导出时 round 的结果与原字符串表示的数值一致
+            formatted = ['' if pd.isna(value) else f"{value:.{decimals}f}" for value in new]
+            assert formatted == old.tolist(), column
+            expected = pd.to_numeric(old.replace('', np.nan)).to_numpy(dtype=float)
+            np.testing.assert_array_equal(rounded[column].to_numpy(), expected, err_msg=column)
+        else:
+            assert ['' if pd.isna(value) else str(value) for value in new] == old.tolist(), column
@@ -0,0 +1,68 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+from benchmarks.run_alignment_bench import DEFAULT_THRESHOLDS, _stages
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools import defect_assignment
+from Tools.align_tools.align_defection import align_defects_with_comprehensive_mapping
+
+MIN_CONFIDENCE = 0.5
+
+
+@pytest.fixture(scope='module')
+def aligned_pair():
+    """密集缺陷群的模拟数据：(文件1缺陷表, 文件2缺陷表, 环焊缝对齐结果)"""
+    pair = generate_run_pair(300, seed=3, defects_per_joint=6)
+    outputs = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, stage in _stages(pair, 'greedy', False, MIN_CONFIDENCE)[:3]:
+            outputs[name] = stage(outputs)
+    defects1, defects2 = outputs['read_defects']
+    weld_alignment, _ = outputs['weld_alignment']
+    return defects1, defects2, weld_alignment
+
+
+def test_parallel_assignment_matches_sequential(aligned_pair, monkeypatch):
+    pytest.importorskip('scipy')
+    defects1, defects2, weld_alignment = aligned_pair
+    sequential = defect_assignment.assign_defects_by_weld(defects1, defects2, weld_alignment, DEFAULT_THRESHOLDS,
+                                                          MIN_CONFIDENCE, parallel=False)
+
+    monkeypatch.setattr(defect_assignment, 'PARALLEL_ASSIGNMENT_MIN_DEFECTS', 0)
+    monkeypatch.setattr(defect_assignment, 'ASSIGNMENT_CHUNK_SIZE', 40)
+    parallel = defect_assignment.assign_defects_by_weld(defects1, defects2, weld_alignment, DEFAULT_THRESHOLDS,
+                                                        MIN_CONFIDENCE, max_workers=2)
+    assert parallel == sequential
+    assert any(match is not None for match, _, _ in sequential.values())
+
+
+def test_single_cpu_skips_process_pool(aligned_pair, monkeypatch):
+    pytest.importorskip('scipy')
+    defects1, defects2, weld_alignment = aligned_pair
+
+    def no_process_pool(*args, **kwargs):
+        raise AssertionError("只有一个 CPU 时不应启动进程池")
+
+    monkeypatch.setattr(defect_assignment, 'ProcessPoolExecutor', no_process_pool)
+    monkeypatch.setattr(defect_assignment, 'PARALLEL_ASSIGNMENT_MIN_DEFECTS', 0)
+    monkeypatch.setattr(defect_assignment, 'ASSIGNMENT_CHUNK_SIZE', 40)
+    monkeypatch.setattr(defect_assignment.os, 'cpu_count', lambda: 1)
+    defect_assignment.assign_defects_by_weld(defects1, defects2, weld_alignment, DEFAULT_THRESHOLDS, MIN_CONFIDENCE)
+
+
+def test_missing_scipy_falls_back_to_greedy(aligned_pair, monkeypatch):
+    defects1, defects2, weld_alignment = aligned_pair
+    monkeypatch.setattr(defect_assignment, 'linear_sum_assignment', None)
+    assert not defect_assignment.optimal_assignment_available()
+    with pytest.raises(ImportError):
+        defect_assignment.assign_defects_by_weld(defects1, defects2, weld_alignment, DEFAULT_THRESHOLDS, MIN_CONFIDENCE)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        greedy = align_defects_with_comprehensive_mapping(defects1, defects2, weld_alignment,
+                                                          DEFAULT_THRESHOLDS, MIN_CONFIDENCE)
+        fallback = align_defects_with_comprehensive_mapping(defects1, defects2, weld_alignment,
+                                                            DEFAULT_THRESHOLDS, MIN_CONFIDENCE, assignment='optimal')
+    pd.testing.assert_frame_equal(fallback, greedy)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from benchmarks.run_alignment_bench import DEFAULT_THRESHOLDS
+from Tools.align_tools.align_defection import (calculate_defect_similarity, calculate_defect_similarity_block,
+                                               _similarity_explanation)
+from Tools.align_tools.defect_table import DefectTable
+
+DEFECT_TYPES = ['外部腐蚀', '内部腐蚀', '制造缺陷', 'MFG anomaly', 'Dent', 'dent', None]
+
+
+def _random_defects(rng, n, nan_rate=0.1):
+    """随机缺陷表：各数值列按 nan_rate 置为 NaN，长度、宽度、深度部分置为 0（走 0.5 的默认得分分支）"""
+    def values(low, high, zero_rate=0.0):
+        column = rng.uniform(low, high, n)
+        column[rng.random(n) < zero_rate] = 0
+        column[rng.random(n) < nan_rate] = np.nan
+        return column
+
+    return DefectTable(rng.choice(['1', '2', '3'], n), values(-1, 12), values(0, 360),
+                       values(0, 50, 0.2), values(0, 30, 0.2), values(0, 50, 0.2),
+                       rng.choice(DEFECT_TYPES, n), [''] * n, np.arange(n), values(0, 1000))
+
+
+def _assert_block_matches_scalar(defects1, defects2):
+    candidates = np.arange(len(defects2))
+    for i in range(len(defects1)):
+        confidences, parts = calculate_defect_similarity_block(defects1, i, defects2, candidates, DEFAULT_THRESHOLDS)
+        record1 = defects1.record(i)
+        for j in candidates:
+            confidence, explanation = calculate_defect_similarity(record1, defects2.record(j), DEFAULT_THRESHOLDS)
+            if np.isnan(confidence):
+                assert np.isnan(confidences[j]), (i, j)
+            else:
+                assert confidences[j] == confidence, (i, j)
+            assert _similarity_explanation(parts['distance'][j], parts['clock'][j], parts['type'][j]) == explanation
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_block_scores_match_scalar(seed):
+    rng = np.random.default_rng(seed)
+    _assert_block_matches_scalar(_random_defects(rng, 60), _random_defects(rng, 80))
+
+
+def test_block_scores_match_scalar_all_nan():
+    # 时钟方位、深度、长度、宽度全部缺失
+    rng = np.random.default_rng(7)
+    _assert_block_matches_scalar(_random_defects(rng, 20, nan_rate=1.0), _random_defects(rng, 30, nan_rate=0.5))
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Tools.align_tools.defect_table import DefectTable
+
+
+def _table(weld_numbers, absolute_distances=None):
+    """只关心环焊缝编号和绝对距离的缺陷表，其余字段填默认值"""
+    n = len(weld_numbers)
+    if absolute_distances is None:
+        absolute_distances = np.arange(n, dtype=float)
+    zeros = np.zeros(n)
+    return DefectTable(weld_number=weld_numbers, distance_to_weld=zeros, clock_position=zeros, depth=zeros,
+                       length=zeros, width=zeros, defect_type=[''] * n, comment=[''] * n,
+                       original_index=np.arange(1, n + 1), absolute_distance=absolute_distances)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_weld_buckets_match_groupby(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 300))
+    # 编号随机交错出现，部分缺陷没有环焊缝编号
+    welds = rng.choice([str(w) for w in rng.integers(1, 10_000, 25)] + [None], n).tolist()
+    table = _table(welds)
+
+    expected = pd.DataFrame({'weld': welds}).groupby('weld', sort=False).indices
+    buckets = table.weld_buckets()
+    assert set(buckets) == set(expected)
+    for weld, rows in expected.items():
+        np.testing.assert_array_equal(buckets[weld], rows)
+        assert np.all(np.diff(buckets[weld]) > 0)
+        np.testing.assert_array_equal(table.rows_for_weld(weld), rows)
+
+
+def test_weld_buckets_skip_unused_categories():
+    # take 之后分类中仍保留已经没有缺陷的编号
+    table = _table(['10', '20', '10', '30', '20']).take([3, 0, 2])
+    assert set(table.weld_buckets()) == {'10', '30'}
+    np.testing.assert_array_equal(table.rows_for_weld('10'), [1, 2])
+    np.testing.assert_array_equal(table.rows_for_weld('30'), [0])
+    assert len(table.rows_for_weld('20')) == 0
+    assert len(table.rows_for_weld('missing')) == 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('radius', [0.5, 1.0, 3.7])
+def test_distance_windows_match_linear_scan(seed, radius):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 200))
+    # 0.5m 网格上的距离：大量相等的距离，且不少缺陷恰好落在窗口边界上
+    distances = np.round(rng.uniform(100, 160, n) * 2) / 2
+    table = _table(['1'] * n, distances)
+
+    centers = np.concatenate([
+        distances[rng.integers(0, n, 30)],
+        rng.uniform(90, 170, 30),
+        # 数组两端：窗口只覆盖最小/最大距离附近，或完全落在范围之外
+        [distances.min(), distances.max(), distances.min() - radius, distances.max() + radius,
+         distances.min() - 10 * radius, distances.max() + 10 * radius],
+    ])
+    order, lo, hi = table.distance_windows(centers, radius)
+
+    assert np.all(np.diff(distances[order]) >= 0)
+    for center, start, stop in zip(centers, lo, hi):
+        candidates = order[start:stop]
+        # 窗口只放宽浮点舍入量，不会带入明显超出半径的缺陷
+        assert np.all(np.abs(distances[candidates] - center) <= radius + 1e-6)
+        found = candidates[np.abs(distances[candidates] - center) < radius]
+        expected = np.flatnonzero(np.abs(distances - center) < radius)
+        np.testing.assert_array_equal(np.sort(found), expected)
+
+
+def test_distance_windows_empty_table():
+    order, lo, hi = _table([]).distance_windows([0.0, 5.0], 1.0)
+    assert len(order) == 0
+    np.testing.assert_array_equal(lo, [0, 0])
+    np.testing.assert_array_equal(hi, [0, 0])
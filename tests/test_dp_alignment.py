@@ -0,0 +1,78 @@
+import contextlib
+import io
+
+import pytest
+
+from benchmarks.run_alignment_bench import weld_scores
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools.align_defection import read_weld_data
+from Tools.align_tools.dp_alignment import dp_weld_alignment
+
+
+def _weld_inputs(pair):
+    """模拟数据的环焊缝输入：(编号, 绝对距离, 相对距离) x 2"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        (abs1, rel1, nums1), (abs2, rel2, nums2) = read_weld_data(pair.df1.copy()), read_weld_data(pair.df2.copy())
+    return [str(w) for w in nums1], abs1, rel1, [str(w) for w in nums2], abs2, rel2
+
+
+@pytest.fixture(scope='module', params=[1, 5])
+def aligned_run(request):
+    pair = generate_run_pair(2000, seed=request.param, defects_per_joint=0.2)
+    inputs = _weld_inputs(pair)
+    with contextlib.redirect_stdout(io.StringIO()):
+        alignment = dp_weld_alignment(*inputs)
+    return pair, inputs, alignment
+
+
+def test_precision_and_recall_floor(aligned_run):
+    pair, _, alignment = aligned_run
+    scores = weld_scores(alignment, pair.weld_truth)
+    assert scores['precision'] >= 0.98
+    assert scores['recall'] >= 0.96
+
+
+def test_every_weld_written_once_in_order(aligned_run):
+    _, (welds1, _, _, welds2, _, _), alignment = aligned_run
+    written1 = [a['file1_weld'] for a in alignment.alignments if a['file1_weld'] != ' ']
+    written2 = [a['file2_weld'] for a in alignment.alignments if a['file2_weld'] != ' ']
+    assert written1 == welds1
+    assert written2 == welds2
+    assert alignment.aligned_count == sum(1 for a in alignment.alignments
+                                          if a['file1_weld'] != ' ' and a['file2_weld'] != ' ')
+
+
+@pytest.mark.parametrize('empty_side', [1, 2])
+def test_one_side_empty_returns_all_unpaired(empty_side):
+    welds = ['10', '20', '30']
+    absolute = [0.0, 12.0, 24.5]
+    redis = [0.0, 12.0, 12.5]
+    if empty_side == 1:
+        alignment = dp_weld_alignment([], [], [], welds, absolute, redis)
+        written = [a['file2_weld'] for a in alignment.alignments]
+        assert all(a['file1_weld'] == ' ' for a in alignment.alignments)
+    else:
+        alignment = dp_weld_alignment(welds, absolute, redis, [], [], [])
+        written = [a['file1_weld'] for a in alignment.alignments]
+        assert all(a['file2_weld'] == ' ' for a in alignment.alignments)
+    assert written == welds
+    assert alignment.aligned_count == 0
+
+
+def test_both_sides_empty():
+    alignment = dp_weld_alignment([], [], [], [], [], [])
+    assert len(alignment) == 0
+    assert alignment.aligned_count == 0
+
+
+def test_identical_runs_pair_every_weld():
+    redis = [0.0, 11.2, 12.7, 10.4, 13.9, 12.1, 11.5, 12.8, 10.9, 13.3, 12.0, 11.7, 12.4]
+    absolute1 = [sum(redis[:k + 1]) for k in range(len(redis))]
+    absolute2 = [d + 50 for d in absolute1]
+    welds1 = [f"A{k}" for k in range(len(redis))]
+    welds2 = [f"B{k}" for k in range(len(redis))]
+    with contextlib.redirect_stdout(io.StringIO()):
+        alignment = dp_weld_alignment(welds1, absolute1, redis, welds2, absolute2, redis)
+    pairs = [(a['file1_weld'], a['file2_weld']) for a in alignment.alignments]
+    assert pairs == [(f"A{k}", f"B{k}") for k in range(len(redis))]
+    assert alignment.aligned_count == len(redis)
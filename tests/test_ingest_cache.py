@@ -0,0 +1,94 @@
+import contextlib
+import io
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools import ingest_cache
+from Tools.align_tools.column_schema import DEFAULT_MAPPING_PATH
+from Tools.align_tools.defect_table import DefectTable
+from Tools.align_tools.ingest_cache import _cache_path, extract_listing, ingest_listing, ingest_listings
+
+
+def test_cache_key_changes_with_field_mapping(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    listing = tmp_path / 'listing.csv'
+    listing.write_text('Log distance(m),Upstream girth weld\n0,10\n', encoding='utf-8')
+    without_mapping = _cache_path(str(listing), None)
+
+    mapping_path = tmp_path / DEFAULT_MAPPING_PATH
+    mapping_path.parent.mkdir(parents=True)
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程']}]), encoding='utf-8')
+    with_mapping = _cache_path(str(listing), None)
+    assert with_mapping != without_mapping
+
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程(m)']}]), encoding='utf-8')
+    os.utime(mapping_path, (1, 1))
+    assert _cache_path(str(listing), None) != with_mapping
+
+
+def _no_process_pool(*args, **kwargs):
+    raise AssertionError("小文件 / 单 CPU 时不应启动进程池")
+
+
+@pytest.mark.parametrize('cpu_count, min_bytes', [(8, ingest_cache.PARALLEL_INGEST_MIN_BYTES), (1, 0)])
+def test_small_inputs_are_read_sequentially(tmp_path, monkeypatch, cpu_count, min_bytes):
+    monkeypatch.chdir(tmp_path)
+    pair = generate_run_pair(60, seed=0)
+    paths = [str(tmp_path / 'a.csv'), str(tmp_path / 'b.csv')]
+    pair.df1.to_csv(paths[0], index=False)
+    pair.df2.to_csv(paths[1], index=False)
+
+    monkeypatch.setattr(ingest_cache, 'ProcessPoolExecutor', _no_process_pool)
+    monkeypatch.setattr(ingest_cache.os, 'cpu_count', lambda: cpu_count)
+    monkeypatch.setattr(ingest_cache, 'PARALLEL_INGEST_MIN_BYTES', min_bytes)
+
+    results = ingest_listings(paths, use_cache=False)
+    for path, (abs_dist, rel_dist, weld_nums, defects) in zip(paths, results):
+        expected = extract_listing(path)
+        assert (abs_dist, rel_dist, weld_nums) == expected[:3]
+        assert defects.to_frame().equals(expected[3].to_frame())
+
+
+def _assert_mapped(defects):
+    """数值列是映射文件上的只读视图，而不是解码到堆上的副本"""
+    for field in DefectTable.NUMERIC_FIELDS + ('original_index',):
+        column = getattr(defects, field)
+        assert not column.flags.writeable and not column.flags.owndata
+
+
+def test_cached_defects_are_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / 'listing.csv')
+    generate_run_pair(60, seed=0, defects_per_joint=1.5).df1.to_csv(path, index=False)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        parsed = ingest_listing(path)
+        cached = ingest_listing(path)
+    assert os.path.exists(os.path.join(_cache_path(path, None), 'defects.arrow'))
+
+    assert cached[:3] == parsed[:3]
+    pd.testing.assert_frame_equal(cached[3].to_frame(), parsed[3].to_frame())
+    _assert_mapped(cached[3])
+
+
+def test_arrow_file_keeps_nan_and_missing_categories(tmp_path):
+    defects = DefectTable.from_records([
+        {'weld_number': '10', 'distance_to_weld': 1.5, 'clock_position': np.nan, 'depth': 12.0,
+         'length': 30.0, 'width': np.nan, 'defect_type': None, 'comment': '', 'original_index': 4,
+         'absolute_distance': 101.5},
+        {'weld_number': '20', 'distance_to_weld': np.nan, 'clock_position': 90.0, 'depth': np.nan,
+         'length': 0.0, 'width': 8.0, 'defect_type': '金属损失', 'comment': None, 'original_index': 9,
+         'absolute_distance': np.nan},
+    ])
+    path = str(tmp_path / 'defects.arrow')
+    defects.write_arrow_file(path)
+    loaded = DefectTable.read_arrow_file(path)
+
+    pd.testing.assert_frame_equal(loaded.to_frame(), defects.to_frame())
+    # NaN 按浮点值写入而不是空值，读取时仍然不需要复制
+    _assert_mapped(loaded)
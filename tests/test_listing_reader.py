@@ -0,0 +1,27 @@
+import json
+
+from Tools.align_tools.column_schema import DEFAULT_MAPPING_PATH
+from Tools.align_tools.listing_reader import detect_listing_sheet
+
+SHEET_HEADERS = {
+    'Summary': ['Upstream girth weld', 'Remark'],
+    'Data': ['里程', 'Upstream girth weld'],
+}
+
+
+def test_detected_sheet_follows_field_mapping(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    workbook = tmp_path / 'listing.xlsx'
+    workbook.write_bytes(b'placeholder workbook content')
+
+    def detect():
+        return detect_listing_sheet(str(workbook), list(SHEET_HEADERS), SHEET_HEADERS.__getitem__)
+
+    # 没有知识库时两个工作表都只识别出环焊缝列，取第一个
+    assert detect() == 'Summary'
+
+    # 知识库把“里程”登记为绝对距离后应重新识别，而不是沿用缓存的结果
+    mapping_path = tmp_path / DEFAULT_MAPPING_PATH
+    mapping_path.parent.mkdir(parents=True)
+    mapping_path.write_text(json.dumps([{'standard': 'Log distance(m)', 'aliases': ['里程']}]), encoding='utf-8')
+    assert detect() == 'Data'
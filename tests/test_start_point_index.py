@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from Tools.align_tools.align_defection import _StartPointIndex, find_alignment_start
+
+
+def _brute_force_matches(redis1, redis2, abs_threshold, k):
+    """逐对比较的参考实现：全部满足连续 k 个相对距离之差小于阈值的 (start1, start2)，按 (start1, start2) 升序"""
+    matches = []
+    for start1 in range(len(redis1) - k + 1):
+        for start2 in range(len(redis2) - k + 1):
+            if all(abs(redis1[start1 + t] - redis2[start2 + t]) < abs_threshold for t in range(k)):
+                matches.append((start1, start2))
+    return matches
+
+
+def _capped_scan(redis1, redis2, abs_threshold, min_match_count):
+    """原 comprehensive_weld_alignment 中限制在前 50x50 范围内的起始点搜索"""
+    for start1 in range(min(50, len(redis1))):
+        for start2 in range(min(50, len(redis2))):
+            count = 0
+            i, j = start1, start2
+            while i < len(redis1) and j < len(redis2) and count < min_match_count:
+                if abs(redis1[i] - redis2[j]) < abs_threshold:
+                    count += 1
+                    i += 1
+                    j += 1
+                else:
+                    break
+            if count >= min_match_count:
+                return start1, start2
+    return None
+
+
+def _random_case(rng):
+    """文件2取文件1的一段加噪声，前面补若干随机环焊缝；相对距离取自少量间距，便于出现偶然匹配"""
+    abs_threshold = float(rng.choice([0.2, 0.3, 0.5]))
+    k = int(rng.integers(2, 6))
+    spacings = rng.choice([10.0, 11.0, 12.0, 12.3], size=int(rng.integers(3, 5)), replace=False)
+    redis1 = rng.choice(spacings, int(rng.integers(5, 90))) + rng.normal(0, abs_threshold / 2, 1)[0]
+    redis1[0] = 0
+    lead = rng.choice(spacings, int(rng.integers(0, 30)))
+    tail = redis1[int(rng.integers(0, len(redis1))):] + rng.normal(0, abs_threshold / 2, None)
+    redis2 = np.concatenate([[0], lead, tail])
+    # 部分相对距离正好落在量化边界上
+    on_grid = rng.random(len(redis2)) < 0.1
+    redis2[on_grid] = np.round(redis2[on_grid] / abs_threshold) * abs_threshold
+    return redis1.tolist(), redis2.tolist(), abs_threshold, k
+
+
+@pytest.mark.parametrize('seed', range(300))
+def test_index_matches_brute_force(seed):
+    redis1, redis2, abs_threshold, k = _random_case(np.random.default_rng(seed))
+    expected = _brute_force_matches(redis1, redis2, abs_threshold, k)
+
+    n1 = len(redis1) - k + 1
+    if n1 <= 0 or len(redis2) - k + 1 <= 0:
+        assert find_alignment_start(redis1, redis2, abs_threshold, k) is None
+        return
+    index = _StartPointIndex(np.asarray(redis1), np.asarray(redis2), abs_threshold, k)
+    starts1, starts2 = index.matches(0, n1)
+    assert list(zip(starts1.tolist(), starts2.tolist())) == expected
+
+    # 原算法只搜索前 50x50 范围：其结果就是该范围内最靠前的匹配
+    in_range = [match for match in expected if match[0] < 50 and match[1] < 50]
+    assert _capped_scan(redis1, redis2, abs_threshold, k) == (in_range[0] if in_range else None)
+    # 选出的起始点总是满足判据的匹配之一
+    start = find_alignment_start(redis1, redis2, abs_threshold, k)
+    assert (start is None) == (not expected)
+    if start is not None:
+        assert start in expected
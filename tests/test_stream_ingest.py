@@ -0,0 +1,63 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools.ingest_cache import extract_listing
+from Tools.align_tools.stream_ingest import stream_ingest_listing
+
+# 很小的分块：环焊缝向上查找和开头缺陷的 10 行向下查找都会跨越块边界
+CHUNK_SIZES = (3, 7)
+
+
+def _listing(seed, variant):
+    """
+    模拟管道列表，开头加入第一个环焊缝之前的缺陷行
+
+    variant: 'tagged' 有"环焊缝"类型；'auto' 去掉"环焊缝"类型（自动标记）；'plain' 没有特征类型列
+    """
+    df = generate_run_pair(60, seed=seed, defects_per_joint=1.5).df1
+    head = df[df['Feature type'] != '环焊缝'].head(4).copy()
+    head['Log distance(m)'] = [-4.0, -3.0, -2.0, -1.0]
+    head['Upstream girth weld'] = pd.array([pd.NA] * len(head), dtype=df['Upstream girth weld'].dtype)
+    df = pd.concat([head, df], ignore_index=True)
+    if variant == 'auto':
+        df['Feature type'] = df['Feature type'].replace('环焊缝', '')
+    elif variant == 'plain':
+        df = df.drop(columns='Feature type')
+    return df
+
+
+def _write(df, tmp_path, suffix):
+    path = tmp_path / f'listing{suffix}'
+    if suffix == '.csv':
+        df.to_csv(path, index=False)
+    else:
+        df.to_excel(path, index=False)
+    return str(path)
+
+
+def _assert_same(streamed, in_memory):
+    for streamed_part, memory_part in zip(streamed[:3], in_memory[:3]):
+        assert list(streamed_part) == list(memory_part)
+    pd.testing.assert_frame_equal(streamed[3].to_frame(), in_memory[3].to_frame())
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.xlsx'])
+@pytest.mark.parametrize('variant', ['tagged', 'auto', 'plain'])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_streaming_matches_in_memory(tmp_path, suffix, variant, seed):
+    path = _write(_listing(seed, variant), tmp_path, suffix)
+    with contextlib.redirect_stdout(io.StringIO()):
+        in_memory = extract_listing(path, streaming=False)
+        results = [extract_listing(path, streaming=True)]
+        results += [stream_ingest_listing(path, chunk_size=size) for size in CHUNK_SIZES]
+
+    assert len(in_memory[0]) > 0 and len(in_memory[3]) > 0
+    # 开头的缺陷只能向下找到上游环焊缝
+    assert np.isfinite(in_memory[3].distance_to_weld).all()
+    for streamed in results:
+        _assert_same(streamed, in_memory)
@@ -0,0 +1,77 @@
+import contextlib
+import io
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_ili import generate_run_pair
+from Tools.align_tools.align_defection import read_weld_data, calculate_weld_statistics, select_weld_thresholds
+from Tools.align_tools.tiled_alignment import (find_tile_anchors, tiled_weld_alignment,
+                                               _longest_increasing_subsequence)
+
+TILE_SIZE = 500
+
+
+def _brute_force_lis_length(values):
+    """枚举所有子序列，求严格递增子序列的最大长度"""
+    for length in range(len(values), 0, -1):
+        for picked in combinations(range(len(values)), length):
+            if all(values[a] < values[b] for a, b in zip(picked, picked[1:])):
+                return length
+    return 0
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_longest_increasing_subsequence_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 8, int(rng.integers(0, 11)))
+    keep = _longest_increasing_subsequence(values)
+
+    assert len(keep) == _brute_force_lis_length(values.tolist())
+    assert np.all(np.diff(keep) > 0)
+    assert np.all(np.diff(values[keep]) > 0)
+
+
+@pytest.fixture(scope='module', params=[0, 3])
+def weld_inputs(request):
+    pair = generate_run_pair(3000, seed=request.param, defects_per_joint=0.1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        (abs1, rel1, nums1), (abs2, rel2, nums2) = read_weld_data(pair.df1.copy()), read_weld_data(pair.df2.copy())
+    return [str(w) for w in nums1], abs1, rel1, [str(w) for w in nums2], abs2, rel2
+
+
+def test_anchors_increasing_and_spaced(weld_inputs):
+    _, _, rel1, _, _, rel2 = weld_inputs
+    with contextlib.redirect_stdout(io.StringIO()):
+        abs_threshold, _ = select_weld_thresholds(calculate_weld_statistics(rel1, rel2))
+    anchors = find_tile_anchors(rel1, rel2, abs_threshold, tile_size=TILE_SIZE)
+
+    assert len(anchors) >= 2
+    starts1 = np.array([i for i, _ in anchors])
+    starts2 = np.array([j for _, j in anchors])
+    assert np.all(np.diff(starts1) > 0) and np.all(np.diff(starts2) > 0)
+    assert np.all(np.diff(np.concatenate([[0], starts1])) >= TILE_SIZE)
+    assert starts2[0] >= 1
+
+
+@pytest.mark.parametrize('engine', ['greedy', 'dp'])
+def test_tiles_write_every_weld_once_in_order(weld_inputs, engine):
+    welds1, _, _, welds2, _, _ = weld_inputs
+    with contextlib.redirect_stdout(io.StringIO()):
+        alignment, _ = tiled_weld_alignment(*weld_inputs, engine=engine, tile_size=TILE_SIZE, parallel=False)
+
+    assert [a['file1_weld'] for a in alignment.alignments if a['file1_weld'] != ' '] == welds1
+    assert [a['file2_weld'] for a in alignment.alignments if a['file2_weld'] != ' '] == welds2
+    assert alignment.aligned_count > 0.75 * min(len(welds1), len(welds2))
+
+
+def test_process_pool_matches_sequential(weld_inputs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        sequential, base1 = tiled_weld_alignment(*weld_inputs, tile_size=TILE_SIZE, parallel=False)
+        pooled, base2 = tiled_weld_alignment(*weld_inputs, tile_size=TILE_SIZE, parallel=True, max_workers=2)
+
+    assert base1 == base2
+    assert pooled.aligned_count == sequential.aligned_count
+    pd.testing.assert_frame_equal(pooled.to_report_frame(), sequential.to_report_frame())
@@ -0,0 +1,115 @@
+import contextlib
+import io
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from Tools.align_tools import align_defection
+from Tools.align_tools.align_defection import WeldAlignment, comprehensive_weld_alignment
+
+# 文件1各环焊缝到上一环焊缝的距离（第一个为 0）
+SPACINGS = [0, 11.2, 12.7, 10.4, 13.9, 12.1, 11.5, 12.8, 10.9, 13.3, 12.0]
+
+
+def _align(lead2):
+    """文件2在开头多出 lead2 个环焊缝，其余间距与文件1相同，整体偏移 50m"""
+    redis1 = list(SPACINGS)
+    redis2 = [0] + [9.1, 14.6, 10.2][:lead2] + SPACINGS[1:]
+    welds1 = [f"A{k}" for k in range(len(redis1))]
+    welds2 = [f"B{k}" for k in range(len(redis2))]
+    absolute1 = list(np.cumsum(redis1))
+    absolute2 = list(np.cumsum(redis2) + 50)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return comprehensive_weld_alignment(welds1, absolute1, redis1, welds2, absolute2, redis2,
+                                            base_distance=30, similarity_threshold=0.1)
+
+
+@pytest.mark.parametrize('lead2', [0, 2, 3])
+def test_every_weld_written_once(lead2):
+    # 起始点位于文件开头时，begin - 1 = -1 曾取到最后一个环焊缝：末尾环焊缝重复写入，起始段后一个被跳过
+    alignment = _align(lead2)
+    counts1 = Counter(a['file1_weld'] for a in alignment.alignments if a['file1_weld'] != ' ')
+    counts2 = Counter(a['file2_weld'] for a in alignment.alignments if a['file2_weld'] != ' ')
+
+    assert set(counts1) == {f"A{k}" for k in range(len(SPACINGS))}
+    assert set(counts2) == {f"B{k}" for k in range(len(SPACINGS) + lead2)}
+    assert max(counts1.values()) == 1
+    assert max(counts2.values()) == 1
+
+
+def test_start_at_file_head_pairs_first_welds():
+    alignment = _align(0)
+    assert alignment.get_file2_weld('A0') == 'B0'
+    assert alignment.get_file2_weld('A1') == 'B1'
+    assert alignment.get_file2_weld('A10') == 'B10'
+
+
+def test_sweep_uses_full_base_distance_grid(monkeypatch):
+    requested = []
+    original = align_defection.calculate_base_distances_from_data
+
+    def recording(rel_dist1, rel_dist2, max_candidates=3):
+        requested.append(max_candidates)
+        return original(rel_dist1, rel_dist2, max_candidates)
+
+    monkeypatch.setattr(align_defection, 'calculate_base_distances_from_data', recording)
+    redis = [0] + [float(12 + (k * 7) % 5) for k in range(1, 40)]
+    welds = [str(k) for k in range(len(redis))]
+    absolute = list(np.cumsum(redis))
+    with contextlib.redirect_stdout(io.StringIO()):
+        align_defection.find_best_weld_alignment(welds, absolute, redis, welds, absolute, redis)
+        align_defection.find_best_weld_alignment(welds, absolute, redis, welds, absolute, redis, max_candidates=3)
+    assert requested == [len(align_defection.BASE_DISTANCE_MULTIPLIERS), 3]
+
+
+def _paired(*pairs, unpaired=()):
+    """由 (文件1距离, 文件2距离) 构造对齐结果；unpaired 为只出现在文件1的环焊缝距离"""
+    alignment = WeldAlignment()
+    for k, (dist1, dist2) in enumerate(pairs):
+        alignment.add_alignment(f"A{k}", dist1, 0, f"B{k}", dist2, 0, 1.0)
+    for k, dist1 in enumerate(unpaired):
+        alignment.add_alignment(f"U{k}", dist1, 0)
+    return alignment
+
+
+def test_projection_interpolates_between_paired_welds():
+    # 添加顺序打乱，未配对的环焊缝不参与换算
+    alignment = _paired((10, 112), (0, 100), (20, 121), unpaired=[5, 50])
+    table1, table2 = alignment.chainage_table()
+    np.testing.assert_array_equal(table1, [0, 10, 20])
+    np.testing.assert_array_equal(table2, [100, 112, 121])
+
+    np.testing.assert_allclose(alignment.project_to_file2([0, 5, 10, 15, 20]), [100, 106, 112, 116.5, 121])
+    assert alignment.project_to_file2(2.5) == pytest.approx(103)
+
+
+def test_projection_outside_paired_range_keeps_end_offsets():
+    alignment = _paired((0, 100), (10, 112), (20, 121))
+    # 两端之外不外推斜率，按最外侧环焊缝的里程差平移
+    np.testing.assert_allclose(alignment.project_to_file2([-30, -0.5, 20.5, 80]), [70, 99.5, 121.5, 181])
+
+
+def test_non_monotone_file2_distances_are_clipped():
+    alignment = _paired((0, 100), (10, 115), (20, 110), (30, 130))
+    table1, table2 = alignment.chainage_table()
+    np.testing.assert_array_equal(table1, [0, 10, 20, 30])
+    np.testing.assert_array_equal(table2, [100, 115, 115, 130])
+    assert np.all(np.diff(alignment.project_to_file2(np.linspace(-5, 35, 81))) >= 0)
+    np.testing.assert_allclose(alignment.project_to_file2([15, 25]), [115, 122.5])
+
+
+def test_duplicate_file1_distances_keep_first_pair():
+    alignment = _paired((0, 100), (10, 110), (10, 111), (20, 120))
+    table1, table2 = alignment.chainage_table()
+    np.testing.assert_array_equal(table1, [0, 10, 20])
+    np.testing.assert_array_equal(table2, [100, 110, 120])
+    np.testing.assert_allclose(alignment.project_to_file2([5, 10, 15]), [105, 110, 115])
+
+
+@pytest.mark.parametrize('unpaired', [(), (0, 10)])
+def test_projection_without_paired_welds(unpaired):
+    alignment = _paired(unpaired=unpaired)
+    table1, table2 = alignment.chainage_table()
+    assert len(table1) == 0 and len(table2) == 0
+    assert alignment.project_to_file2([1.0, 2.0]) is None
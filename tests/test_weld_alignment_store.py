@@ -0,0 +1,32 @@
+import pickle
+
+import numpy as np
+
+from Tools.align_tools.align_defection import WeldAlignment
+
+
+def test_append_after_empty_round_trip():
+    # 空对象序列化后容量为 0，追加时不能卡在容量翻倍上
+    alignment = pickle.loads(pickle.dumps(WeldAlignment()))
+    alignment.add_alignment('a', 1, 1, 'b', 2, 1)
+    assert len(alignment) == 1
+    assert alignment.get_file2_weld('a') == 'b'
+
+
+def test_extend_after_empty_round_trip():
+    alignment = pickle.loads(pickle.dumps(WeldAlignment()))
+    alignment.add_alignments(welds1=[str(k) for k in range(200)], dists1=np.arange(200.0), redis1=np.ones(200))
+    assert len(alignment) == 200
+    assert alignment.alignments[-1]['file1_weld'] == '199'
+    assert alignment.alignments[-1]['file2_weld'] == ' '
+
+
+def test_round_trip_keeps_rows_and_grows():
+    alignment = WeldAlignment()
+    for k in range(3):
+        alignment.add_alignment(f"A{k}", k, 1, f"B{k}", k + 10, 1)
+    restored = pickle.loads(pickle.dumps(alignment))
+    restored.add_alignments(welds2=[f"C{k}" for k in range(100)], dists2=np.arange(100.0), redis2=np.ones(100))
+    assert len(restored) == 103
+    assert [a['file1_weld'] for a in restored.alignments[:3]] == ['A0', 'A1', 'A2']
+    assert restored.get_file2_weld('A2') == 'B2'